@@ -0,0 +1,198 @@
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.core.auth import get_current_player
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.player import Player
+
+# Admission control for the expensive endpoints (quiz board generation and guest creation).
+# Cheap reads and game play never go through here, so they stay fast while generation is shed.
+
+
+class TokenBucket:
+    """Allows `rate_per_minute` requests on average, with bursts of up to `burst` requests."""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self, amount: float = 1) -> Tuple[bool, float]:
+        """Take `amount` tokens if there are enough. Returns (admitted, seconds until they are available)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True, 0.0
+        if self.rate <= 0:
+            return False, 60.0
+        return False, (amount - self.tokens) / self.rate
+
+    def refund(self, amount: float = 1) -> None:
+        """Give back tokens taken by try_acquire() that ended up unused."""
+        self.tokens = min(self.burst, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    One token bucket per key (player id, client IP, ...).
+    Only the most recently used `max_keys` buckets are kept; an evicted key starts over with a full bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str) -> Tuple[bool, float]:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_per_minute, self.burst)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.try_acquire()
+
+    def refund(self, key: str) -> None:
+        """Give back the token of a request that a later check rejected."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.refund()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class ConcurrencyLimit:
+    """A non-blocking counting semaphore: over the limit, requests are rejected instead of waiting."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.active = max(0, self.active - 1)
+
+
+player_generation_limiter = RateLimiter(settings.GENERATION_RATE_PER_PLAYER_PER_MINUTE, settings.GENERATION_BURST_PER_PLAYER)
+ip_generation_limiter = RateLimiter(settings.GENERATION_RATE_PER_IP_PER_MINUTE, settings.GENERATION_BURST_PER_IP)
+ip_guest_limiter = RateLimiter(settings.GUEST_RATE_PER_IP_PER_MINUTE, settings.GUEST_BURST_PER_IP)
+
+# Streamed generations run on the request itself rather than in the job queue, so they get their own cap
+generation_streams = ConcurrencyLimit(settings.GENERATION_MAX_STREAMS)
+
+
+def client_ip(request: Request) -> str:
+    # Behind nginx every request comes from the proxy, which passes the real client address in X-Real-IP.
+    # Only the proxy's header is taken: a client that reaches the backend directly could otherwise pick any IP.
+    host = request.client.host if request.client else "unknown"
+    if settings.TRUST_PROXY_HEADERS and request.headers.get("X-Real-IP") and _is_trusted_proxy(host):
+        return request.headers["X-Real-IP"]
+    return host
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    for proxy in settings.TRUSTED_PROXIES:
+        try:
+            if address in ipaddress.ip_network(proxy, strict=False):
+                return True
+        except ValueError:
+            logger.warning(f"Ignoring invalid trusted proxy {proxy!r}")
+    return False
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+def _check_rate(limiter: RateLimiter, key: str, detail: str) -> None:
+    admitted, retry_after = limiter.try_acquire(key)
+    if not admitted:
+        logger.warning(f"Rate limited {key}: {detail}")
+        raise _reject(status.HTTP_429_TOO_MANY_REQUESTS, detail, retry_after)
+
+
+def _check_generation_load() -> None:
+    from app.services.generation_jobs_service import GenerationJobsService
+
+    queued = GenerationJobsService.pending_jobs()
+    if queued >= settings.GENERATION_MAX_QUEUE:
+        logger.warning(f"Shedding quiz board generation: {queued} jobs pending")
+        # Roughly the time for the workers to drain the excess, at ~30s per generation
+        retry_after = 30 * (queued - settings.GENERATION_MAX_QUEUE + 1) / max(1, settings.GENERATION_WORKERS)
+        raise _reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Too many quiz boards are being generated, please try again later", retry_after)
+
+
+async def admit_generation(
+    request: Request,
+    current_player: Player = Depends(get_current_player)
+) -> Player:
+    """
+    Dependency of the endpoints that generate a quiz board. Returns the current player.
+    Raises 503 when the generation queue is full, and 429 when the player or their IP is over its rate.
+    A rejected request takes no token, so shedding doesn't eat into the players' allowances.
+    """
+    _check_generation_load()
+    player_key = f"player:{current_player.id}"
+    _check_rate(player_generation_limiter, player_key, "Too many quiz board generations, please slow down")
+    try:
+        _check_rate(ip_generation_limiter, f"ip:{client_ip(request)}", "Too many quiz board generations, please slow down")
+    except HTTPException:
+        player_generation_limiter.refund(player_key)
+        raise
+    return current_player
+
+
+def refund_generation(request: Request, player: Player) -> None:
+    """Give back the tokens taken by admit_generation() for a generation that was rejected afterwards."""
+    player_generation_limiter.refund(f"player:{player.id}")
+    ip_generation_limiter.refund(f"ip:{client_ip(request)}")
+
+
+async def admit_guest_creation(request: Request) -> None:
+    """Dependency of guest creation, so that a client can't mint fresh guests to escape its per-player limits."""
+    _check_rate(ip_guest_limiter, f"ip:{client_ip(request)}", "Too many guest accounts created, please try again later")
+
+
+def acquire_generation_stream() -> None:
+    """Take a slot for a streamed generation; the caller must release() it when the stream ends."""
+    if not generation_streams.try_acquire():
+        logger.warning(f"Shedding streamed quiz board generation: {generation_streams.active} streams running")
+        raise _reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Too many quiz boards are being generated, please try again later", 10)
+
+
+def release_generation_stream() -> None:
+    generation_streams.release()
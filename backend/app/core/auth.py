@@ -1,13 +1,14 @@
 from typing import Optional
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 
 from app.models.player import Player
 from app.models.user import User
-from app.core.database import get_db
+from app.core.database import get_read_db
 from app.services.auth_service import SECRET_KEY, ALGORITHM, get_current_player_from_token
+from app.core.config import settings
 from app.core.logging import logger
 
 # Security scheme for Bearer token
@@ -15,7 +16,7 @@ security = HTTPBearer(auto_error=False)
 
 async def get_current_player(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Player:
     """
     Get the current authenticated player from the JWT token.
@@ -26,7 +27,7 @@ async def get_current_player(
             logger.info("No credentials provided")
             raise Exception("No authentication token provided")
         
-        return get_current_player_from_token(credentials.credentials, db)
+        return await get_current_player_from_token(credentials.credentials, db)
     except Exception as e:
         logger.error("Invalid authentication token. Exception: %s", e)
         raise HTTPException(
@@ -37,7 +38,7 @@ async def get_current_player(
 
 async def get_current_logged_in_user(
     current_player: Player = Depends(get_current_player),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> User:
     """
     Get the current authenticated user from the player.
@@ -50,7 +51,7 @@ async def get_current_logged_in_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(User).filter(User.id == current_player.user_id).first()
+    user = await db.get(User, current_player.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -60,6 +61,20 @@ async def get_current_logged_in_user(
 
     return user
 
+async def get_current_admin(
+    current_player: Player = Depends(get_current_player)
+) -> Player:
+    """
+    Get the current authenticated player, who must be a logged in user listed in ADMIN_USERNAMES.
+    """
+    if not is_user(current_player) or current_player.user is None or current_player.user.username not in settings.ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+
+    return current_player
+
 def is_guest(player: Player) -> bool:
     """Check if the authenticated player is a guest."""
     return player.player_type.value == "guest"
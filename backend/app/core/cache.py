@@ -0,0 +1,491 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+
+# Cache shared by the processes (uvicorn workers, nodes) of the app: CACHE_BACKEND=memory keeps it in the process,
+# CACHE_BACKEND=redis in a server that speaks the Redis protocol (REDIS_URL).
+#
+#   value = await get_shared_cache().get_or_compute("top_quiz_boards", compute, ttl_seconds=30)
+#   get_shared_cache().invalidate("top_quiz_boards")
+#
+# A cold key is computed once for the whole cluster: concurrent requests of a process wait for the first of them,
+# and the processes take a lock in the cache, the others polling for the value. Invalidations delete the keys and
+# are broadcast on a pub/sub channel; the other processes hand them to the listeners registered with
+# on_invalidate(), which drop their in-process copies. The invalidating process updates its own state itself.
+# The cache is an optimization: when its server is down, values are computed as if it were empty.
+
+INVALIDATION_CHANNEL = "cache-invalidations"
+# Waiting for the value of a key that another process computes
+LOCK_POLL_SECONDS = 0.05
+# Deletes KEYS[1] if it holds ARGV[1], on the server so that nobody sets it in between
+DELETE_IF_EQUAL_SCRIPT = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) else return 0 end"
+# Reconnecting the subscriber of the invalidations
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 30
+
+
+class CacheError(Exception):
+    pass
+
+
+class CacheBackend:
+    """Where the shared values live. Values are bytes; keys expire after their TTL."""
+
+    # Whether the operations do network I/O, and must be kept off the event loop
+    blocking = False
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl_seconds: float) -> bool:
+        """Set the key only if it doesn't exist. Returns whether it was set."""
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def delete_if_equal(self, key: str, value: bytes) -> bool:
+        """Delete the key only if it holds value, atomically. Returns whether it was deleted."""
+        raise NotImplementedError
+
+    def publish(self, channel: str, message: bytes) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, channel: str, callback: Callable[[Optional[bytes]], None]) -> Callable[[], None]:
+        """
+        Call callback(message) for every message published on the channel, and callback(None) when messages
+        may have been missed (a reconnection). Returns a function that stops the subscription.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process backend. Its channels reach the subscribers of the same instance.
+    Holds at most max_bytes of keys and values: past them, the expired entries are dropped, then the least recently used.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = settings.CACHE_MEMORY_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._values: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()  # key -> (value, expiry on the monotonic clock), least recently used first
+        self._bytes = 0
+        self._subscribers: Dict[str, List[Callable[[Optional[bytes]], None]]] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._values.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        with self._lock:
+            self._store(key, value, ttl_seconds)
+
+    def add(self, key: str, value: bytes, ttl_seconds: float) -> bool:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return False
+            self._store(key, value, ttl_seconds)
+            return True
+
+    def _store(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._remove(key)
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        self._values[key] = (value, time.monotonic() + ttl_seconds)
+        self._bytes += size
+        if self._bytes > self.max_bytes:
+            now = time.monotonic()
+            for expired in [key for key, (_, expiry) in self._values.items() if expiry <= now]:
+                self._remove(expired)
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._values)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._values.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(key) + len(entry[0])
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def delete_if_equal(self, key: str, value: bytes) -> bool:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry[0] != value or entry[1] <= time.monotonic():
+                return False
+            self._remove(key)
+            return True
+
+    def publish(self, channel: str, message: bytes) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for callback in subscribers:
+            callback(message)
+
+    def subscribe(self, channel: str, callback: Callable[[Optional[bytes]], None]) -> Callable[[], None]:
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+        def stop() -> None:
+            with self._lock:
+                if callback in self._subscribers.get(channel, []):
+                    self._subscribers[channel].remove(callback)
+        return stop
+
+
+class _RedisConnection:
+    """A connection speaking RESP, the protocol of Redis (and of Valkey, KeyDB, Dragonfly...)."""
+
+    def __init__(self, host: str, port: int, password: Optional[str], db: int, timeout: Optional[float]):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile("rb")
+        if password:
+            self.command("AUTH", password)
+        if db:
+            self.command("SELECT", db)
+
+    def send(self, *args) -> None:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+
+    def read(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection to the cache server closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise CacheError(rest.decode(errors="replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection to the cache server closed")
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read() for _ in range(length)]
+        raise CacheError(f"Unexpected reply from the cache server: {line!r}")
+
+    def command(self, *args):
+        self.send(*args)
+        return self.read()
+
+    def close(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
+
+
+class RedisCache(CacheBackend):
+    """Backend on a Redis-protocol server, e.g. redis://:password@localhost:6379/0. Idle connections are pooled."""
+
+    blocking = True
+
+    def __init__(self, url: str, timeout_seconds: float = 0.5, max_idle_connections: int = 8):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported cache URL: {url}")
+        self._host = parsed.hostname or "localhost"
+        self._port = parsed.port or 6379
+        self._password = unquote(parsed.password) if parsed.password else None
+        self._db = int(parsed.path.lstrip("/") or 0)
+        self._timeout = timeout_seconds
+        self._max_idle = max_idle_connections
+        self._lock = threading.Lock()
+        self._idle: List[_RedisConnection] = []
+
+    def _connect(self, timeout: Optional[float]) -> _RedisConnection:
+        return _RedisConnection(self._host, self._port, self._password, self._db, timeout)
+
+    def _execute(self, *args):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect(self._timeout)
+        try:
+            reply = connection.command(*args)
+        except CacheError:
+            # An error reply: the connection is still in a clean state
+            self._release(connection)
+            raise
+        except BaseException:
+            connection.close()
+            raise
+        self._release(connection)
+        return reply
+
+    def _release(self, connection: _RedisConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self._max_idle:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._execute("GET", key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._execute("SET", key, value, "PX", max(1, int(ttl_seconds * 1000)))
+
+    def add(self, key: str, value: bytes, ttl_seconds: float) -> bool:
+        return self._execute("SET", key, value, "PX", max(1, int(ttl_seconds * 1000)), "NX") is not None
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._execute("DEL", *keys)
+
+    def delete_if_equal(self, key: str, value: bytes) -> bool:
+        return self._execute("EVAL", DELETE_IF_EQUAL_SCRIPT, 1, key, value) == 1
+
+    def publish(self, channel: str, message: bytes) -> None:
+        self._execute("PUBLISH", channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[Optional[bytes]], None]) -> Callable[[], None]:
+        stopped = threading.Event()
+        current: List[_RedisConnection] = []
+
+        def listen() -> None:
+            delay = RECONNECT_MIN_SECONDS
+            subscribed_before = False
+            while not stopped.is_set():
+                try:
+                    # No timeout: the connection waits for messages
+                    connection = self._connect(None)
+                    current[:] = [connection]
+                    if stopped.is_set():
+                        break
+                    connection.command("SUBSCRIBE", channel)
+                    if subscribed_before:
+                        callback(None)
+                    subscribed_before = True
+                    delay = RECONNECT_MIN_SECONDS
+                    while True:
+                        reply = connection.read()
+                        if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                            callback(reply[2])
+                except Exception as e:
+                    if stopped.is_set():
+                        break
+                    logger.warning(f"Lost the subscription to cache channel {channel}, reconnecting in {delay:.1f} s: {str(e)}")
+                    stopped.wait(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+                finally:
+                    for connection in current:
+                        connection.close()
+                    current.clear()
+
+        thread = threading.Thread(target=listen, name=f"cache-subscriber-{channel}", daemon=True)
+        thread.start()
+
+        def stop() -> None:
+            stopped.set()
+            for connection in list(current):
+                connection.close()
+            thread.join(timeout=5)
+        return stop
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+# Listeners of the invalidations made by the other processes: (key prefix, callback(key)).
+# The key "*" means that invalidations may have been missed, and that every copy should be dropped.
+_listeners: List[Tuple[str, Callable[[str], None]]] = []
+
+
+def on_invalidate(prefix: str, callback: Callable[[str], None]) -> None:
+    """Call callback(key) when another process invalidates a key that starts with prefix (or with "*")."""
+    _listeners.append((prefix, callback))
+
+
+class SharedCache:
+    """The cache of the app on a backend, with request coalescing and the broadcast of invalidations."""
+
+    def __init__(self, backend: CacheBackend, key_prefix: str = "", listeners: Optional[List[Tuple[str, Callable[[str], None]]]] = None, lock_seconds: float = 10):
+        self.backend = backend
+        self.key_prefix = key_prefix
+        self.lock_seconds = lock_seconds
+        self._listeners = _listeners if listeners is None else listeners
+        self._origin = uuid.uuid4().hex  # Tells this process's invalidations from the others'
+        self._computing: Dict[str, asyncio.Future] = {}
+        self._stop_listening: Optional[Callable[[], None]] = None
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[bytes]], ttl_seconds: float) -> bytes:
+        """The value of the key, computed by compute() and cached for ttl_seconds when it isn't cached."""
+        value = await self._call(self.backend.get, self.key_prefix + key, default=None)
+        if value is not None:
+            metrics.increment("cache_hits_total", kind=_kind(key))
+            return value
+        metrics.increment("cache_misses_total", kind=_kind(key))
+
+        future = self._computing.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The request that was computing it went away; take over
+                return await self.get_or_compute(key, compute, ttl_seconds)
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting for it
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._computing[key] = future
+        try:
+            value = await self._compute_once(key, compute, ttl_seconds)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._computing.pop(key, None)
+        future.set_result(value)
+        return value
+
+    async def _compute_once(self, key: str, compute: Callable[[], Awaitable[bytes]], ttl_seconds: float) -> bytes:
+        # Compute the value in one process of the cluster; the others wait for it, up to lock_seconds
+        lock_key = f"{self.key_prefix}{key}:lock"
+        deadline = time.monotonic() + self.lock_seconds
+        while True:
+            locked = await self._call(self.backend.add, lock_key, self._origin.encode(), self.lock_seconds, default=True)
+            if locked:
+                break
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            value = await self._call(self.backend.get, self.key_prefix + key, default=None)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                # Its process died or is too slow
+                metrics.increment("cache_lock_timeouts_total", kind=_kind(key))
+                break
+
+        try:
+            value = await compute()
+            await self._call(self.backend.set, self.key_prefix + key, value, ttl_seconds, default=None)
+            return value
+        finally:
+            # Unless the lock expired and another process holds it now, or it was never ours (the wait timed out)
+            if locked:
+                await self._call(self.backend.delete_if_equal, lock_key, self._origin.encode(), default=None)
+
+    def invalidate(self, *keys: str) -> None:
+        """Delete the keys and tell the other processes. Blocks on the network with the Redis backend: from async code, run it in the threadpool."""
+        try:
+            self.backend.delete(*(self.key_prefix + key for key in keys))
+            self.backend.publish(self.key_prefix + INVALIDATION_CHANNEL, json.dumps({"origin": self._origin, "keys": list(keys)}).encode())
+        except (CacheError, OSError) as e:
+            metrics.increment("cache_errors_total")
+            logger.warning(f"Failed to invalidate the cache keys {list(keys)}: {str(e)}")
+
+    def start_listening(self) -> None:
+        """Hand the invalidations of the other processes to the listeners, until stop_listening()."""
+        if self._stop_listening is None:
+            self._stop_listening = self.backend.subscribe(self.key_prefix + INVALIDATION_CHANNEL, self._on_message)
+
+    def stop_listening(self) -> None:
+        if self._stop_listening is not None:
+            self._stop_listening()
+            self._stop_listening = None
+
+    def _on_message(self, message: Optional[bytes]) -> None:
+        if message is None:
+            keys = ["*"]
+        else:
+            try:
+                payload = json.loads(message)
+            except ValueError:
+                logger.warning(f"Ignoring an invalid cache invalidation: {message!r}")
+                return
+            if payload.get("origin") == self._origin:
+                return
+            keys = payload.get("keys", [])
+
+        for key in keys:
+            for prefix, callback in list(self._listeners):
+                if key == "*" or key.startswith(prefix):
+                    try:
+                        callback(key)
+                    except Exception as e:
+                        logger.error(f"Cache invalidation listener of {prefix} failed on {key}: {str(e)}")
+
+    async def _call(self, operation: Callable, *args, default):
+        try:
+            if self.backend.blocking:
+                return await asyncio.to_thread(operation, *args)
+            return operation(*args)
+        except (CacheError, OSError) as e:
+            metrics.increment("cache_errors_total")
+            logger.warning(f"Cache operation {operation.__name__} failed: {str(e)}")
+            return default
+
+
+def _kind(key: str) -> str:
+    # The kind of a key, for the metrics: "board" for "board:42"
+    return key.split(":", 1)[0]
+
+
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def create_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCache()
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(settings.REDIS_URL, settings.CACHE_TIMEOUT_SECONDS)
+    raise ValueError(f"Unsupported CACHE_BACKEND: {settings.CACHE_BACKEND}")
+
+
+def get_shared_cache() -> SharedCache:
+    """The process-wide shared cache, on the CACHE_BACKEND."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = SharedCache(create_backend(), settings.CACHE_KEY_PREFIX, lock_seconds=settings.CACHE_LOCK_SECONDS)
+    return _shared_cache
@@ -1,4 +1,5 @@
 import os
+from typing import List
 # from pydantic import BaseSettings
 from dotenv import load_dotenv
 
@@ -7,6 +8,123 @@ load_dotenv()
 class Settings:
     POSTGRES_DSN: str = os.getenv("POSTGRES_DSN")
     SQLITE_LOCAL_DSN: str = os.getenv("SQLITE_LOCAL_DSN")
+    # Database: "sqlite" (SQLITE_LOCAL_DSN) or "postgres" (POSTGRES_DSN)
+    DATABASE_BACKEND: str = os.getenv("DATABASE_BACKEND", "sqlite")
+    # Connection pools of the PostgreSQL backend. Requests and background workers have a pool each, so a process
+    # opens at most DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_WORKER_POOL_SIZE + DB_MAX_OVERFLOW connections.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_WORKER_POOL_SIZE: int = int(os.getenv("DB_WORKER_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))  # Wait for a free connection before failing
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))  # Replace connections older than this, before a proxy or the server drops them
+    # SQLite backend: read-only requests share SQLITE_READ_POOL_SIZE connections, the other requests take turns on a single writer
+    SQLITE_READ_POOL_SIZE: int = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # Wait for a lock this long before "database is locked"
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))  # Page cache of each connection
+    SQLITE_MMAP_SIZE_BYTES: int = int(os.getenv("SQLITE_MMAP_SIZE_BYTES", str(256 * 1024 * 1024)))
+    # In-process cache of the categories and questions of the boards being played, bounded by their estimated size.
+    # The BOARD_CACHE_WARM_COUNT most played boards are loaded at startup.
+    BOARD_CACHE_MAX_BYTES: int = int(os.getenv("BOARD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    BOARD_CACHE_WARM_COUNT: int = int(os.getenv("BOARD_CACHE_WARM_COUNT", "200"))
+    # GET /api/quiz-boards/top is cached this long by browsers and nginx, then revalidated with its ETag
+    TOP_QUIZ_BOARDS_MAX_AGE_SECONDS: int = int(os.getenv("TOP_QUIZ_BOARDS_MAX_AGE_SECONDS", "10"))
+    # Static JSON snapshots of the public content of the boards (no answers), written when a board is saved and
+    # served by the nginx frontend at /boards/<id>.json. Backfill: python -m app.services.board_snapshots --backfill
+    BOARD_SNAPSHOTS_ENABLED: bool = os.getenv("BOARD_SNAPSHOTS_ENABLED", "false").lower() == "true"
+    BOARD_SNAPSHOTS_DIR: str = os.getenv("BOARD_SNAPSHOTS_DIR", "board_snapshots")
+    # Cache shared by the processes of the app: "memory" (in the process) or "redis" (a Redis-protocol server at REDIS_URL)
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_MEMORY_MAX_BYTES: int = int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(16 * 1024 * 1024)))  # Of the "memory" backend; least recently used values are dropped
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    CACHE_KEY_PREFIX: str = os.getenv("CACHE_KEY_PREFIX", "jeopardyze:")
+    CACHE_TIMEOUT_SECONDS: float = float(os.getenv("CACHE_TIMEOUT_SECONDS", "0.5"))  # Of a cache operation; past it, the value is computed
+    CACHE_LOCK_SECONDS: float = float(os.getenv("CACHE_LOCK_SECONDS", "10"))  # Max wait for a value that another process computes
+    BOARD_SHARED_CACHE_SECONDS: int = int(os.getenv("BOARD_SHARED_CACHE_SECONDS", "86400"))
+    # The first TOP_QUIZ_BOARDS_CACHED top boards are cached; they are invalidated by new boards and completed games
+    TOP_QUIZ_BOARDS_CACHED: int = int(os.getenv("TOP_QUIZ_BOARDS_CACHED", "100"))
+    TOP_QUIZ_BOARDS_CACHE_SECONDS: int = int(os.getenv("TOP_QUIZ_BOARDS_CACHE_SECONDS", "30"))
+    # Fail the requests that run more SQL statements than their endpoint's declared budget (development, tests); otherwise they are logged
+    QUERY_BUDGET_ENFORCED: bool = os.getenv("QUERY_BUDGET_ENFORCED", "false").lower() == "true"
+
+    # LLM provider: "openai", or "fake" for a local deterministic stand-in (load tests, benchmarks, CI)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    FAKE_LLM_LATENCY_MS: int = int(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+    FAKE_LLM_JITTER_MS: int = int(os.getenv("FAKE_LLM_JITTER_MS", "0"))
+    FAKE_LLM_FAILURE_RATE: float = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))  # Deadline of a single LLM call
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "1"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))  # Size of the shared connection pool
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"  # Send a second request when the first is slower than p95
+    LLM_HEDGE_MIN_DELAY_MS: int = int(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "2000"))
+    LLM_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))  # Consecutive failures that open the circuit
+    LLM_BREAKER_RESET_SECONDS: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    LLM_OUTPUT_RETRIES: int = int(os.getenv("LLM_OUTPUT_RETRIES", "1"))  # Retries of a call whose output is invalid even after repair
+    # Record/replay store of LLM responses, keyed by prompt hash: "off", "record", "replay" or "cache"
+    LLM_REPLAY_MODE: str = os.getenv("LLM_REPLAY_MODE", "off")
+    LLM_REPLAY_DIR: str = os.getenv("LLM_REPLAY_DIR", "llm_cache")
+
+    # Quiz board generation
+    GENERATION_WORKERS: int = int(os.getenv("GENERATION_WORKERS", "2"))  # Max concurrent quiz board generations
+    GENERATION_JOB_HEARTBEAT_SECONDS: float = float(os.getenv("GENERATION_JOB_HEARTBEAT_SECONDS", "15"))  # How often a process vouches for its jobs and bulk generation runs
+    GENERATION_JOB_STALE_SECONDS: float = float(os.getenv("GENERATION_JOB_STALE_SECONDS", "60"))  # Jobs and runs without a heartbeat for this long are claimed by another process
+    LLM_CATEGORY_PARALLELISM: int = int(os.getenv("LLM_CATEGORY_PARALLELISM", "3"))  # Max concurrent LLM calls per generation, one per category
+    TOPIC_REUSE_SIMILARITY: float = float(os.getenv("TOPIC_REUSE_SIMILARITY", "0.85"))  # Reuse an existing board for topics at least this similar
+    TOPIC_SUGGEST_SIMILARITY: float = float(os.getenv("TOPIC_SUGGEST_SIMILARITY", "0.5"))  # Suggest existing boards for topics at least this similar
+
+    # Boards from documents: uploads are spooled to disk past DOCUMENT_SPOOL_MEMORY_BYTES, and read chunk by chunk
+    DOCUMENT_MAX_UPLOAD_BYTES: int = int(os.getenv("DOCUMENT_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+    DOCUMENT_SPOOL_MEMORY_BYTES: int = int(os.getenv("DOCUMENT_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+    DOCUMENT_CHUNK_CHARS: int = int(os.getenv("DOCUMENT_CHUNK_CHARS", "8000"))  # Size of the chunks that facts are extracted from
+    DOCUMENT_MAX_CHUNKS: int = int(os.getenv("DOCUMENT_MAX_CHUNKS", "32"))  # The rest of a longer document is left out
+    DOCUMENT_MAP_PARALLELISM: int = int(os.getenv("DOCUMENT_MAP_PARALLELISM", "4"))  # Max concurrent fact extractions per document
+    DOCUMENT_FACTS_PER_CHUNK: int = int(os.getenv("DOCUMENT_FACTS_PER_CHUNK", "12"))
+
+    # Admission control of quiz board generation and guest creation
+    GENERATION_RATE_PER_PLAYER_PER_MINUTE: float = float(os.getenv("GENERATION_RATE_PER_PLAYER_PER_MINUTE", "2"))
+    GENERATION_BURST_PER_PLAYER: int = int(os.getenv("GENERATION_BURST_PER_PLAYER", "3"))
+    GENERATION_RATE_PER_IP_PER_MINUTE: float = float(os.getenv("GENERATION_RATE_PER_IP_PER_MINUTE", "6"))
+    GENERATION_BURST_PER_IP: int = int(os.getenv("GENERATION_BURST_PER_IP", "10"))
+    GUEST_RATE_PER_IP_PER_MINUTE: float = float(os.getenv("GUEST_RATE_PER_IP_PER_MINUTE", "5"))
+    GUEST_BURST_PER_IP: int = int(os.getenv("GUEST_BURST_PER_IP", "10"))
+    GENERATION_MAX_QUEUE: int = int(os.getenv("GENERATION_MAX_QUEUE", "20"))  # Shed new generations beyond this many pending jobs
+    GENERATION_MAX_STREAMS: int = int(os.getenv("GENERATION_MAX_STREAMS", "4"))  # Max concurrent streamed generations
+    TRUST_PROXY_HEADERS: bool = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"  # Take the client IP from nginx's X-Real-IP
+    # Addresses or networks of the proxies whose X-Real-IP is trusted; from anywhere else the header could be forged
+    TRUSTED_PROXIES: List[str] = [proxy.strip() for proxy in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if proxy.strip()]
+
+    # Bulk generation (POST /api/quiz-boards/bulk and `python -m app.services.bulk_generation_service`).
+    # Defaults for the budget of a run; keep them below the LLM account's limits to leave room for players.
+    BULK_GENERATION_CONCURRENCY: int = int(os.getenv("BULK_GENERATION_CONCURRENCY", "4"))  # Max boards generated at once by a run
+    BULK_GENERATION_REQUESTS_PER_MINUTE: float = float(os.getenv("BULK_GENERATION_REQUESTS_PER_MINUTE", "200"))
+    BULK_GENERATION_TOKENS_PER_MINUTE: float = float(os.getenv("BULK_GENERATION_TOKENS_PER_MINUTE", "100000"))
+
+    # Speculative generation: while a game is in progress, boards for the topics the player is likely to ask for next
+    # are generated in the background, at low priority and within their own budget, and offered as "play next"
+    SPECULATIVE_GENERATION_ENABLED: bool = os.getenv("SPECULATIVE_GENERATION_ENABLED", "false").lower() == "true"
+    SPECULATIVE_TOPICS_PER_SESSION: int = int(os.getenv("SPECULATIVE_TOPICS_PER_SESSION", "2"))
+    SPECULATIVE_MIN_ANSWERS: int = int(os.getenv("SPECULATIVE_MIN_ANSWERS", "3"))  # Answered questions before speculating, so abandoned games cost nothing
+    SPECULATIVE_REQUESTS_PER_MINUTE: float = float(os.getenv("SPECULATIVE_REQUESTS_PER_MINUTE", "30"))
+    SPECULATIVE_TOKENS_PER_MINUTE: float = float(os.getenv("SPECULATIVE_TOKENS_PER_MINUTE", "15000"))
+
+    # Group commit of answers: the answers of concurrent requests are written in one transaction, ANSWER_BATCH_WINDOW_MS
+    # after the first of them or as soon as there are ANSWER_BATCH_MAX_SIZE, which bounds the latency it adds
+    ANSWER_BATCHING_ENABLED: bool = os.getenv("ANSWER_BATCHING_ENABLED", "false").lower() == "true"
+    ANSWER_BATCH_WINDOW_MS: float = float(os.getenv("ANSWER_BATCH_WINDOW_MS", "5"))
+    ANSWER_BATCH_MAX_SIZE: int = int(os.getenv("ANSWER_BATCH_MAX_SIZE", "64"))
+
+    # Daily news boards, generated off-peak by a background scheduler from the headlines of a feed source
+    NEWS_SCHEDULER_ENABLED: bool = os.getenv("NEWS_SCHEDULER_ENABLED", "true").lower() == "true"
+    NEWS_FEED_SOURCE: str = os.getenv("NEWS_FEED_SOURCE", "file")  # "file": RSS/Atom/JSON files in NEWS_FEED_PATH
+    NEWS_FEED_PATH: str = os.getenv("NEWS_FEED_PATH", "news_feed")  # A feed file, or a directory of them
+    NEWS_GENERATION_HOUR: int = int(os.getenv("NEWS_GENERATION_HOUR", "4"))  # Local hour at which the day's boards are generated
+    NEWS_RETRY_MINUTES: float = float(os.getenv("NEWS_RETRY_MINUTES", "30"))  # Wait before trying again when the feed is empty or generation failed
+    NEWS_CLAIM_MINUTES: float = float(os.getenv("NEWS_CLAIM_MINUTES", "30"))  # A process that claimed the day's generation and died is taken over after this
+    NEWS_BOARDS_PER_DAY: int = int(os.getenv("NEWS_BOARDS_PER_DAY", "1"))
+    NEWS_HEADLINES_PER_BOARD: int = int(os.getenv("NEWS_HEADLINES_PER_BOARD", "20"))
+
+    # Usernames of the logged in users allowed to use the admin endpoints, comma-separated
+    ADMIN_USERNAMES: List[str] = [name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()]
 
 class Secrets:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
@@ -0,0 +1,45 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+# Conditional GETs. An endpoint derives a strong ETag from what its response depends on (a version counter, a content
+# hash), preferably before building the response, and answers 304 Not Modified when the client already has it:
+#
+#   tag = etag("game_session", game_session_id, answered_count)
+#   if not_modified(request, tag):
+#       return not_modified_response(tag, PRIVATE_REVALIDATE)
+#   ...
+#   cache_headers(response, tag, PRIVATE_REVALIDATE)
+
+# Per player and changing: the browser keeps it, but asks again every time (a 304 when nothing changed)
+PRIVATE_REVALIDATE = "private, no-cache"
+# Per player and never changing
+PRIVATE_IMMUTABLE = "private, max-age=31536000, immutable"
+
+
+def shared(max_age_seconds: int) -> str:
+    """The same for every player: browsers and the nginx frontend may reuse it for max_age_seconds."""
+    return f"public, max-age={max_age_seconds}"
+
+
+def etag(*parts) -> str:
+    """A strong ETag of the parts, which must identify the content of the response."""
+    return '"' + hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:32] + '"'
+
+
+def not_modified(request: Request, tag: str) -> bool:
+    """Whether the request's If-None-Match matches the ETag (weak comparison, as for every GET)."""
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or tag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def not_modified_response(tag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": tag, "Cache-Control": cache_control})
+
+
+def cache_headers(response: Response, tag: str, cache_control: str) -> None:
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = cache_control
@@ -0,0 +1,42 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Tuple
+
+# Process-wide counters, exposed in the Prometheus text format at GET /metrics.
+#
+#   metrics.increment("llm_output_total", task="outline")
+#
+# Rates (e.g. the share of LLM outputs that needed a repair) are derived from the counters by the scraper.
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            self._counters[key] += amount
+
+    def get(self, name: str, **labels: str) -> float:
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+
+        lines = []
+        for (name, labels), value in counters:
+            label_text = ",".join(f'{label}="{value}"' for label, value in labels)
+            lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
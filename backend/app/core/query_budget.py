@@ -0,0 +1,57 @@
+from contextvars import ContextVar
+from typing import Callable
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+
+# Endpoints declare how many SQL statements a request may run, whatever the data (a board of any size, a session
+# with any number of answers): dependencies=[Depends(query_budget("game_session", 7))]. A request that runs more
+# has an N+1 query; with QUERY_BUDGET_ENFORCED (the tests, development) its statement fails, otherwise it is
+# logged and counted in query_budget_exceeded_total.
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class _Budget:
+    def __init__(self, name: str, max_queries: int):
+        self.name = name
+        self.max_queries = max_queries
+        self.queries = 0
+
+
+# The budget of the current request. Worker threads and scripts have none.
+_current_budget: ContextVar[_Budget | None] = ContextVar("query_budget", default=None)
+
+
+def query_budget(name: str, max_queries: int) -> Callable:
+    """A dependency that puts the rest of the request (its other dependencies included) on a budget of SQL statements."""
+    async def start_budget() -> None:
+        # Async, so that the budget is set in the request's context rather than a threadpool copy of it
+        _current_budget.set(_Budget(name, max_queries))
+    return start_budget
+
+
+def leave_budget() -> None:
+    """Stop counting the statements of the current context, e.g. in a task that works for several requests."""
+    _current_budget.set(None)
+
+
+@sa.event.listens_for(sa.engine.Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    # The sessions of a request run their statements in greenlets that share the request's context
+    budget = _current_budget.get()
+    if budget is None:
+        return
+    budget.queries += 1
+    if budget.queries <= budget.max_queries:
+        return
+    message = f"{budget.name}: query {budget.queries} exceeds the budget of {budget.max_queries}: {statement}"
+    if settings.QUERY_BUDGET_ENFORCED:
+        raise QueryBudgetExceeded(message)
+    if budget.queries == budget.max_queries + 1:
+        logger.warning(message)
+        metrics.increment("query_budget_exceeded_total", endpoint=budget.name)
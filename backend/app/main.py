@@ -1,8 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.routers import quiz_boards, game_sessions, auth
+from app.services.game_sessions_service import GameSessionsService
+from app.services.generation_jobs_service import GenerationJobsService
+from app.services.bulk_generation_service import BulkGenerationService
+from app.services.speculative_generation_service import SpeculativeGenerationService
+from app.services.llm_providers import get_llm_provider
+from app.services.news_service import news_scheduler
+from app.core.cache import get_shared_cache
+from app.core.config import settings
+from app.core.metrics import metrics
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Jeopardyze")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Drop the boards that the other processes invalidate, and index their new boards
+    get_shared_cache().start_listening()
+    # Pick up generation jobs that were interrupted by the last shutdown
+    GenerationJobsService.resume_pending_jobs()
+    BulkGenerationService.resume_pending_runs()
+    # Load the most played boards, so that their first game sessions don't wait for them
+    GameSessionsService.warm_up()
+    # Generate the daily news boards off-peak, so that they are ready before players ask for them
+    if settings.NEWS_SCHEDULER_ENABLED:
+        news_scheduler.start()
+    yield
+    news_scheduler.stop()
+    GenerationJobsService.shutdown()
+    BulkGenerationService.shutdown()
+    SpeculativeGenerationService.shutdown()
+    get_shared_cache().stop_listening()
+
+app = FastAPI(title="Jeopardyze", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -27,4 +57,11 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    # The API stays healthy while the LLM provider is down; only quiz generation is degraded
+    provider = get_llm_provider()
+    llm_status = "degraded" if getattr(provider, "degraded", False) or getattr(getattr(provider, "inner", None), "degraded", False) else "ok"
+    return {"status": "healthy", "llm": llm_status}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return metrics.render()
@@ -1,11 +1,15 @@
 # Import all models here    
 from .quiz_board import QuizBoard
+from .quiz_board_source import QuizBoardSource
 from .category import Category
 from .question import Question
 from .question_attempt import QuestionAttempt
 from .user import User
 from .game_session import GameSession
 from .guest import Guest
+from .generation_job import GenerationJob
+from .bulk_generation_run import BulkGenerationRun
+from .news_generation_claim import NewsGenerationClaim
 from .player import Player, PlayerType
 from .base import Base, MyBaseModel
 
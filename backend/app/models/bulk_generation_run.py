@@ -0,0 +1,39 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, String, Integer, Text
+from app.models.base import MyBaseModel, Base
+from sqlalchemy.orm import relationship
+
+class BulkGenerationRun(MyBaseModel):
+    __tablename__ = "bulk_generation_runs"
+
+    topics = Column(Text, nullable=False) # One topic per line
+    total_topics = Column(Integer, nullable=False)
+    num_categories = Column(Integer, nullable=False, default=3)
+    num_questions = Column(Integer, nullable=False, default=4) # Questions per category
+    concurrency = Column(Integer, nullable=False)
+    requests_per_minute = Column(Float, nullable=False)
+    tokens_per_minute = Column(Float, nullable=False)
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False) # Owner of the generated boards
+    status = Column(String(20), default="queued") # queued, running, interrupted, completed, failed
+    next_index = Column(Integer, nullable=False, default=0) # Checkpoint: every topic before this one is done
+    generated = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0) # Topics that already had a board
+    failed = Column(Integer, nullable=False, default=0)
+    failed_topics = Column(Text, nullable=True) # One topic per line, to be retried in another run
+    error = Column(Text, nullable=True)
+    active_seconds = Column(Float, nullable=False, default=0) # Time spent running, over all resumes
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    owner = Column(String(100), nullable=True) # The process executing the run, if any (see bulk_generation_service)
+    heartbeat_at = Column(DateTime, nullable=True) # Last sign of life of the owner
+
+    # Relationships
+    player = relationship("Player")
+
+    @property
+    def boards_per_minute(self) -> float | None:
+        if not self.active_seconds:
+            return None
+        return round(self.generated * 60 / self.active_seconds, 2)
+
+    def __repr__(self):
+        return f"<BulkGenerationRun(id={self.id}, status={self.status}, progress={self.next_index}/{self.total_topics})>"
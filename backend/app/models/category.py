@@ -6,7 +6,7 @@ class Category(MyBaseModel):
     __tablename__ = "categories"
     
     name = Column(String, nullable=False)
-    quiz_board_id = Column(Integer, ForeignKey("quiz_boards.id"), nullable=False)
+    quiz_board_id = Column(Integer, ForeignKey("quiz_boards.id"), nullable=False, index=True)
 
     # Relationships
     quiz_board = relationship("QuizBoard", back_populates="categories")
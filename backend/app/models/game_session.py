@@ -1,14 +1,24 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, Integer
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, String, Integer
 from app.models.base import MyBaseModel, Base
 from sqlalchemy.orm import relationship
 
 class GameSession(MyBaseModel):
     __tablename__ = "game_sessions"
+    __table_args__ = (
+        # The latest game session of a player on a board (GET /api/game-sessions/existing)
+        Index("ix_game_sessions_quiz_board_player_created", "quiz_board_id", "player_id", "created_at"),
+        # The top score of every board and the number of sessions (GET /api/quiz-boards/top), from the index alone
+        Index("ix_game_sessions_quiz_board_score", "quiz_board_id", "score", "completed_at", "player_id"),
+    )
     
     quiz_board_id = Column(Integer, ForeignKey("quiz_boards.id"), nullable=False)
     player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
     score = Column(Integer, default=0)
+    # Progress, kept up to date by the answers themselves, so that answering never counts rows.
+    # Defaulted in the table too, like the columns added by the 0007_game_session_progress migration
+    total_questions = Column(Integer, nullable=False, default=0, server_default="0")  # Questions of the board, when the session was created
+    answered_count = Column(Integer, nullable=False, default=0, server_default="0")
     started_at = Column(DateTime, default=datetime.now)
     completed_at = Column(DateTime, nullable=True)
     status = Column(String(20), default="in_progress")
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, DateTime, ForeignKey, String, Integer, Text
+from app.models.base import MyBaseModel, Base
+from sqlalchemy.orm import relationship
+
+class GenerationJob(MyBaseModel):
+    __tablename__ = "generation_jobs"
+
+    source_type = Column(String(20), nullable=False, default="topic") # topic, document
+    topic = Column(Text, nullable=False) # The topic, or the file name of the document
+    num_categories = Column(Integer, nullable=False, default=3)
+    num_questions = Column(Integer, nullable=False, default=4) # Questions per category
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    status = Column(String(20), default="queued") # queued, running, completed, failed
+    quiz_board_id = Column(Integer, ForeignKey("quiz_boards.id"), nullable=True)
+    game_session_id = Column(Integer, ForeignKey("game_sessions.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    queue_wait_ms = Column(Integer, nullable=True) # Time spent waiting for a free worker
+    duration_ms = Column(Integer, nullable=True) # Time spent generating, once a worker picked the job up
+    owner = Column(String(100), nullable=True) # The process that runs the job (see generation_jobs_service)
+    heartbeat_at = Column(DateTime, nullable=True) # Last sign of life of the owner, while the job is queued or running
+
+    # Relationships
+    player = relationship("Player")
+    quiz_board = relationship("QuizBoard")
+    game_session = relationship("GameSession")
+
+    def __repr__(self):
+        return f"<GenerationJob(id={self.id}, status={self.status}, topic={self.topic}, quiz_board_id={self.quiz_board_id})>"
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Date, DateTime, String
+from app.models.base import MyBaseModel
+
+class NewsGenerationClaim(MyBaseModel):
+    __tablename__ = "news_generation_claims"
+
+    news_date = Column(Date, nullable=False, unique=True) # One claim per day: a single process generates its boards
+    owner = Column(String(100), nullable=False) # The process generating the boards of the day (see news_service)
+    claimed_until = Column(DateTime, nullable=False) # Past it, another process may take over
@@ -11,8 +11,8 @@ class Player(MyBaseModel):
     __tablename__ = "players"
     
     player_type = Column(Enum(PlayerType), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    guest_id = Column(Integer, ForeignKey("guests.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    guest_id = Column(Integer, ForeignKey("guests.id"), nullable=True, index=True)
     display_name = Column(String, nullable=False)
 
     # Relationships
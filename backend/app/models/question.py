@@ -5,7 +5,7 @@ from sqlalchemy.orm import relationship
 class Question(MyBaseModel):
     __tablename__ = "questions"
     
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True)
     question_text = Column(String, nullable=False)
     correct_answer = Column(String, nullable=False)
     points = Column(Integer, nullable=False)
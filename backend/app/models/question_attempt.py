@@ -1,10 +1,14 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, Integer
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, String, Integer
 from app.models.base import MyBaseModel, Base
 from sqlalchemy.orm import relationship
 
 class QuestionAttempt(MyBaseModel):
     __tablename__ = "question_attempts"
+    __table_args__ = (
+        # A question is answered once per game session. Also serves the attempts of a game session.
+        Index("uq_question_attempts_game_session_question", "game_session_id", "question_id", unique=True),
+    )
     
     game_session_id = Column(Integer, ForeignKey("game_sessions.id"), nullable=False)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
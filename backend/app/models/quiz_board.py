@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Date, String, Integer, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from app.models.base import MyBaseModel, Base
 
@@ -7,7 +7,10 @@ class QuizBoard(MyBaseModel):
 
     title = Column(String, nullable=False)
     source_type = Column(String, nullable=False)
-    source_content = Column(Text, nullable=False)
+    topic_key = Column(String, nullable=True, index=True) # Normalized topic, for finding existing boards of topic-sourced quizzes
+    num_categories = Column(Integer, nullable=True)
+    num_questions = Column(Integer, nullable=True) # Questions per category
+    news_date = Column(Date, nullable=True, index=True) # Day of the headlines of a news board
     created_by_player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
 
     # Relationships
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, ForeignKey, Integer, LargeBinary, String
+from app.models.base import MyBaseModel, Base
+
+class QuizBoardSource(MyBaseModel):
+    """
+    The content a quiz board was generated from (a topic, a whole document, the day's headlines), compressed.
+    Kept out of the quiz_boards table so that listing and gameplay queries never read it; see source_store.py.
+    """
+    __tablename__ = "quiz_board_sources"
+
+    quiz_board_id = Column(Integer, ForeignKey("quiz_boards.id"), nullable=False, unique=True)
+    encoding = Column(String(10), nullable=False) # zstd, zlib
+    content = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False) # Length of the uncompressed content, in characters
+
+    def __repr__(self):
+        return f"<QuizBoardSource(quiz_board_id={self.quiz_board_id}, encoding={self.encoding}, size={self.size})>"
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import database
 from app.core.database import get_db
+from app.core.admission import admit_guest_creation
 from app.services.auth_service import create_player_token, authenticate_user, create_guest, get_password_hash, ensure_player_exists
 from app.services.email_verify_service import verify_code, send_verification_email
 from app.models.user import User
@@ -21,11 +25,11 @@ router = APIRouter(
     tags=["auth"]
 )
 
-@router.post("/guest", response_model=GuestResponse)
+@router.post("/guest", response_model=GuestResponse, dependencies=[Depends(admit_guest_creation)])
 async def create_guest_endpoint(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> GuestResponse:
-    player = create_guest(db)
+    player = await create_guest(db)
     return GuestResponse(
         access_token=create_player_token(player),
     )
@@ -33,10 +37,10 @@ async def create_guest_endpoint(
 @router.post("/register", response_model=LoginResponse)
 async def register(
     request: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> LoginResponse:
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == request.username).first()
+    existing_user = await db.scalar(select(User).filter(User.username == request.username))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -44,7 +48,7 @@ async def register(
         )
     
     # Check if email already exists
-    existing_email = db.query(User).filter(User.email == request.email).first()
+    existing_email = await db.scalar(select(User).filter(User.email == request.email))
     if existing_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -55,23 +59,22 @@ async def register(
     user = User(
         username=request.username,
         email=request.email,
-        password_hash=get_password_hash(request.password),
+        password_hash=await run_in_threadpool(get_password_hash, request.password),  # bcrypt is slow on purpose; keep it off the event loop
         is_verified=False
     )
     db.add(user)
-    db.flush()  # Flush to get the user ID
     
     # Create player profile for the user
     player = Player(
         player_type=PlayerType.USER,
-        user_id=user.id,
+        user=user,
         display_name=user.username
     )
     db.add(player)
-    db.commit()
+    await db.commit()
     
-    # Send verification email
-    send_verification_email(db, request.email)
+    # Send verification email. Mailgun is called with blocking HTTP, so on a worker thread with a session of its own
+    await run_in_threadpool(_send_verification_email, request.email)
     
     token = create_player_token(player)
     return LoginResponse(
@@ -82,10 +85,10 @@ async def register(
 @router.post("/verify-email", response_model=VerifyEmailResponse)
 async def verify_email(
     request: VerifyEmailRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> VerifyEmailResponse:
     # Find user by email
-    user = db.query(User).filter(User.email == request.email).first()
+    user = await db.scalar(select(User).filter(User.email == request.email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -93,7 +96,7 @@ async def verify_email(
         )
     
     # Verify the code
-    if not verify_code(db, request.email, request.code):
+    if not await db.run_sync(verify_code, request.email, request.code):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid verification code"
@@ -101,10 +104,10 @@ async def verify_email(
     
     # Mark user as verified
     user.is_verified = True
-    db.commit()
+    await db.commit()
     
     # Create new token for verified user
-    player = ensure_player_exists(db, user)
+    player = await ensure_player_exists(db, user)
     token = create_player_token(player)
     
     return VerifyEmailResponse(
@@ -116,9 +119,9 @@ async def verify_email(
 @router.post("/login", response_model=LoginResponse)
 async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> LoginResponse:
-    user = authenticate_user(db, request.username_or_email, request.password)
+    user = await authenticate_user(db, request.username_or_email, request.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -126,10 +129,18 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    player = ensure_player_exists(db, user)
+    player = await ensure_player_exists(db, user)
     token = create_player_token(player)
 
     return LoginResponse(
         access_token=token,
         is_verified=user.is_verified
-    ) 
\ No newline at end of file
+    )
+
+
+def _send_verification_email(email: str) -> None:
+    db_session = database.Session()
+    try:
+        send_verification_email(db_session, email)
+    finally:
+        db_session.close()
@@ -1,13 +1,18 @@
 from typing import List, Dict, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.logging import logger
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.auth import get_current_player
+from app.core.http_cache import PRIVATE_REVALIDATE, cache_headers, etag, not_modified, not_modified_response
+from app.core.query_budget import query_budget
 from app.models import Question, QuizBoard, Player, GameSession
 from app.schemas import GameSessionResponse, AnswerQuestionResponse, AnswerQuestionRequest
 from app.services.game_sessions_service import GameSessionsService
+from app.services.speculative_generation_service import SpeculativeGenerationService
 
 
 router = APIRouter(
@@ -15,10 +20,10 @@ router = APIRouter(
     tags=["game-sessions"]
 )
 
-@router.get("/existing")
+@router.get("/existing", dependencies=[Depends(query_budget("existing_game_session", 4))])
 async def get_existing_game_session(
     quiz_board_id: int = Query(..., description="ID of the quiz board"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_player: Player = Depends(get_current_player)
 ) -> Dict:
     """
@@ -26,15 +31,15 @@ async def get_existing_game_session(
     Returns None if no active session exists.
     """
     # Verify quiz board exists
-    quiz_board = db.query(QuizBoard).filter(QuizBoard.id == quiz_board_id).first()
+    quiz_board = await db.get(QuizBoard, quiz_board_id)
     if not quiz_board:
         raise HTTPException(status_code=404, detail=f"Quiz board with id '{quiz_board_id}' not found")
 
     # Find game session for this player and quiz board
-    game_session = db.query(GameSession).filter(
+    game_session = await db.scalar(select(GameSession).filter(
         GameSession.quiz_board_id == quiz_board_id,
         GameSession.player_id == current_player.id
-    ).order_by(GameSession.created_at.desc()).first()
+    ).order_by(GameSession.created_at.desc()).limit(1))
 
     if not game_session:
         return {}
@@ -43,50 +48,64 @@ async def get_existing_game_session(
         "game_session_id": game_session.id
     }
 
-@router.get("/{game_session_id}", response_model=GameSessionResponse)
+def game_session_etag(game_session_id: int, started_at: datetime, answered_count: int) -> str:
+    return etag("game_session", game_session_id, started_at, answered_count, SpeculativeGenerationService.get_play_next_ids(game_session_id))
+
+# Authentication (2), the version when revalidating (1), the session (2, or 4 when its board isn't cached) and its play next boards (1)
+@router.get("/{game_session_id}", response_model=GameSessionResponse, dependencies=[Depends(query_budget("get_game_session", 8))])
 async def get_game_session(
     game_session_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_player: Player = Depends(get_current_player)
 ) -> GameSessionResponse:
-    game_session = db.query(GameSession).filter(GameSession.id == game_session_id).first()
-    if not game_session:
-        raise HTTPException(status_code=404, detail="Game session not found")
-    
-    # Verify that the current player owns this game session
-    if game_session.player_id != current_player.id:
-        raise HTTPException(status_code=403, detail="Not authorized to access this game session")
-    
-    game_session_response = GameSessionsService.build_game_session_response(game_session)
+    """
+    The frontend polls the game session; its browser revalidates with If-None-Match, and gets a 304 after
+    a single query as long as no question was answered.
+    """
+    if "if-none-match" in request.headers:
+        started_at, answered_count = await GameSessionsService.get_game_session_version(game_session_id, current_player, db)
+        tag = game_session_etag(game_session_id, started_at, answered_count)
+        if not_modified(request, tag):
+            return not_modified_response(tag, PRIVATE_REVALIDATE)
+
+    game_session, board = await GameSessionsService.get_game_session(game_session_id, current_player, db)
+    game_session_response = GameSessionsService.build_game_session_response(game_session, board)
+    game_session_response.play_next = await SpeculativeGenerationService.get_play_next(game_session.id, db)
+    cache_headers(response, game_session_etag(game_session.id, game_session.started_at, game_session.answered_count), PRIVATE_REVALIDATE)
     return game_session_response
 
 
 @router.post("/new-from-quiz-board/{quiz_board_id}")
 async def create_game_session_from_quiz_board(
     quiz_board_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_player: Player = Depends(get_current_player)
 ) -> Dict:
-    quiz_board = db.query(QuizBoard).filter(QuizBoard.id == quiz_board_id).first()
+    quiz_board = await db.get(QuizBoard, quiz_board_id)
     if not quiz_board:
         logger.error(f"Couldn't create Game Session because Quiz board with id '{quiz_board_id}' not found")
         raise HTTPException(status_code=404, detail="Couldn't create Game Session because Quiz board with id '{quiz_board_id}' not found")
     
-    game_session = GameSessionsService.create_from_quiz_board(quiz_board, current_player, db)
+    game_session = await db.run_sync(lambda session: GameSessionsService.create_from_quiz_board(quiz_board, current_player, session))
     return {
         "game_session_id": game_session.id
     }
 
 
-@router.post("/{game_session_id}/answer-question/{question_id}", response_model=AnswerQuestionResponse)
+# Authentication (2) and the answer (3)
+@router.post("/{game_session_id}/answer-question/{question_id}", response_model=AnswerQuestionResponse, dependencies=[Depends(query_budget("answer_question", 5))])
 async def answer_question(
     game_session_id: int, 
     question_id: int, 
     answer_request: AnswerQuestionRequest, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     current_player: Player = Depends(get_current_player)
 ) -> AnswerQuestionResponse:
     logger.info(f"Answering question '{question_id}' for game session '{game_session_id}' with answer: '{answer_request.answer}'")
-    response = GameSessionsService.answer_question(game_session_id, question_id, answer_request.answer, db, current_player)
+    response = await GameSessionsService.answer_question(game_session_id, question_id, answer_request.answer, db, current_player)
+    # Get the player's likely next boards ready while they play (when enabled)
+    SpeculativeGenerationService.on_question_answered(game_session_id, response.answered_count, response.game_status)
     logger.info(f"Response: '{response}'")
     return response
\ No newline at end of file
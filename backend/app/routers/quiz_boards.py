@@ -1,12 +1,26 @@
-from typing import Optional, List, Dict
-from fastapi import APIRouter, Depends, Form, File, HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from typing import Optional, List, Dict, Iterator, Callable
+import json
+import threading
+from fastapi import APIRouter, Depends, Form, File, HTTPException, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.core.auth import get_current_player
+from app.core import database
+from app.core.database import get_db, get_read_db
+from app.core.logging import logger
+from app.core.auth import get_current_player, get_current_admin
+from app.core.http_cache import PRIVATE_IMMUTABLE, cache_headers, etag, not_modified, not_modified_response, shared
+from app.core.query_budget import query_budget
+from app.core.admission import admit_generation, acquire_generation_stream, refund_generation, release_generation_stream
 from app.models import QuizBoard, Player
-from app.schemas import QuizBoardPydanticModel, TopQuizBoardsResponse, QuizBoardPydanticModel
-from app.services.quiz_board_service import QuizBoardService
+from app.core.config import settings
+from app.schemas import QuizBoardPydanticModel, TopQuizBoardsResponse, QuizBoardPydanticModel, GenerationJobResponse, SimilarQuizBoardModel, BulkGenerationRunResponse, QuizBoardSourceResponse
+from app.services.quiz_board_service import QuizBoardService, DEFAULT_NUM_CATEGORIES, DEFAULT_NUM_QUESTIONS, MAX_NUM_CATEGORIES, MAX_NUM_QUESTIONS
+from app.services.generation_jobs_service import GenerationJobsService
+from app.services.bulk_generation_service import BulkGenerationService
+from app.services.news_service import NewsBoardService
+from app.services.document_service import DocumentService
 from app.services.game_sessions_service import GameSessionsService
 
 router = APIRouter(
@@ -15,66 +29,254 @@ router = APIRouter(
 )
 
 
-@router.get("", response_model=List[QuizBoardPydanticModel])
-async def get_all_quiz_boards(db: Session = Depends(get_db), search: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[QuizBoard]:
-    query = db.query(QuizBoard)
+@router.get("", response_model=List[QuizBoardPydanticModel], dependencies=[Depends(query_budget("get_quiz_boards", 3))])
+async def get_all_quiz_boards(db: AsyncSession = Depends(get_read_db), search: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[QuizBoard]:
+    return await QuizBoardService.get_quiz_boards(db, search, limit, offset)
 
-    if search:
-        query = query.filter(QuizBoard.title.ilike(f"%{search}%"))
-    
-    query.limit(limit).offset(offset)
-    quiz_boards = query.all()
 
-    return quiz_boards
+## Endpoint: GET /api/quiz-boards/similar?topic=...
+@router.get("/similar", response_model=List[SimilarQuizBoardModel])
+async def get_similar_quiz_boards(
+    topic: str,
+    limit: int = 5,
+    db: AsyncSession = Depends(get_read_db)
+) -> List[SimilarQuizBoardModel]:
+    """
+    Existing quiz boards on a near-duplicate topic, to offer them before generating a new one.
+    """
+    similar = await db.run_sync(lambda session: QuizBoardService.find_similar(topic, session, settings.TOPIC_SUGGEST_SIMILARITY, limit))
+    return [
+        SimilarQuizBoardModel(id=quiz_board.id, title=quiz_board.title, similarity=similarity)
+        for quiz_board, similarity in similar
+    ]
+
+
+## Endpoint: GET /api/quiz-boards/news
+@router.get("/news", response_model=List[QuizBoardPydanticModel], dependencies=[Depends(query_budget("get_news_quiz_boards", 4))])
+async def get_news_quiz_boards(db: AsyncSession = Depends(get_read_db)) -> List[QuizBoard]:
+    """
+    The latest daily news boards. They are generated off-peak every morning, so this never waits on the LLM;
+    until today's boards are ready, the previous day's are returned.
+    """
+    return await NewsBoardService.get_latest_boards(db)
 
 
 ####
 
-@router.post("/from-topic")
+@router.post("/from-topic", response_model=GenerationJobResponse, status_code=202)
 async def create_quiz_board_from_topic(
     topic: str = Form(...),
-    db: Session = Depends(get_db),
+    num_categories: int = Form(DEFAULT_NUM_CATEGORIES, ge=1, le=MAX_NUM_CATEGORIES),
+    num_questions: int = Form(DEFAULT_NUM_QUESTIONS, ge=1, le=MAX_NUM_QUESTIONS),
+    db: AsyncSession = Depends(get_db),
+    current_player: Player = Depends(admit_generation)
+) -> GenerationJobResponse:
+    """
+    Queue the generation of a quiz board from a topic.
+    Returns the job right away; poll GET /api/quiz-boards/jobs/{job_id} until it is completed,
+    at which point it carries the id of the game session created for the player.
+    """
+    job = await GenerationJobsService.create_from_topic(topic, current_player, db, num_categories, num_questions)
+    return job
+
+
+## Endpoint: POST /api/quiz-boards/from-topic/stream
+@router.post("/from-topic/stream")
+async def stream_quiz_board_from_topic(
+    request: Request,
+    topic: str = Form(...),
+    num_categories: int = Form(DEFAULT_NUM_CATEGORIES, ge=1, le=MAX_NUM_CATEGORIES),
+    num_questions: int = Form(DEFAULT_NUM_QUESTIONS, ge=1, le=MAX_NUM_QUESTIONS),
+    current_player: Player = Depends(admit_generation)
+) -> StreamingResponse:
+    """
+    Generate a quiz board from a topic as Server-Sent Events.
+    Emits "title", then a "category" event for each category and a "question" event for each of its
+    questions as soon as they are parsed from the LLM output, and finally "done" with the ids of the
+    quiz board and of the game session created for the player (or "error").
+    """
+    player_id = current_player.id
+    try:
+        acquire_generation_stream()
+    except HTTPException:
+        refund_generation(request, current_player)
+        raise
+    release_stream = _once(release_generation_stream)
+
+    def event_stream() -> Iterator[str]:
+        # The request's DB session may be closed before the response is fully streamed, so use our own.
+        # Starlette iterates sync generators in a threadpool, so the LLM stream doesn't block the event loop.
+        db = database.Session()
+        try:
+            for event, data in QuizBoardService.stream_from_topic(topic, player_id, db, num_categories, num_questions):
+                if event == "done":
+                    quiz_board = db.query(QuizBoard).filter(QuizBoard.id == data["quiz_board_id"]).first()
+                    player = db.query(Player).filter(Player.id == player_id).first()
+                    game_session = GameSessionsService.create_from_quiz_board(quiz_board, player, db)
+                    data = {**data, "game_session_id": game_session.id}
+                yield _sse_event(event, data)
+        except HTTPException as e:
+            yield _sse_event("error", {"detail": e.detail})
+        except Exception as e:
+            logger.error(f"Failed to stream quiz board for topic '{topic}': {str(e)}")
+            yield _sse_event("error", {"detail": str(e)})
+        finally:
+            db.close()
+            release_stream()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Stop nginx from buffering the events
+        },
+        # Also release the slot if the client disconnects before the stream is ever started
+        background=BackgroundTask(release_stream)
+    )
+
+
+def _sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _once(fn: Callable[[], None]) -> Callable[[], None]:
+    lock = threading.Lock()
+    called = False
+
+    def wrapper() -> None:
+        nonlocal called
+        with lock:
+            if called:
+                return
+            called = True
+        fn()
+
+    return wrapper
+
+
+## Endpoint: GET /api/quiz-boards/jobs/{job_id}
+@router.get("/jobs/{job_id}", response_model=GenerationJobResponse)
+async def get_generation_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_player: Player = Depends(get_current_player)
+) -> GenerationJobResponse:
+    return await GenerationJobsService.get_job(job_id, current_player, db)
+
+
+## Endpoint: POST /api/quiz-boards/bulk
+@router.post("/bulk", response_model=BulkGenerationRunResponse, status_code=202)
+async def create_bulk_generation_run(
+    file: UploadFile = File(...),
+    num_categories: int = Form(DEFAULT_NUM_CATEGORIES, ge=1, le=MAX_NUM_CATEGORIES),
+    num_questions: int = Form(DEFAULT_NUM_QUESTIONS, ge=1, le=MAX_NUM_QUESTIONS),
+    concurrency: int = Form(settings.BULK_GENERATION_CONCURRENCY, ge=1, le=32),
+    requests_per_minute: float = Form(settings.BULK_GENERATION_REQUESTS_PER_MINUTE, gt=0),
+    tokens_per_minute: float = Form(settings.BULK_GENERATION_TOKENS_PER_MINUTE, gt=0),
+    db: AsyncSession = Depends(get_db),
+    current_admin: Player = Depends(get_current_admin)
+) -> BulkGenerationRunResponse:
+    """
+    Admin only. Generate a quiz board for every topic of the uploaded file (one per line), in the background.
+    Topics that already have a board are skipped. Poll GET /api/quiz-boards/bulk/{run_id} for progress.
+    """
+    contents = await file.read()
+    topics = contents.decode("utf-8", errors="replace").splitlines()
+    run = await db.run_sync(lambda session: BulkGenerationService.create_run(topics, current_admin, session, num_categories, num_questions, concurrency, requests_per_minute, tokens_per_minute))
+    BulkGenerationService.start(run.id)
+    return run
+
+
+## Endpoint: GET /api/quiz-boards/bulk/{run_id}
+@router.get("/bulk/{run_id}", response_model=BulkGenerationRunResponse)
+async def get_bulk_generation_run(
+    run_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_admin: Player = Depends(get_current_admin)
+) -> BulkGenerationRunResponse:
+    return await db.run_sync(lambda session: BulkGenerationService.get_run(run_id, session))
+
+
+## Endpoint: POST /api/quiz-boards/bulk/{run_id}/resume
+@router.post("/bulk/{run_id}/resume", response_model=BulkGenerationRunResponse, status_code=202)
+async def resume_bulk_generation_run(
+    run_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_admin: Player = Depends(get_current_admin)
+) -> BulkGenerationRunResponse:
+    """Admin only. Resume an interrupted run from its checkpoint. 409 if it is completed, or running in any process."""
+    run = await db.run_sync(lambda session: BulkGenerationService.get_run(run_id, session))
+    if run.status == "completed":
+        raise HTTPException(status_code=409, detail="Bulk generation run is already completed")
+    if BulkGenerationService.is_running(run.id) or not await db.run_sync(lambda session: BulkGenerationService.claim_run(run_id, session)):
+        raise HTTPException(status_code=409, detail="Bulk generation run is already running")
+    BulkGenerationService.start(run.id)
+    await db.refresh(run)
+    return run
+
+
+## Endpoint: POST /api/quiz-boards/from-document
+@router.post("/from-document", response_model=GenerationJobResponse, status_code=202)
+async def create_quiz_board_from_document(
+    file: UploadFile = File(...),
+    num_categories: int = Form(DEFAULT_NUM_CATEGORIES, ge=1, le=MAX_NUM_CATEGORIES),
+    num_questions: int = Form(DEFAULT_NUM_QUESTIONS, ge=1, le=MAX_NUM_QUESTIONS),
+    db: AsyncSession = Depends(get_db),
+    current_player: Player = Depends(admit_generation)
+) -> GenerationJobResponse:
+    """
+    Queue the generation of a quiz board grounded in an uploaded document (.pdf, .txt or .md).
+    Returns the job right away, like POST /api/quiz-boards/from-topic.
+    """
+    # Spooled rather than read whole, so a large upload doesn't sit in memory
+    document = await DocumentService.spool_upload(file)
+    job = await GenerationJobsService.create_from_document(file.filename, document, current_player, db, num_categories, num_questions)
+    return job
+
+
+## Endpoint: GET /api/quiz-boards/{quiz_board_id}/source
+@router.get("/{quiz_board_id}/source", response_model=QuizBoardSourceResponse)
+async def get_quiz_board_source(
+    quiz_board_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_player: Player = Depends(get_current_player)
-) -> Dict:
-    # Only users can create quiz boards, not guests
-    quiz_board = QuizBoardService.create_from_topic(topic, current_player.id, db)
-    game_session = GameSessionsService.create_from_quiz_board(quiz_board, current_player, db)
-    
-    return {
-        "game_session_id": game_session.id
-    }
-
-
-# @router.post("/from-document")
-# async def create_quiz_from_document(
-#     file: UploadFile = File(None),
-#     db: Session = Depends(get_db),
-#     current_user: User = Depends(get_current_user)
-# ):
-#     # Read the file contents and return the text
-#     file_contents = await file.read()
-
-#     return {"message": "This shall create a quiz board from a document", 
-#             "file.filename": file.filename,
-#             "file.size": file.size,
-#             "file.content_type": file.content_type,
-#             "file.headers": file.headers,
-#             "file_contents": file_contents,
-#             "file.file": file.file
-#             }
+) -> QuizBoardSourceResponse:
+    """
+    The content a quiz board was generated from: its topic, document or headlines.
+    It is never part of the other quiz board responses. It never changes, so browsers keep it.
+    """
+    quiz_board, source_content = await QuizBoardService.get_source(quiz_board_id, current_player, db)
+    tag = etag("quiz_board_source", quiz_board.id, quiz_board.created_at)
+    if not_modified(request, tag):
+        return not_modified_response(tag, PRIVATE_IMMUTABLE)
+    cache_headers(response, tag, PRIVATE_IMMUTABLE)
+    return QuizBoardSourceResponse(quiz_board_id=quiz_board.id, source_type=quiz_board.source_type, source_content=source_content)
 
 
 ## Endpoint: GET /api/quiz-boards/top?limit=10&offset=0
-@router.get("/top", response_model=TopQuizBoardsResponse)
+# Past the cached boards: the version (1), then the boards and their creators (2)
+@router.get("/top", response_model=TopQuizBoardsResponse, dependencies=[Depends(query_budget("get_top_quiz_boards", 3))])
 async def get_top_quiz_boards(
+    request: Request,
+    response: Response,
     limit: int = 10,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> TopQuizBoardsResponse:
     """
     Get top quiz boards sorted by number of game sessions, including top score information.
+    The same for every player: browsers and nginx reuse it for TOP_QUIZ_BOARDS_MAX_AGE_SECONDS, then revalidate it,
+    and get a 304 without the response being built.
     """
-    return QuizBoardService.get_top_quiz_boards(db, limit, offset)
+    tag = etag("top_quiz_boards", limit, offset, await QuizBoardService.get_top_quiz_boards_version(db, limit, offset))
+    cache_control = shared(settings.TOP_QUIZ_BOARDS_MAX_AGE_SECONDS)
+    if not_modified(request, tag):
+        return not_modified_response(tag, cache_control)
+    cache_headers(response, tag, cache_control)
+    return await QuizBoardService.get_top_quiz_boards(db, limit, offset)
 
 
 
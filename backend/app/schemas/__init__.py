@@ -3,6 +3,7 @@ from .game_session import (
     SessionQuizBoardPyd,
     SessionCategoryPyd,
     SessionQuestionPyd,
+    PlayNextBoardPyd,
     AnswerQuestionResponse,
     AnswerQuestionRequest
 )
@@ -10,9 +11,28 @@ from .game_session import (
 from .quiz_board import (
     TopQuizBoardModel,
     TopQuizBoardsResponse,
+    SimilarQuizBoardModel,
     QuestionPydanticModel,
     CategoryPydanticModel,
-    QuizBoardPydanticModel
+    QuizBoardPydanticModel,
+    QuizBoardSourceResponse
+)
+
+from .generation_job import (
+    GenerationJobResponse
+)
+
+from .bulk_generation import (
+    BulkGenerationRunResponse
+)
+
+from .llm_output import (
+    LLMQuestion,
+    LLMCategoryQuestions,
+    LLMBoardOutline,
+    LLMCategory,
+    LLMDocumentFacts,
+    LLMFollowUpTopics
 )
 
 from .auth import (
@@ -0,0 +1,24 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+class BulkGenerationRunResponse(BaseModel):
+    id: int
+    status: str
+    total_topics: int
+    num_categories: int
+    num_questions: int
+    concurrency: int
+    requests_per_minute: float
+    tokens_per_minute: float
+    next_index: int
+    generated: int
+    skipped: int
+    failed: int
+    boards_per_minute: float | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
@@ -21,6 +21,10 @@ class SessionQuizBoardPyd(BaseModel):
     title: str
     categories: List[SessionCategoryPyd]
 
+class PlayNextBoardPyd(BaseModel):
+    id: int
+    title: str
+
 class GameSessionResponse(BaseModel):
     id: int
     player_id: int
@@ -29,6 +33,7 @@ class GameSessionResponse(BaseModel):
     completed_at: datetime | None
     status: str
     session_quiz_board: SessionQuizBoardPyd
+    play_next: List[PlayNextBoardPyd] = [] # Boards generated in advance for the likely follow-up topics
 
 class AnswerQuestionRequest(BaseModel):
     answer: str
@@ -39,6 +44,7 @@ class AnswerQuestionResponse(BaseModel):
     correct_answer: str
     points_earned: int    
     updated_score: int
+    answered_count: int
     game_status: str
 
 
@@ -0,0 +1,21 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+class GenerationJobResponse(BaseModel):
+    id: int
+    source_type: str = "topic"
+    topic: str
+    num_categories: int
+    num_questions: int
+    status: str
+    quiz_board_id: int | None = None
+    game_session_id: int | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    queue_wait_ms: int | None = None
+    duration_ms: int | None = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,42 @@
+from typing import List
+from pydantic import BaseModel, ConfigDict, Field
+
+# Expected structure of the JSON returned by the LLM for each generation task.
+# Numbers are accepted where text is expected, since the model answers "1969" as 1969.
+
+
+class LLMQuestion(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True, str_strip_whitespace=True)
+
+    question_text: str = Field(min_length=1)
+    correct_answer: str = Field(min_length=1)
+
+
+class LLMCategoryQuestions(BaseModel):
+    questions: List[LLMQuestion]
+
+
+class LLMBoardOutline(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True, str_strip_whitespace=True)
+
+    title: str = Field(min_length=1)
+    categories: List[str]
+
+
+class LLMCategory(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True, str_strip_whitespace=True)
+
+    name: str = Field(min_length=1)
+    questions: List[LLMQuestion]
+
+
+class LLMDocumentFacts(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True, str_strip_whitespace=True)
+
+    facts: List[str]
+
+
+class LLMFollowUpTopics(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True, str_strip_whitespace=True)
+
+    topics: List[str]
@@ -21,6 +21,12 @@ class TopQuizBoardsResponse(BaseModel):
     offset: int
 
 
+class SimilarQuizBoardModel(BaseModel):
+    id: int
+    title: str
+    similarity: float
+
+
 class QuestionPydanticModel(BaseModel):
     id: int
     question_text: str
@@ -36,10 +42,14 @@ class QuizBoardPydanticModel(BaseModel):
     id: int
     title: str
     source_type: str
-    source_content: str
     created_by_player_id: int
     created_at: datetime
     categories: List[CategoryPydanticModel]
 
     class Config:
         from_attributes = True  # This allows the model to be initialized from SQLAlchemy models by matching the attributes
+
+class QuizBoardSourceResponse(BaseModel):
+    quiz_board_id: int
+    source_type: str
+    source_content: str
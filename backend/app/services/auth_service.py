@@ -2,7 +2,10 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta, timezone
 
 from app.models.user import User
@@ -24,11 +27,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def create_guest(db: Session) -> Player:
+async def create_guest(db: AsyncSession) -> Player:
     # Create guest session
     guest = Guest()
     db.add(guest)
-    db.flush()  # Flush to get the guest ID
+    await db.flush()  # Flush to get the guest ID
     
     # Create player profile for the guest
     player = Player(
@@ -37,9 +40,7 @@ def create_guest(db: Session) -> Player:
         display_name=guest.guest_name
     )
     db.add(player)
-    db.commit()
-    db.refresh(guest)
-    db.refresh(player)
+    await db.commit()
     logger.info("Created guest with id: %s", guest.id)
     logger.info("Created player with id: %s", player.id)
     
@@ -70,39 +71,39 @@ def create_player_token(player: Player) -> str:
         expire_minutes=60*24*30 # 30 days
     )
 
-def ensure_player_exists(db: Session, user: User) -> Player:
+async def ensure_player_exists(db: AsyncSession, user: User) -> Player:
     """Ensure a Player record exists for the user, create if it doesn't."""
-    existing_player = db.query(Player).filter(Player.user_id == user.id).first()
+    existing_player = await db.scalar(select(Player).options(selectinload(Player.user)).filter(Player.user_id == user.id))
     if existing_player:
         return existing_player
     
     # Create player profile for the user
     player = Player(
         player_type=PlayerType.USER,
-        user_id=user.id
+        user=user
     )
     db.add(player)
-    db.commit()
-    db.refresh(player)
+    await db.commit()
     return player
 
-def authenticate_user(db: Session, username_or_email: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, username_or_email: str, password: str) -> Optional[User]:
     # Try to find user by username or email
-    user = db.query(User).filter(
+    user = await db.scalar(select(User).filter(
         (User.username == username_or_email) | (User.email == username_or_email)
-    ).first()
+    ))
     
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    # bcrypt is slow on purpose; keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.password_hash):
         return None
     
     # Ensure player record exists
-    ensure_player_exists(db, user)
+    await ensure_player_exists(db, user)
     return user
 
 
-def get_current_player_from_token(token: str, db: Session) -> Player:
+async def get_current_player_from_token(token: str, db: AsyncSession) -> Player:
     """Get the current player from a JWT token (handles both user and guest tokens)."""
     invalid_player_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -118,11 +119,11 @@ def get_current_player_from_token(token: str, db: Session) -> Player:
             logger.error("Invalid player token. No player_id or player_type found.")
             raise Exception("Invalid player token. No player_id or player_type found.")
         
-        # Find player by ID and type
-        player = db.query(Player).filter(
+        # Find player by ID and type. The user is loaded along, since it can't be lazily loaded later with an async session
+        player = await db.scalar(select(Player).options(selectinload(Player.user)).filter(
             Player.id == int(player_id),
             Player.player_type == PlayerType(player_type)  # Convert string back to enum
-        ).first()
+        ))
             
         if not player:
             logger.error("Invalid player token. Player not found.")
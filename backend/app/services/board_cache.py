@@ -0,0 +1,199 @@
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.metrics import metrics
+from app.models import Category, QuizBoard
+
+# The categories and questions of a quiz board never change once it is saved, so every game session of a board
+# shares one in-memory copy of them, in a compact form (objects with __slots__, tuples) rather than ORM objects.
+# A request then only loads its game session and attempts. The cache is bounded by the estimated size of the
+# boards, evicts the least recently used, and only lets a new board in at the expense of boards that were used
+# less often than it was recently (TinyLFU admission), so a burst of one-off boards doesn't flush the popular ones.
+# Behind it, the boards are shared by the processes of the app in the shared cache (app/core/cache.py).
+# Counters: board_cache_hits_total, board_cache_misses_total, board_cache_evictions_total, board_cache_rejections_total.
+
+# Estimated overhead of a skeleton object, on top of its strings
+_OBJECT_BYTES = 64
+
+
+class QuestionSkeleton:
+    __slots__ = ("id", "question_text", "correct_answer", "points")
+
+    def __init__(self, id: int, question_text: str, correct_answer: str, points: int):
+        self.id = id
+        self.question_text = question_text
+        self.correct_answer = correct_answer
+        self.points = points
+
+
+class CategorySkeleton:
+    __slots__ = ("id", "name", "questions")
+
+    def __init__(self, id: int, name: str, questions: Tuple[QuestionSkeleton, ...]):
+        self.id = id
+        self.name = name
+        self.questions = questions
+
+
+class BoardSkeleton:
+    __slots__ = ("id", "title", "categories", "size")
+
+    def __init__(self, id: int, title: str, categories: Tuple[CategorySkeleton, ...]):
+        self.id = id
+        self.title = title
+        self.categories = categories
+        self.size = _estimate_size(self)
+
+    @classmethod
+    def from_categories(cls, quiz_board_id: int, title: str, categories: Iterable[Category]) -> "BoardSkeleton":
+        """The skeleton of a board from its categories, with their questions loaded, in id order."""
+        return cls(quiz_board_id, title, tuple(
+            CategorySkeleton(category.id, category.name, tuple(
+                QuestionSkeleton(question.id, question.question_text, question.correct_answer, question.points)
+                for question in sorted(category.questions, key=lambda question: question.id)
+            ))
+            for category in sorted(categories, key=lambda category: category.id)
+        ))
+
+    @classmethod
+    def from_quiz_board(cls, quiz_board: QuizBoard) -> "BoardSkeleton":
+        return cls.from_categories(quiz_board.id, quiz_board.title, quiz_board.categories)
+
+    def to_json(self) -> bytes:
+        """Nested arrays, for the shared cache."""
+        return json.dumps([self.id, self.title, [
+            [category.id, category.name, [[question.id, question.question_text, question.correct_answer, question.points] for question in category.questions]]
+            for category in self.categories
+        ]], separators=(",", ":")).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "BoardSkeleton":
+        quiz_board_id, title, categories = json.loads(data)
+        return cls(quiz_board_id, title, tuple(
+            CategorySkeleton(category_id, name, tuple(QuestionSkeleton(*question) for question in questions))
+            for category_id, name, questions in categories
+        ))
+
+
+def _estimate_size(board: BoardSkeleton) -> int:
+    size = _OBJECT_BYTES + sys.getsizeof(board.title)
+    for category in board.categories:
+        size += _OBJECT_BYTES + sys.getsizeof(category.name)
+        for question in category.questions:
+            size += _OBJECT_BYTES + sys.getsizeof(question.question_text) + sys.getsizeof(question.correct_answer)
+    return size
+
+
+class BoardCache:
+    """
+    Size-bounded LRU cache of board skeletons by quiz board id, with frequency-based admission.
+
+    Every lookup counts as a use of its board, hit or miss. The counts are halved every `sample_size` lookups,
+    so they reflect recent popularity and only boards used since then are tracked. A board that doesn't fit
+    is only admitted if it was used more often than each of the least recently used boards it would evict.
+    """
+
+    def __init__(self, max_bytes: int, sample_size: int = 10000):
+        self.max_bytes = max_bytes
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._boards: "OrderedDict[int, BoardSkeleton]" = OrderedDict()
+        self._bytes = 0
+        self._frequency: Dict[int, int] = {}
+        self._lookups = 0
+
+    def get(self, quiz_board_id: int) -> Optional[BoardSkeleton]:
+        with self._lock:
+            self._record_use(quiz_board_id)
+            board = self._boards.get(quiz_board_id)
+            if board is not None:
+                self._boards.move_to_end(quiz_board_id)
+        metrics.increment("board_cache_hits_total" if board is not None else "board_cache_misses_total")
+        return board
+
+    def put(self, board: BoardSkeleton) -> bool:
+        """Cache a board, unless the admission policy turns it down. Returns whether it was cached."""
+        evicted = 0
+        with self._lock:
+            if board.id in self._boards:
+                self._boards.move_to_end(board.id)
+                return True
+
+            victims = self._victims(board)
+            if victims is None:
+                admitted = False
+            else:
+                for quiz_board_id in victims:
+                    self._bytes -= self._boards.pop(quiz_board_id).size
+                evicted = len(victims)
+                self._boards[board.id] = board
+                self._bytes += board.size
+                admitted = True
+
+        if evicted:
+            metrics.increment("board_cache_evictions_total", evicted)
+        if not admitted:
+            metrics.increment("board_cache_rejections_total")
+        return admitted
+
+    def warm(self, boards: Iterable[BoardSkeleton]) -> int:
+        """Cache boards, most popular first, as if each had been looked up once. Returns how many were cached."""
+        cached = 0
+        for board in boards:
+            with self._lock:
+                self._record_use(board.id)
+            cached += self.put(board)
+        return cached
+
+    def discard(self, quiz_board_id: int) -> None:
+        with self._lock:
+            board = self._boards.pop(quiz_board_id, None)
+            if board is not None:
+                self._bytes -= board.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._boards.clear()
+            self._bytes = 0
+            self._frequency.clear()
+            self._lookups = 0
+
+    def __contains__(self, quiz_board_id: int) -> bool:
+        with self._lock:
+            return quiz_board_id in self._boards
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._boards)
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._bytes
+
+    def _record_use(self, quiz_board_id: int) -> None:
+        self._frequency[quiz_board_id] = self._frequency.get(quiz_board_id, 0) + 1
+        self._lookups += 1
+        if self._lookups >= self.sample_size:
+            # Age the counts, forgetting the boards that are no longer used
+            self._frequency = {key: count // 2 for key, count in self._frequency.items() if count > 1}
+            self._lookups = 0
+
+    def _victims(self, board: BoardSkeleton) -> Optional[List[int]]:
+        # The least recently used boards to evict to make room for the board, or None if it isn't admitted
+        if board.size > self.max_bytes:
+            return None
+        victims = []
+        free = self.max_bytes - self._bytes
+        frequency = self._frequency.get(board.id, 0)
+        for quiz_board_id, cached in self._boards.items():
+            if free >= board.size:
+                break
+            if self._frequency.get(quiz_board_id, 0) >= frequency:
+                return None
+            victims.append(quiz_board_id)
+            free += cached.size
+        return victims
@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+import threading
+from typing import Optional
+from sqlalchemy.orm import Session, selectinload
+
+from app.core import database
+from app.core.config import settings
+from app.core.logging import logger
+from app.models import Category, QuizBoard
+
+# The public content of a board (its title, categories, and the texts and points of its questions, never the answers)
+# is the same for every player and never changes once the board is saved. It is published as a static file,
+# BOARD_SNAPSHOTS_DIR/<quiz board id>.json, along with precompressed .json.gz and .json.br copies, which the nginx
+# frontend serves at /boards/<quiz board id>.json without going through the API.
+#
+# Boards are published when they are saved; the boards saved before (or while publishing was disabled) with:
+#
+#   python -m app.services.board_snapshots --backfill
+
+# Brotli is used when the optional brotli package is installed; nginx falls back to gzip otherwise
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def snapshot_path(quiz_board_id: int, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or settings.BOARD_SNAPSHOTS_DIR, f"{quiz_board_id}.json")
+
+
+def render_snapshot(quiz_board: QuizBoard) -> bytes:
+    """The public content of a board, with its categories and questions loaded, as compact JSON in id order."""
+    return json.dumps({
+        "id": quiz_board.id,
+        "title": quiz_board.title,
+        "categories": [
+            {
+                "id": category.id,
+                "name": category.name,
+                "questions": [
+                    {"question_id": question.id, "question_text": question.question_text, "points": question.points}
+                    for question in sorted(category.questions, key=lambda question: question.id)
+                ]
+            }
+            for category in sorted(quiz_board.categories, key=lambda category: category.id)
+        ]
+    }, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def publish_snapshot(quiz_board: QuizBoard, directory: Optional[str] = None) -> str:
+    """Write the snapshot of a board and its compressed copies. Returns the path of the snapshot."""
+    path = snapshot_path(quiz_board.id, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    content = render_snapshot(quiz_board)
+    # The compressed copies first: nginx serves them as soon as the snapshot exists
+    _write(f"{path}.gz", gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0))
+    if brotli is not None:
+        _write(f"{path}.br", brotli.compress(content, quality=BROTLI_QUALITY))
+    _write(path, content)
+    return path
+
+
+def _write(path: str, data: bytes) -> None:
+    # Write to a temporary file first, so that nginx never serves a partial file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def publish_saved_board(quiz_board: QuizBoard) -> None:
+    """Publish a board that was just saved, when publishing is enabled. A failure is logged; the board stays playable."""
+    if not settings.BOARD_SNAPSHOTS_ENABLED:
+        return
+    try:
+        publish_snapshot(quiz_board)
+    except Exception as e:
+        logger.error(f"Failed to publish the snapshot of quiz board {quiz_board.id}: {str(e)}")
+
+
+def backfill(db: Session, directory: Optional[str] = None, overwrite: bool = False, batch_size: int = 200) -> int:
+    """Publish the boards that have no snapshot yet (all of them with `overwrite`), in id order. Returns how many were published."""
+    published = 0
+    last_id = 0
+    while True:
+        quiz_boards = (
+            db.query(QuizBoard)
+            .options(selectinload(QuizBoard.categories).selectinload(Category.questions))
+            .filter(QuizBoard.id > last_id)
+            .order_by(QuizBoard.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not quiz_boards:
+            return published
+        for quiz_board in quiz_boards:
+            if overwrite or not os.path.exists(snapshot_path(quiz_board.id, directory)):
+                publish_snapshot(quiz_board, directory)
+                published += 1
+        last_id = quiz_boards[-1].id
+        # Keep the memory bounded on large databases
+        db.expunge_all()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publish the static snapshots of the quiz boards, for nginx to serve.")
+    parser.add_argument("--backfill", action="store_true", required=True, help="Publish the boards that have no snapshot yet.")
+    parser.add_argument("--overwrite", action="store_true", help="Publish every board again, e.g. after a change of the snapshot format.")
+    parser.add_argument("--dir", default=settings.BOARD_SNAPSHOTS_DIR, help="Directory of the snapshots.")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    db_session = database.Session()
+    try:
+        count = backfill(db_session, args.dir, args.overwrite, args.batch_size)
+    finally:
+        db_session.close()
+    print(f"Published {count} quiz board snapshots to {args.dir}" + ("" if brotli is not None else " (gzip only: the brotli package is not installed)"))
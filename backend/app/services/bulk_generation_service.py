@@ -0,0 +1,437 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.core import database
+from app.core.admission import TokenBucket
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+from app.models import BulkGenerationRun, Player
+from app.services.llm_service import LLMService
+from app.services.quiz_board_service import QuizBoardService, DEFAULT_NUM_CATEGORIES, DEFAULT_NUM_QUESTIONS, normalize_topic
+
+
+# Save the progress of a run at most this often while it runs, and once more when it stops
+CHECKPOINT_SECONDS = 5
+
+# Runs executing on a background thread of this process: run id -> event that stops it
+_running: Dict[int, threading.Event] = {}
+_running_lock = threading.Lock()
+
+# Several processes (uvicorn workers, nodes, the CLI) share the runs, so a run is executed by the process that
+# claims it, with a single conditional UPDATE: a run that has no owner, or whose owner has sent no heartbeat for
+# GENERATION_JOB_STALE_SECONDS (it crashed). The owner refreshes heartbeat_at every GENERATION_JOB_HEARTBEAT_SECONDS
+# while it executes the run, and gives the run up when it stops.
+_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class GenerationBudget:
+    """
+    Paces generations under a requests-per-minute and a tokens-per-minute budget.
+    A generation waits until both budgets can pay for its estimated cost; bursts of up to a minute's worth are allowed.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, requests_per_generation: int, tokens_per_generation: int):
+        # The buckets must hold at least one generation, or it would wait forever
+        self.requests = TokenBucket(requests_per_minute, max(int(requests_per_minute), requests_per_generation))
+        self.tokens = TokenBucket(tokens_per_minute, max(int(tokens_per_minute), tokens_per_generation))
+        self._lock = threading.Lock()
+
+    def try_acquire(self, requests: int, tokens: int) -> Tuple[bool, float]:
+        """Pay for a generation if both budgets allow it. Returns (admitted, seconds to wait before trying again)."""
+        with self._lock:
+            admitted, retry_after = self.requests.try_acquire(requests)
+            if not admitted:
+                return False, retry_after
+            admitted, retry_after = self.tokens.try_acquire(tokens)
+            if not admitted:
+                self.requests.refund(requests)
+                return False, retry_after
+            return True, 0.0
+
+    def acquire(self, requests: int, tokens: int, stop: threading.Event) -> bool:
+        """Wait until a generation fits in the budget and pay for it. Returns False if `stop` was set first."""
+        while True:
+            admitted, retry_after = self.try_acquire(requests, tokens)
+            if admitted:
+                return True
+            if stop.wait(retry_after):
+                return False
+
+
+class BulkGenerationService:
+    @staticmethod
+    def create_run(
+        topics: Iterable[str],
+        player: Player,
+        db: Session,
+        num_categories: int = DEFAULT_NUM_CATEGORIES,
+        num_questions: int = DEFAULT_NUM_QUESTIONS,
+        concurrency: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ) -> BulkGenerationRun:
+        """
+        Persist a new bulk generation run for the topics; blank lines and repeated topics are dropped.
+        The budget defaults to the BULK_GENERATION_* settings. Start it with start() or run().
+        """
+        unique_topics: Dict[str, str] = {}
+        for topic in topics:
+            topic = " ".join(topic.split())
+            topic_key = normalize_topic(topic)
+            if topic_key:
+                unique_topics.setdefault(topic_key, topic)
+        if not unique_topics:
+            raise HTTPException(status_code=400, detail="No topics to generate")
+
+        run = BulkGenerationRun(
+            topics="\n".join(unique_topics.values()),
+            total_topics=len(unique_topics),
+            num_categories=num_categories,
+            num_questions=num_questions,
+            concurrency=concurrency or settings.BULK_GENERATION_CONCURRENCY,
+            requests_per_minute=requests_per_minute or settings.BULK_GENERATION_REQUESTS_PER_MINUTE,
+            tokens_per_minute=tokens_per_minute or settings.BULK_GENERATION_TOKENS_PER_MINUTE,
+            player_id=player.id,
+            status="queued"
+        )
+        db.add(run)
+        db.commit()
+        db.refresh(run)
+        logger.info(f"Created bulk generation run {run.id} for {run.total_topics} topics")
+        return run
+
+    @staticmethod
+    def get_run(run_id: int, db: Session) -> BulkGenerationRun:
+        run = db.query(BulkGenerationRun).filter(BulkGenerationRun.id == run_id).first()
+        if not run:
+            raise HTTPException(status_code=404, detail="Bulk generation run not found")
+        return run
+
+    @staticmethod
+    def is_running(run_id: int) -> bool:
+        """Whether the run executes in this process."""
+        with _running_lock:
+            return run_id in _running
+
+    @staticmethod
+    def claim_run(run_id: int, db: Session) -> bool:
+        """Take the run for this process, unless another live process executes it. Returns whether it was claimed."""
+        claimed = db.execute(
+            update(BulkGenerationRun)
+            .where(BulkGenerationRun.id == run_id, BulkGenerationRun.status != "completed", _claimable())
+            .values(owner=_owner, heartbeat_at=datetime.now())
+            .returning(BulkGenerationRun.id)
+        ).scalars().all()
+        db.commit()
+        return bool(claimed)
+
+    @staticmethod
+    def claim_stale_runs(db: Session) -> List[int]:
+        """Take the queued and running runs that no live process executes, in one UPDATE. Returns their ids."""
+        run_ids = db.execute(
+            update(BulkGenerationRun)
+            .where(BulkGenerationRun.status.in_(["queued", "running"]), _claimable())
+            .values(owner=_owner, heartbeat_at=datetime.now())
+            .returning(BulkGenerationRun.id)
+        ).scalars().all()
+        db.commit()
+        return sorted(run_ids)
+
+    @staticmethod
+    def start(run_id: int) -> None:
+        """Run a bulk generation on a background thread of this process, unless it is already running here."""
+        with _running_lock:
+            if run_id in _running:
+                return
+            stop = threading.Event()
+            _running[run_id] = stop
+
+        def target():
+            try:
+                BulkGenerationService.run(run_id, stop)
+            finally:
+                with _running_lock:
+                    _running.pop(run_id, None)
+
+        threading.Thread(target=target, name=f"bulk-generation-{run_id}", daemon=True).start()
+
+    @staticmethod
+    def run(run_id: int, stop: Optional[threading.Event] = None) -> None:
+        """
+        Run a bulk generation until every topic is done, `stop` is set, or the LLM provider becomes unavailable.
+        Resumes from the checkpoint of the run, so a run that was interrupted can simply be run again.
+        Does nothing if the run is completed, or executed by another process.
+        """
+        db = database.Session()
+        heartbeat_stop = threading.Event()
+        try:
+            if not BulkGenerationService.claim_run(run_id, db):
+                logger.info(f"Bulk generation run {run_id} not found, completed, or executed by another process")
+                return
+            threading.Thread(target=_send_heartbeats, args=(run_id, heartbeat_stop), name=f"bulk-generation-heartbeat-{run_id}", daemon=True).start()
+            run = db.query(BulkGenerationRun).filter(BulkGenerationRun.id == run_id).first()
+            _RunExecution(run, db, stop or threading.Event()).execute()
+        except Exception as e:
+            logger.error(f"Unexpected error in bulk generation run {run_id}: {str(e)}")
+            db.rollback()
+            run = db.query(BulkGenerationRun).filter(BulkGenerationRun.id == run_id).first()
+            if run:
+                run.status = "failed"
+                run.error = str(e)
+                run.finished_at = datetime.now()
+                db.commit()
+        finally:
+            heartbeat_stop.set()
+            _release(run_id, db)
+            db.close()
+
+    @staticmethod
+    def resume_pending_runs() -> None:
+        """
+        Restart the runs that were queued or running when their process stopped, unless another process executes them.
+        Called once at startup; interrupted runs wait to be resumed explicitly.
+        """
+        db = database.Session()
+        try:
+            run_ids = BulkGenerationService.claim_stale_runs(db)
+        except Exception as e:
+            logger.error(f"Failed to resume pending bulk generation runs: {str(e)}")
+            return
+        finally:
+            db.close()
+
+        if run_ids:
+            logger.info(f"Resuming {len(run_ids)} pending bulk generation runs: {run_ids}")
+        for run_id in run_ids:
+            BulkGenerationService.start(run_id)
+
+    @staticmethod
+    def shutdown() -> None:
+        """Stop the runs of this process; they save their checkpoint and are resumed at the next startup."""
+        with _running_lock:
+            for stop in _running.values():
+                stop.set()
+
+
+def _claimable():
+    # The runs that no live process executes
+    stale = datetime.now() - timedelta(seconds=settings.GENERATION_JOB_STALE_SECONDS)
+    return or_(BulkGenerationRun.owner.is_(None), BulkGenerationRun.owner == _owner, BulkGenerationRun.heartbeat_at.is_(None), BulkGenerationRun.heartbeat_at < stale)
+
+
+def _send_heartbeats(run_id: int, stop: threading.Event) -> None:
+    while not stop.wait(settings.GENERATION_JOB_HEARTBEAT_SECONDS):
+        db = database.Session()
+        try:
+            db.query(BulkGenerationRun).filter(BulkGenerationRun.id == run_id, BulkGenerationRun.owner == _owner).update({"heartbeat_at": datetime.now()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to send the heartbeat of bulk generation run {run_id}: {str(e)}")
+        finally:
+            db.close()
+
+
+def _release(run_id: int, db: Session) -> None:
+    # Let any process resume the run as soon as it stops here
+    try:
+        db.rollback()
+        db.query(BulkGenerationRun).filter(BulkGenerationRun.id == run_id, BulkGenerationRun.owner == _owner).update({"owner": None, "heartbeat_at": None}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        logger.error(f"Failed to release bulk generation run {run_id}: {str(e)}")
+
+
+class _RunExecution:
+    """One execution of a bulk generation run, from its checkpoint until it stops."""
+
+    def __init__(self, run: BulkGenerationRun, db: Session, stop: threading.Event):
+        self.run = run
+        self.db = db
+        self.stop = stop
+        self.topics = run.topics.splitlines()
+        # Finished topics past the checkpoint, waiting for the ones before them: index -> outcome
+        self.outcomes: Dict[int, str] = {}
+        self.unavailable = False
+        self.active_since = time.monotonic()
+        self.checkpointed_at = self.active_since
+
+    def execute(self) -> None:
+        run = self.run
+        run.status = "running"
+        run.error = None
+        run.started_at = run.started_at or datetime.now()
+        run.finished_at = None
+        self.db.commit()
+
+        requests, tokens = LLMService.estimate_usage(run.num_categories, run.num_questions)
+        budget = GenerationBudget(run.requests_per_minute, run.tokens_per_minute, requests, tokens)
+        logger.info(
+            f"Bulk generation run {run.id}: starting at topic {run.next_index}/{run.total_topics}, "
+            f"{run.concurrency} at a time, ~{requests} requests and ~{tokens} tokens per board"
+        )
+
+        interrupted_by_user = False
+        in_flight: Dict[Future, int] = {}
+        executor = ThreadPoolExecutor(max_workers=run.concurrency, thread_name_prefix=f"bulk-generation-{run.id}")
+        try:
+            index = run.next_index
+            while index < len(self.topics) and not self.stop.is_set():
+                topic = self.topics[index]
+                # Skipping is free: no worker and no budget
+                if QuizBoardService.find_reusable_board(topic, self.db, run.num_categories, run.num_questions):
+                    self._finish(index, "skipped")
+                    index += 1
+                    continue
+
+                while len(in_flight) >= run.concurrency:
+                    self._collect(in_flight, block=True)
+                if self.stop.is_set() or not budget.acquire(requests, tokens, self.stop):
+                    break
+                in_flight[executor.submit(_generate, topic, run.player_id, run.num_categories, run.num_questions)] = index
+                index += 1
+                self._collect(in_flight, block=False)
+        except KeyboardInterrupt:
+            logger.info(f"Bulk generation run {run.id} interrupted, waiting for the {len(in_flight)} boards in progress")
+            interrupted_by_user = True
+            self.stop.set()
+        finally:
+            # The generations in progress are already paid for, so let them finish
+            executor.shutdown(wait=True)
+            while in_flight:
+                self._collect(in_flight, block=True)
+
+        if run.next_index >= run.total_topics:
+            run.status = "completed"
+            run.finished_at = datetime.now()
+        elif self.unavailable:
+            run.status = "interrupted"
+            run.error = "The LLM provider is unavailable; resume the run once it is back"
+        elif interrupted_by_user:
+            run.status = "interrupted"
+        else:
+            # Stopped by a server shutdown, resumed at the next startup
+            run.status = "queued"
+        self._checkpoint()
+
+    def _collect(self, in_flight: Dict[Future, int], block: bool) -> None:
+        if not in_flight:
+            return
+        done, _ = wait(list(in_flight), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = in_flight.pop(future)
+            error = future.exception()
+            if error is None:
+                self._finish(index, "generated")
+            elif isinstance(error, HTTPException) and error.status_code == 503:
+                # Every further topic would fail the same way; leave this one for when the run is resumed
+                logger.error(f"Bulk generation run {self.run.id}: the LLM provider is unavailable, stopping")
+                self.unavailable = True
+                self.stop.set()
+            else:
+                detail = error.detail if isinstance(error, HTTPException) else str(error)
+                logger.error(f"Bulk generation run {self.run.id}: failed to generate topic '{self.topics[index]}': {detail}")
+                self._finish(index, "failed")
+
+    def _finish(self, index: int, outcome: str) -> None:
+        run = self.run
+        metrics.increment("bulk_generation_topics_total", outcome=outcome)
+        self.outcomes[index] = outcome
+
+        # Move the checkpoint past the topics that are done, in order
+        failed_topics = []
+        while run.next_index in self.outcomes:
+            outcome = self.outcomes.pop(run.next_index)
+            if outcome == "generated":
+                run.generated += 1
+            elif outcome == "skipped":
+                run.skipped += 1
+            else:
+                run.failed += 1
+                failed_topics.append(self.topics[run.next_index])
+            run.next_index += 1
+        if failed_topics:
+            run.failed_topics = "\n".join(([run.failed_topics] if run.failed_topics else []) + failed_topics)
+
+        if time.monotonic() - self.checkpointed_at >= CHECKPOINT_SECONDS:
+            self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        run = self.run
+        now = time.monotonic()
+        run.active_seconds += now - self.active_since
+        self.active_since = now
+        self.checkpointed_at = now
+        self.db.commit()
+        logger.info(
+            f"Bulk generation run {run.id} {run.status}: {run.next_index}/{run.total_topics} topics done "
+            f"({run.generated} generated, {run.skipped} skipped, {run.failed} failed), {run.boards_per_minute or 0} boards/min"
+        )
+
+
+def _generate(topic: str, player_id: int, num_categories: int, num_questions: int) -> None:
+    # Executed on a worker thread with its own DB session
+    db = database.Session()
+    try:
+        QuizBoardService.create_from_topic(topic, player_id, db, num_categories, num_questions)
+    finally:
+        db.close()
+
+
+## Run as `python -m app.services.bulk_generation_service --file topics.txt --player-id 1`, or `--resume RUN_ID` after an interruption
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate quiz boards for a file of topics, one per line.")
+    parser.add_argument("--file", help="File with one topic per line.")
+    parser.add_argument("--player-id", type=int, help="Player who owns the generated boards (required with --file).")
+    parser.add_argument("--resume", type=int, metavar="RUN_ID", help="Resume an interrupted run from its checkpoint instead.")
+    parser.add_argument("--num-categories", type=int, default=DEFAULT_NUM_CATEGORIES)
+    parser.add_argument("--num-questions", type=int, default=DEFAULT_NUM_QUESTIONS)
+    parser.add_argument("--concurrency", type=int, default=settings.BULK_GENERATION_CONCURRENCY, help="Max boards generated at once.")
+    parser.add_argument("--requests-per-minute", type=float, default=settings.BULK_GENERATION_REQUESTS_PER_MINUTE, help="Budget of LLM requests.")
+    parser.add_argument("--tokens-per-minute", type=float, default=settings.BULK_GENERATION_TOKENS_PER_MINUTE, help="Budget of LLM tokens.")
+    args = parser.parse_args()
+
+    if args.resume is None:
+        if not args.file or args.player_id is None:
+            parser.error("--file and --player-id are required, unless resuming a run with --resume")
+
+        db_session = database.Session()
+        try:
+            player = db_session.query(Player).filter(Player.id == args.player_id).first()
+            if not player:
+                parser.error(f"Player {args.player_id} not found")
+            with open(args.file, encoding="utf-8") as f:
+                run_id = BulkGenerationService.create_run(
+                    f, player, db_session, args.num_categories, args.num_questions,
+                    args.concurrency, args.requests_per_minute, args.tokens_per_minute
+                ).id
+        finally:
+            db_session.close()
+        print(f"Created bulk generation run {run_id}; if it is interrupted, resume it with --resume {run_id}")
+    else:
+        run_id = args.resume
+
+    BulkGenerationService.run(run_id)
+
+    db_session = database.Session()
+    try:
+        run = BulkGenerationService.get_run(run_id, db_session)
+        print(
+            f"Run {run.id} {run.status}: {run.next_index}/{run.total_topics} topics done, {run.generated} generated, "
+            f"{run.skipped} skipped, {run.failed} failed, {run.boards_per_minute or 0} boards/min"
+        )
+        if run.error:
+            print(f"Error: {run.error}")
+    finally:
+        db_session.close()
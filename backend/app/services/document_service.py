@@ -0,0 +1,182 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import codecs
+import os
+import tempfile
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.quiz_board import QuizBoard
+from app.services.llm_output import LLMOutputError
+from app.services.llm_resilience import LLMUnavailableError
+from app.services.llm_service import LLMService
+from app.services.quiz_board_service import QuizBoardService, DEFAULT_NUM_CATEGORIES, DEFAULT_NUM_QUESTIONS
+
+# Documents are never held in memory whole: the upload is spooled to a temporary file, its text is
+# extracted a page (or a block) at a time and cut into chunks, and only as many chunks are read ahead
+# as there are workers extracting facts from them.
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+# Size of the reads from the upload and from the spooled file
+READ_BYTES = 64 * 1024
+
+
+class DocumentError(ValueError):
+    """Raised when no usable text can be extracted from a document."""
+
+
+class DocumentService:
+    @staticmethod
+    async def spool_upload(file: UploadFile) -> BinaryIO:
+        """
+        Copy an upload to a temporary file, a block at a time; it stays in memory up to
+        settings.DOCUMENT_SPOOL_MEMORY_BYTES and moves to disk beyond that.
+        Raises 415 for unsupported file types and 413 past settings.DOCUMENT_MAX_UPLOAD_BYTES.
+        """
+        extension = os.path.splitext(file.filename or "")[1].lower()
+        if extension not in SUPPORTED_EXTENSIONS:
+            raise HTTPException(status_code=415, detail=f"Unsupported document type. Supported types: {', '.join(SUPPORTED_EXTENSIONS)}")
+
+        document = tempfile.SpooledTemporaryFile(max_size=settings.DOCUMENT_SPOOL_MEMORY_BYTES)
+        size = 0
+        while True:
+            block = await file.read(READ_BYTES)
+            if not block:
+                break
+            size += len(block)
+            if size > settings.DOCUMENT_MAX_UPLOAD_BYTES:
+                document.close()
+                raise HTTPException(status_code=413, detail=f"Document is too large, the limit is {settings.DOCUMENT_MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+            document.write(block)
+
+        if size == 0:
+            document.close()
+            raise HTTPException(status_code=400, detail="Document is empty")
+        document.seek(0)
+        return document
+
+    @staticmethod
+    def create_from_document(document: BinaryIO, filename: str, player_id: int, db: Session, num_categories: int = DEFAULT_NUM_CATEGORIES, num_questions: int = DEFAULT_NUM_QUESTIONS) -> QuizBoard:
+        logger.info(f"Generating quiz board from document: {filename}")
+        try:
+            quiz_data, text = DocumentService.generate_quiz_board(document, filename, num_categories, num_questions)
+        except LLMUnavailableError as e:
+            logger.error(f"Failed to generate quiz board from document: {str(e)}")
+            raise HTTPException(status_code=503, detail="Quiz generation is temporarily unavailable, please try again later")
+        except DocumentError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception as e:
+            logger.error(f"Failed to generate quiz board from document: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to get response from LLM. Error: {e}")
+
+        return QuizBoardService.save_quiz_board(quiz_data, "document", text, player_id, db)
+
+    @staticmethod
+    def generate_quiz_board(document: BinaryIO, filename: str, num_categories: int = DEFAULT_NUM_CATEGORIES, num_questions: int = DEFAULT_NUM_QUESTIONS) -> Tuple[Dict, str]:
+        """
+        Generate a quiz board grounded in a document by map-reduce. Returns (quiz, text of the document that was used).
+
+        Map: the facts of every chunk are extracted concurrently (at most settings.DOCUMENT_MAP_PARALLELISM at a time),
+        so the time is set by the number of chunks over the parallelism. Reduce: the board is generated from the facts.
+        """
+        llm_service = LLMService()
+        chunks: List[str] = []
+        facts_by_chunk: Dict[int, List[str]] = {}
+        in_flight: Dict[Future, int] = {}
+
+        def collect(block: bool) -> None:
+            done, _ = wait(list(in_flight), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    facts_by_chunk[index] = future.result()
+                except LLMOutputError as e:
+                    # One unusable chunk shouldn't cost the whole board
+                    logger.warning(f"No facts extracted from chunk {index} of document {filename}: {str(e)}")
+
+        with ThreadPoolExecutor(max_workers=settings.DOCUMENT_MAP_PARALLELISM, thread_name_prefix="llm-document") as executor:
+            try:
+                for index, chunk in enumerate(chunk_text(extract_text(document, filename), settings.DOCUMENT_CHUNK_CHARS)):
+                    if index >= settings.DOCUMENT_MAX_CHUNKS:
+                        logger.warning(f"Document {filename} is longer than {settings.DOCUMENT_MAX_CHUNKS} chunks, the rest is left out")
+                        break
+                    # Don't read further ahead than the workers can take
+                    while len(in_flight) >= settings.DOCUMENT_MAP_PARALLELISM:
+                        collect(block=True)
+                    in_flight[executor.submit(llm_service.extract_document_facts, chunk, settings.DOCUMENT_FACTS_PER_CHUNK)] = index
+                    chunks.append(chunk)
+                while in_flight:
+                    collect(block=True)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+        if not chunks:
+            raise DocumentError("No text could be extracted from the document")
+        facts = [fact for index in sorted(facts_by_chunk) for fact in facts_by_chunk[index]]
+        if not facts:
+            raise DocumentError("No facts could be extracted from the document")
+
+        logger.info(f"Extracted {len(facts)} facts from {len(chunks)} chunks of document {filename}")
+        quiz = llm_service.generate_quiz_board_from_facts(facts, num_categories, num_questions)
+        return quiz, "\n\n".join(chunks)
+
+
+def extract_text(document: BinaryIO, filename: str) -> Iterator[str]:
+    """The text of a document, as a sequence of pieces (a page of a PDF, a block of a text file)."""
+    if os.path.splitext(filename)[1].lower() == ".pdf":
+        return _extract_pdf_text(document)
+    return _extract_plain_text(document)
+
+
+def _extract_plain_text(document: BinaryIO) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        block = document.read(READ_BYTES)
+        if not block:
+            break
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+def _extract_pdf_text(document: BinaryIO) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+        from pypdf.errors import PdfReadError
+    except ImportError:
+        raise DocumentError("PDF documents are not supported on this server (the pypdf package is missing)")
+
+    try:
+        # Only the cross-reference table is read up front; pages are parsed one at a time as they are extracted
+        reader = PdfReader(document)
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n\n"
+    except PdfReadError as e:
+        raise DocumentError(f"Invalid PDF document: {e}")
+
+
+def chunk_text(pieces: Iterable[str], chunk_chars: int) -> Iterator[str]:
+    """
+    Regroup pieces of text into chunks of about `chunk_chars` characters, cut at a paragraph
+    or sentence boundary when there is one in the second half of the chunk. Blank chunks are skipped.
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= chunk_chars:
+            cut = _cut_position(buffer, chunk_chars)
+            chunk, buffer = buffer[:cut].strip(), buffer[cut:]
+            if chunk:
+                yield chunk
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def _cut_position(text: str, chunk_chars: int) -> int:
+    for separator in ("\n\n", "\n", ". "):
+        position = text.rfind(separator, chunk_chars // 2, chunk_chars)
+        if position != -1:
+            return position + len(separator)
+    return chunk_chars
@@ -1,18 +1,62 @@
 from datetime import datetime
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from typing import Optional
-from app.models import GameSession, Question, QuestionAttempt, Player, QuizBoard
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import List, NamedTuple, Optional, Tuple, Union
+from app.core import database
+from app.core.cache import get_shared_cache, on_invalidate
+from app.core.config import settings
+from app.models import Category, GameSession, Question, QuestionAttempt, Player, QuizBoard
 from app.schemas import GameSessionResponse, SessionQuizBoardPyd, SessionCategoryPyd, SessionQuestionPyd, AnswerQuestionResponse
 from app.core.logging import logger
+from app.core.query_budget import leave_budget
+from app.services.board_cache import BoardCache, BoardSkeleton
+from app.services.group_commit import GroupCommit
+from app.services.quiz_board_service import TOP_QUIZ_BOARDS_KEY
 from fuzzywuzzy import fuzz
 
+
+class AnswerWrite(NamedTuple):
+    game_session_id: int
+    question_id: int
+    user_answer: str
+    status: str
+    points_earned: int
+
+
+class AnswerResult(NamedTuple):
+    updated_score: int
+    answered_count: int
+    game_status: str
+
+
+_answer_batcher: GroupCommit | None = None
+
+# The categories and questions of the boards being played, shared by their game sessions
+_board_cache = BoardCache(settings.BOARD_CACHE_MAX_BYTES)
+
+
+def _drop_cached_board(key: str) -> None:
+    # A board invalidated by another process ("board:<id>"), or "*" when invalidations may have been missed
+    if key == "*":
+        _board_cache.clear()
+    else:
+        _board_cache.discard(int(key.split(":", 1)[1]))
+
+
+on_invalidate("board:", _drop_cached_board)
+
 class GameSessionsService:
     @staticmethod
     def create_from_quiz_board(quiz_board: QuizBoard, player: Player, db: Session = None) -> GameSession:        
+        total_questions = db.query(func.count(Question.id)).join(Category, Category.id == Question.category_id).filter(Category.quiz_board_id == quiz_board.id).scalar()
         game_session = GameSession(
             player_id=player.id,
-            quiz_board_id=quiz_board.id
+            quiz_board_id=quiz_board.id,
+            total_questions=total_questions
         )
         db.add(game_session)
         db.commit()
@@ -21,8 +65,55 @@ class GameSessionsService:
         return game_session
 
     @staticmethod
-    def build_game_session_response(game_session: GameSession) -> GameSessionResponse:    
-        session_quiz_board = SessionQuizBoardPyd(id=game_session.quiz_board.id, title=game_session.quiz_board.title, categories=[])
+    async def get_game_session(game_session_id: int, player: Player, db: AsyncSession) -> Tuple[GameSession, BoardSkeleton]:
+        """
+        A game session of the player, with its attempts, and the skeleton of its board for build_game_session_response():
+        two queries when the board is cached in the process or in the shared cache (the session, its attempts),
+        four otherwise (and the categories, the questions).
+        """
+        game_session = await db.scalar(
+            select(GameSession)
+            .options(joinedload(GameSession.quiz_board), selectinload(GameSession.question_attempts))
+            .filter(GameSession.id == game_session_id)
+        )
+        if not game_session:
+            raise HTTPException(status_code=404, detail="Game session not found")
+
+        # Verify that the current player owns this game session
+        if game_session.player_id != player.id:
+            raise HTTPException(status_code=403, detail="Not authorized to access this game session")
+
+        board = _board_cache.get(game_session.quiz_board_id)
+        if board is None:
+            async def load_board() -> bytes:
+                categories = await db.scalars(
+                    select(Category).options(selectinload(Category.questions)).filter(Category.quiz_board_id == game_session.quiz_board_id)
+                )
+                return BoardSkeleton.from_categories(game_session.quiz_board_id, game_session.quiz_board.title, categories).to_json()
+
+            board = BoardSkeleton.from_json(await get_shared_cache().get_or_compute(f"board:{game_session.quiz_board_id}", load_board, settings.BOARD_SHARED_CACHE_SECONDS))
+            _board_cache.put(board)
+
+        return game_session, board
+
+    @staticmethod
+    async def get_game_session_version(game_session_id: int, player: Player, db: AsyncSession) -> Tuple[datetime, int]:
+        """
+        What a game session of the player looks like depends on: when it started (which tells it from a session
+        that had its id before) and how many questions were answered. The board never changes. One query.
+        """
+        row = (await db.execute(
+            select(GameSession.player_id, GameSession.started_at, GameSession.answered_count).filter(GameSession.id == game_session_id)
+        )).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Game session not found")
+        if row.player_id != player.id:
+            raise HTTPException(status_code=403, detail="Not authorized to access this game session")
+        return row.started_at, row.answered_count
+
+    @staticmethod
+    def build_game_session_response(game_session: GameSession, board: BoardSkeleton) -> GameSessionResponse:
+        session_quiz_board = SessionQuizBoardPyd(id=board.id, title=board.title, categories=[])
 
         # Create a dictionary of corresponding question attempts indexed by question_id
         question_attempts_dict = {
@@ -30,7 +121,7 @@ class GameSessionsService:
             for attempt in game_session.question_attempts
         }
 
-        for category in game_session.quiz_board.categories:
+        for category in board.categories:
             session_category = SessionCategoryPyd(id=category.id, name=category.name, questions=[])
             for question in category.questions:
                 question_attempt = question_attempts_dict.get(question.id)
@@ -64,62 +155,169 @@ class GameSessionsService:
         return game_session_response
 
     @staticmethod
-    def answer_question(game_session_id: int, question_id: int, user_answer: str, db: Session, current_player: Player) -> AnswerQuestionResponse:
-        game_session = db.query(GameSession).filter(GameSession.id == game_session_id).first()
-        if not game_session:
-            raise HTTPException(status_code=404, detail="Game session not found")
+    def warm_up() -> None:
+        """Cache the most played boards. Called once at startup."""
+        db = database.Session()
+        try:
+            cached = GameSessionsService.warm_board_cache(db, settings.BOARD_CACHE_WARM_COUNT)
+        except Exception as e:
+            logger.error(f"Failed to warm up the board cache: {str(e)}")
+            return
+        finally:
+            db.close()
+        logger.info(f"Cached {cached} quiz boards")
 
-        # Verify that the current player owns this game session
-        if game_session.player_id != current_player.id:
-            raise HTTPException(status_code=403, detail="Not authorized to access this game session")
+    @staticmethod
+    def warm_board_cache(db: Session, limit: int) -> int:
+        """Cache the skeletons of the `limit` most played boards. Returns how many were cached."""
+        quiz_board_ids = [quiz_board_id for quiz_board_id, in db.query(GameSession.quiz_board_id)
+                          .group_by(GameSession.quiz_board_id)
+                          .order_by(func.count(GameSession.id).desc())
+                          .limit(limit)]
+        if not quiz_board_ids:
+            return 0
+        quiz_boards = {quiz_board.id: quiz_board for quiz_board in db.query(QuizBoard)
+                       .options(selectinload(QuizBoard.categories).selectinload(Category.questions))
+                       .filter(QuizBoard.id.in_(quiz_board_ids))}
+        return _board_cache.warm(BoardSkeleton.from_quiz_board(quiz_boards[quiz_board_id]) for quiz_board_id in quiz_board_ids if quiz_board_id in quiz_boards)
 
-        question = db.query(Question).filter(Question.id == question_id).first()
-        if not question:
+    @staticmethod
+    async def answer_question(game_session_id: int, question_id: int, user_answer: str, db: AsyncSession, current_player: Player) -> AnswerQuestionResponse:
+        """
+        Record an answer: one SELECT for the game session, the question (of the session's board) and a previous
+        attempt, then an INSERT of the attempt and an atomic UPDATE of the session's score and progress.
+        """
+        row = (await db.execute(
+            select(GameSession.player_id, Question.correct_answer, Question.points, QuestionAttempt.id)
+            .join(Category, Category.quiz_board_id == GameSession.quiz_board_id)
+            .join(Question, (Question.category_id == Category.id) & (Question.id == question_id))
+            .outerjoin(QuestionAttempt, (QuestionAttempt.game_session_id == GameSession.id) & (QuestionAttempt.question_id == Question.id))
+            .filter(GameSession.id == game_session_id)
+        )).first()
+        if row is None:
+            # Find out what is missing
+            game_session = await db.get(GameSession, game_session_id)
+            if not game_session:
+                raise HTTPException(status_code=404, detail="Game session not found")
+            if game_session.player_id != current_player.id:
+                raise HTTPException(status_code=403, detail="Not authorized to access this game session")
             raise HTTPException(status_code=404, detail="Question not found")
 
-        question_attempt = db.query(QuestionAttempt).filter(QuestionAttempt.game_session_id == game_session_id, QuestionAttempt.question_id == question_id).first()
-        if question_attempt:
+        player_id, correct_answer, points, attempt_id = row
+        # Verify that the current player owns this game session
+        if player_id != current_player.id:
+            raise HTTPException(status_code=403, detail="Not authorized to access this game session")
+        if attempt_id is not None:
             raise HTTPException(status_code=400, detail="Question already answered")
 
-        is_correct = is_answer_correct(user_answer, question.correct_answer)
+        is_correct = is_answer_correct(user_answer, correct_answer)
         status = "correct" if is_correct else "incorrect"
-        points_earned = question.points if is_correct else 0
-        updated_score = game_session.score + points_earned
-        
-        question_attempt = QuestionAttempt(
-            game_session_id=game_session_id,
-            question_id=question_id,
-            user_answer=user_answer,
-            status=status,
-            points_earned=points_earned
-        )
+        points_earned = points if is_correct else 0
+        write = AnswerWrite(game_session_id, question_id, user_answer, status, points_earned)
 
-        db.add(question_attempt)
-        db.commit()
-        db.refresh(question_attempt)
-
-        # Update Game Session
-        game_session.score = updated_score
-        # Check if all questions have been answered
-        total_questions = sum(len(cat.questions) for cat in game_session.quiz_board.categories)
-        answered_questions = db.query(QuestionAttempt).filter(QuestionAttempt.game_session_id == game_session_id).count()
-        if answered_questions == total_questions:
-            game_session.status = "completed"
-            game_session.completed_at = datetime.now()
-        db.commit()
-        db.refresh(game_session)
+        if settings.ANSWER_BATCHING_ENABLED:
+            # End the read transaction, so that the request doesn't hold a connection while its batch is written on another
+            await db.commit()
+            result = await _get_answer_batcher().submit(write)
+        else:
+            result = await GameSessionsService.record_answer(write, db)
+
+        if result.game_status == "completed":
+            # The game may hold the top score of its board
+            await run_in_threadpool(get_shared_cache().invalidate, TOP_QUIZ_BOARDS_KEY)
 
         response = AnswerQuestionResponse(
             question_id=question_id,
             status=status,
-            correct_answer=question.correct_answer,
+            correct_answer=correct_answer,
             points_earned=points_earned,
-            updated_score=updated_score,
-            game_status=game_session.status
+            updated_score=result.updated_score,
+            answered_count=result.answered_count,
+            game_status=result.game_status
         )
 
         return response
 
+    @staticmethod
+    async def record_answer(write: AnswerWrite, db: AsyncSession) -> AnswerResult:
+        """Record an answer and commit it. Raises an HTTPException if the question was already answered."""
+        try:
+            [result] = await GameSessionsService.record_answers([write], db)
+            await db.commit()
+        except IntegrityError:
+            # Answered by a concurrent request in the meantime: the unique index of question_attempts has the last word
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Question already answered")
+        return result
+
+    @staticmethod
+    async def record_answers(writes: List[AnswerWrite], db: AsyncSession) -> List[Union[AnswerResult, HTTPException]]:
+        """
+        Insert the question attempts of the answers, in order, without committing. Each one adds its points to
+        its game session's score and counts as answered in a single UPDATE, so concurrent answers never lose
+        an update and the board is never walked. A second answer to a question within the writes gets an
+        HTTPException; one answered before fails the commit on the unique index of question_attempts.
+        """
+        results = []
+        answered = set()
+        for write in writes:
+            if (write.game_session_id, write.question_id) in answered:
+                results.append(HTTPException(status_code=400, detail="Question already answered"))
+                continue
+            answered.add((write.game_session_id, write.question_id))
+
+            await db.execute(insert(QuestionAttempt).values(
+                game_session_id=write.game_session_id,
+                question_id=write.question_id,
+                user_answer=write.user_answer,
+                status=write.status,
+                points_earned=write.points_earned
+            ))
+            completes = GameSession.answered_count + 1 >= GameSession.total_questions
+            score, answered_count, status = (await db.execute(
+                update(GameSession)
+                .where(GameSession.id == write.game_session_id)
+                .values(
+                    score=GameSession.score + write.points_earned,
+                    answered_count=GameSession.answered_count + 1,
+                    status=case((completes, "completed"), else_=GameSession.status),
+                    completed_at=case((completes, datetime.now()), else_=GameSession.completed_at)
+                )
+                .returning(GameSession.score, GameSession.answered_count, GameSession.status)
+                .execution_options(synchronize_session=False)
+            )).one()
+            results.append(AnswerResult(score, answered_count, status))
+
+        return results
+
+
+async def _write_answer_batch(writes: List[AnswerWrite]) -> List[Union[AnswerResult, HTTPException]]:
+    # The batch is written for several requests; its statements count against none of their query budgets
+    leave_budget()
+    async with database.AsyncSessionLocal() as db:
+        try:
+            results = await GameSessionsService.record_answers(writes, db)
+            await db.commit()
+            return results
+        except IntegrityError:
+            # An answer of the batch had already been written (by an earlier request or another batch); write them one by one
+            await db.rollback()
+
+        results = []
+        for write in writes:
+            try:
+                results.append(await GameSessionsService.record_answer(write, db))
+            except HTTPException as e:
+                results.append(e)
+        return results
+
+
+def _get_answer_batcher() -> GroupCommit:
+    global _answer_batcher
+    if _answer_batcher is None:
+        _answer_batcher = GroupCommit("answers", _write_answer_batch, settings.ANSWER_BATCH_WINDOW_MS / 1000, settings.ANSWER_BATCH_MAX_SIZE)
+    return _answer_batcher
+
 
 def is_answer_correct(user_answer: str, correct_answer: str, threshold: int = 80) -> bool:
     # Normalize both answers
@@ -0,0 +1,269 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import socket
+import threading
+import uuid
+from typing import BinaryIO, Dict, List
+from fastapi import HTTPException
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import database
+from app.core.config import settings
+from app.core.logging import logger
+from app.models import GenerationJob, Player, QuizBoard
+from app.services.quiz_board_service import QuizBoardService, DEFAULT_NUM_CATEGORIES, DEFAULT_NUM_QUESTIONS
+from app.services.game_sessions_service import GameSessionsService
+from app.services.document_service import DocumentService
+
+
+# Quiz boards are generated by a small pool of worker threads, so that the LLM calls
+# never run on the event loop. The pool size bounds how many LLM generations run at once.
+_executor: ThreadPoolExecutor | None = None
+
+# Uploaded documents of the document jobs that haven't run yet, by job id. They are spooled to temporary
+# files, so they don't survive a restart: such jobs fail and the document must be uploaded again.
+_documents: Dict[int, BinaryIO] = {}
+
+# Number of jobs submitted to the pool that haven't finished yet (queued + running)
+_pending_jobs = 0
+_pending_jobs_lock = threading.Lock()
+
+# Several processes (uvicorn workers, nodes) share the jobs table, so every job has an owner: the process that
+# queued it, or that claimed it. An owner refreshes the heartbeat_at of its pending jobs every
+# GENERATION_JOB_HEARTBEAT_SECONDS; the jobs of an owner that stopped (a crash, a restart) have no heartbeat for
+# GENERATION_JOB_STALE_SECONDS, and are claimed, with a single UPDATE, by the first process that looks for them.
+# A worker only runs a job that its process owns and that is still queued, so no job runs twice.
+_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+_heartbeat_thread: threading.Thread | None = None
+_heartbeat_stop = threading.Event()
+_heartbeat_lock = threading.Lock()
+
+
+class GenerationJobsService:
+    @staticmethod
+    async def create_from_topic(topic: str, player: Player, db: AsyncSession, num_categories: int = DEFAULT_NUM_CATEGORIES, num_questions: int = DEFAULT_NUM_QUESTIONS) -> GenerationJob:
+        """
+        Persist a new generation job for the topic and hand it to the worker pool.
+        Returns immediately; the job is picked up by the next free worker.
+        """
+        job = GenerationJob(
+            topic=topic,
+            num_categories=num_categories,
+            num_questions=num_questions,
+            player_id=player.id,
+            status="queued",
+            owner=_owner,
+            heartbeat_at=datetime.now()
+        )
+        db.add(job)
+        await db.commit()
+        logger.info(f"Queued generation job {job.id} for topic: {topic}")
+
+        GenerationJobsService.submit(job.id)
+        return job
+
+    @staticmethod
+    async def create_from_document(filename: str, document: BinaryIO, player: Player, db: AsyncSession, num_categories: int = DEFAULT_NUM_CATEGORIES, num_questions: int = DEFAULT_NUM_QUESTIONS) -> GenerationJob:
+        """
+        Persist a new generation job for an uploaded document (see DocumentService.spool_upload) and hand it to the worker pool.
+        The job owns the document from now on, and closes it when it is done.
+        """
+        job = GenerationJob(
+            source_type="document",
+            topic=filename,
+            num_categories=num_categories,
+            num_questions=num_questions,
+            player_id=player.id,
+            status="queued",
+            owner=_owner,
+            heartbeat_at=datetime.now()
+        )
+        db.add(job)
+        await db.commit()
+        logger.info(f"Queued generation job {job.id} for document: {filename}")
+
+        _documents[job.id] = document
+        GenerationJobsService.submit(job.id)
+        return job
+
+    @staticmethod
+    async def get_job(job_id: int, player: Player, db: AsyncSession) -> GenerationJob:
+        job = await db.get(GenerationJob, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Generation job not found")
+
+        # Verify that the current player owns this job
+        if job.player_id != player.id:
+            raise HTTPException(status_code=403, detail="Not authorized to access this generation job")
+
+        return job
+
+    @staticmethod
+    def submit(job_id: int) -> None:
+        global _pending_jobs
+        with _pending_jobs_lock:
+            _pending_jobs += 1
+        future = _get_executor().submit(GenerationJobsService.run_job, job_id)
+        future.add_done_callback(_job_done)
+
+    @staticmethod
+    def pending_jobs() -> int:
+        """Number of jobs that are queued or running in this process."""
+        return _pending_jobs
+
+    @staticmethod
+    def run_job(job_id: int) -> None:
+        """
+        Run a generation job to completion. Executed on a worker thread with its own DB session.
+        """
+        db = database.Session()
+        try:
+            now = datetime.now()
+            claimed = db.query(GenerationJob).filter(
+                GenerationJob.id == job_id,
+                GenerationJob.owner == _owner,
+                GenerationJob.status == "queued"
+            ).update({"status": "running", "started_at": now, "heartbeat_at": now}, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                logger.info(f"Generation job {job_id} not found, or claimed by another process")
+                return
+
+            job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+            job.queue_wait_ms = int((job.started_at - job.created_at).total_seconds() * 1000)
+            db.commit()
+
+            try:
+                if job.source_type == "document":
+                    quiz_board = GenerationJobsService._generate_from_document(job, db)
+                else:
+                    quiz_board = QuizBoardService.create_from_topic(job.topic, job.player_id, db, job.num_categories, job.num_questions)
+                game_session = GameSessionsService.create_from_quiz_board(quiz_board, job.player, db)
+                job.status = "completed"
+                job.quiz_board_id = quiz_board.id
+                job.game_session_id = game_session.id
+            except Exception as e:
+                db.rollback()
+                job.status = "failed"
+                job.error = e.detail if isinstance(e, HTTPException) else str(e)
+                logger.error(f"Generation job {job_id} failed: {job.error}")
+
+            job.finished_at = datetime.now()
+            job.duration_ms = int((job.finished_at - job.started_at).total_seconds() * 1000)
+            db.commit()
+            logger.info(f"Generation job {job_id} {job.status}. Queue wait: {job.queue_wait_ms}ms, duration: {job.duration_ms}ms")
+        except Exception as e:
+            logger.error(f"Unexpected error while running generation job {job_id}: {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _generate_from_document(job: GenerationJob, db: Session) -> QuizBoard:
+        document = _documents.pop(job.id, None)
+        if document is None:
+            raise Exception("The uploaded document was lost in a server restart, please upload it again")
+        try:
+            return DocumentService.create_from_document(document, job.topic, job.player_id, db, job.num_categories, job.num_questions)
+        finally:
+            document.close()
+
+    @staticmethod
+    def resume_pending_jobs() -> None:
+        """
+        Claim and submit the jobs whose owner stopped while they were queued or running, then keep doing so,
+        along with the heartbeats of this process's jobs, on a background thread. Called once at startup.
+        """
+        GenerationJobsService._resume_stale_jobs()
+        _start_heartbeat()
+
+    @staticmethod
+    def claim_stale_jobs(db: Session) -> List[int]:
+        """Take over the pending jobs whose owner has stopped sending heartbeats, in one UPDATE. Returns their ids."""
+        now = datetime.now()
+        job_ids = db.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.status.in_(["queued", "running"]),
+                or_(GenerationJob.heartbeat_at.is_(None), GenerationJob.heartbeat_at < now - timedelta(seconds=settings.GENERATION_JOB_STALE_SECONDS))
+            )
+            .values(owner=_owner, status="queued", heartbeat_at=now)
+            .returning(GenerationJob.id)
+        ).scalars().all()
+        db.commit()
+        return sorted(job_ids)
+
+    @staticmethod
+    def _resume_stale_jobs() -> None:
+        db = database.Session()
+        try:
+            job_ids = GenerationJobsService.claim_stale_jobs(db)
+        except Exception as e:
+            logger.error(f"Failed to resume pending generation jobs: {str(e)}")
+            return
+        finally:
+            db.close()
+
+        if job_ids:
+            logger.info(f"Resuming {len(job_ids)} pending generation jobs: {job_ids}")
+        for job_id in job_ids:
+            GenerationJobsService.submit(job_id)
+
+    @staticmethod
+    def _send_heartbeat() -> None:
+        db = database.Session()
+        try:
+            db.query(GenerationJob).filter(
+                GenerationJob.owner == _owner,
+                GenerationJob.status.in_(["queued", "running"])
+            ).update({"heartbeat_at": datetime.now()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to send the heartbeat of the generation jobs: {str(e)}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def shutdown() -> None:
+        global _executor, _heartbeat_thread
+        if _executor:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        with _heartbeat_lock:
+            thread, _heartbeat_thread = _heartbeat_thread, None
+        if thread:
+            _heartbeat_stop.set()
+            thread.join()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.GENERATION_WORKERS, thread_name_prefix="generation-worker")
+    return _executor
+
+
+def _start_heartbeat() -> None:
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        if _heartbeat_thread is not None:
+            return
+        _heartbeat_stop.clear()
+        _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="generation-heartbeat", daemon=True)
+        _heartbeat_thread.start()
+
+
+def _heartbeat_loop() -> None:
+    while not _heartbeat_stop.wait(settings.GENERATION_JOB_HEARTBEAT_SECONDS):
+        GenerationJobsService._send_heartbeat()
+        # The jobs of the processes that stopped since the last look
+        GenerationJobsService._resume_stale_jobs()
+
+
+def _job_done(future) -> None:
+    # Also called for jobs cancelled at shutdown, which never reach run_job
+    global _pending_jobs
+    with _pending_jobs_lock:
+        _pending_jobs -= 1
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Set, Tuple
+
+from app.core.metrics import metrics
+
+
+class GroupCommit:
+    """
+    Batches the writes submitted by concurrent requests, so that they are committed in one transaction
+    (one fsync on SQLite) instead of one each. A batch is written window_seconds after its first write,
+    or as soon as it has max_batch_size writes, so a write never waits more than the window plus the
+    time its batch takes to commit.
+
+        batcher = GroupCommit("answers", write_batch, window_seconds=0.005, max_batch_size=64)
+        result = await batcher.submit(item)
+
+    write_batch(items) must return one result per item, in order. A result that is an exception is
+    raised to its submitter only; if write_batch itself raises, every submitter of the batch gets the error.
+    """
+
+    def __init__(self, name: str, write_batch: Callable[[List[Any]], Awaitable[List[Any]]], window_seconds: float, max_batch_size: int):
+        self._name = name
+        self._write_batch = write_batch
+        self._window_seconds = window_seconds
+        self._max_batch_size = max_batch_size
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._writing: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference to the task, or it could be garbage collected before it is done
+            task = asyncio.get_running_loop().create_task(self._write(batch))
+            self._writing.add(task)
+            task.add_done_callback(self._writing.discard)
+
+    async def _write(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        metrics.increment("group_commit_batches_total", batcher=self._name)
+        metrics.increment("group_commit_writes_total", len(batch), batcher=self._name)
+        try:
+            results = await self._write_batch([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                # The request was cancelled; its write went through all the same
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,135 @@
+import json
+from typing import Any, List, Tuple
+
+
+class LLMOutputError(ValueError):
+    """Raised when the LLM output can't be parsed or validated, even after a repair and a retry."""
+
+
+def parse_llm_json(text: str) -> Tuple[Any, bool]:
+    """
+    Parse the JSON object in an LLM response. Returns (data, repaired).
+
+    Text around the object (```json fences, a sentence of preamble) is ignored. If the object
+    itself isn't valid JSON, it goes through repair_json() first, and `repaired` is True.
+    Raises ValueError if there is no JSON object or it can't be repaired.
+    """
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object in LLM output")
+
+    end = text.rfind("}")
+    if end > start:
+        try:
+            return json.loads(text[start:end + 1]), False
+        except json.JSONDecodeError:
+            pass
+
+    return json.loads(repair_json(text[start:])), True
+
+
+# Characters that may follow the closing quote of a JSON string (besides whitespace)
+_AFTER_STRING = ",:}]"
+# Characters that may start the next element after a comma
+_AFTER_COMMA = '"{[]}-0123456789tfn'
+
+
+def repair_json(text: str) -> str:
+    """
+    Fix the defects LLMs commonly leave in JSON:
+      - trailing commas before a closing bracket
+      - double quotes inside strings that weren't escaped, and raw newlines inside strings
+      - output cut off mid-way (e.g. max tokens): the last incomplete element is dropped
+        and the open arrays and objects are closed
+    Anything after the end of the root object is dropped.
+    """
+    out: List[str] = []
+    stack: List[str] = []  # closers of the open arrays / objects
+    in_string = False
+    escape = False
+    after_colon = False  # The next value completes a key/value pair
+    # Output length and open containers at the last point where every element so far was complete
+    safe: Tuple[int, Tuple[str, ...]] = (0, ())
+
+    i = 0
+    while i < len(text):
+        char = text[i]
+
+        if in_string:
+            if escape:
+                escape = False
+                out.append(char)
+            elif char == "\\":
+                escape = True
+                out.append(char)
+            elif char == '"':
+                if _closes_string(text, i + 1):
+                    in_string = False
+                    out.append(char)
+                    # A string in an array, or a value after a key, completes an element
+                    if after_colon or (stack and stack[-1] == "]"):
+                        safe = (len(out), tuple(stack))
+                    after_colon = False
+                else:
+                    out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            else:
+                out.append(char)
+            i += 1
+            continue
+
+        if char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            after_colon = False
+            stack.append("}" if char == "{" else "]")
+            out.append(char)
+            safe = (len(out), tuple(stack))
+        elif char in "}]":
+            if not stack:
+                break
+            _strip_trailing_comma(out)
+            out.append(stack.pop())
+            if not stack:
+                return "".join(out)
+            safe = (len(out), tuple(stack))
+        elif char == ",":
+            after_colon = False
+            safe = (len(out), tuple(stack))
+            out.append(char)
+        elif char == ":":
+            after_colon = True
+            out.append(char)
+        elif stack or not char.isspace():
+            out.append(char)
+        i += 1
+
+    # Truncated: roll back to the last complete element and close everything still open
+    length, open_containers = safe
+    out = out[:length]
+    _strip_trailing_comma(out)
+    out.extend(reversed(open_containers))
+    return "".join(out)
+
+
+def _closes_string(text: str, position: int) -> bool:
+    """Whether a double quote just before `position` ends the string, judging by what follows it."""
+    rest = text[position:].lstrip()
+    if not rest:
+        return True
+    if rest[0] not in _AFTER_STRING:
+        return False
+    if rest[0] == ",":
+        after_comma = rest[1:].lstrip()
+        return not after_comma or after_comma[0] in _AFTER_COMMA
+    return True
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ",":
+        del out[index:]
@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+from app.core.config import settings, secrets
+from app.core.logging import logger
+
+
+class LLMProviderError(Exception):
+    """Raised when an LLM provider fails to produce a completion."""
+
+
+class LLMProvider:
+    """
+    Interface of the LLM backends behind LLMService.
+
+    Every call gets the rendered prompt, plus the name of the task ("board", "outline",
+    "category_questions", ...) and the variables the prompt was rendered with. Real models
+    only need the prompt; the others let stand-ins produce a well-formed answer without parsing it.
+    """
+    name = "base"
+
+    def complete(self, task: str, prompt: str, variables: Dict) -> str:
+        raise NotImplementedError
+
+    def stream(self, task: str, prompt: str, variables: Dict) -> Iterator[str]:
+        """Yield the completion in chunks as it is produced. Defaults to a single chunk."""
+        yield self.complete(task, prompt, variables)
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, model: str = None):
+        import httpx
+        from langchain_openai import ChatOpenAI
+
+        self.model = model or settings.LLM_MODEL
+
+        # self.llm = OpenAI(model="gpt-4o-mini", temperature=0.1, api_key=secrets.OPENAI_API_KEY)
+        # ^ This is old api. It throws the following error:
+        # openai.NotFoundError: Error code: 404 - {'error': {'code': None, 'message': 'Invalid URL (POST /v1/completions)', 'param': None, 'type': 'invalid_request_error'}}
+
+        # One long-lived HTTP client with a bounded keep-alive pool, shared by all the calls of this provider
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=settings.LLM_MAX_CONNECTIONS, max_keepalive_connections=settings.LLM_MAX_CONNECTIONS),
+            timeout=settings.LLM_TIMEOUT_SECONDS
+        )
+        self.llm = ChatOpenAI(
+            model=self.model,
+            temperature=0.1,
+            api_key=secrets.OPENAI_API_KEY,
+            streaming=False,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=http_client
+        )
+
+    def complete(self, task: str, prompt: str, variables: Dict) -> str:
+        return self.llm.invoke(prompt).content
+
+    def stream(self, task: str, prompt: str, variables: Dict) -> Iterator[str]:
+        for chunk in self.llm.stream(prompt):
+            yield chunk.content
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Deterministic local stand-in for load tests, benchmarks and CI: no network, no spend.
+
+    Answers each task with well-formed JSON derived from the prompt variables, after a simulated
+    latency of latency_ms (plus up to jitter_ms), and fails with probability failure_rate.
+    The latency and failures come from a seeded random generator, so runs are reproducible.
+    """
+    name = "fake"
+
+    def __init__(self, latency_ms: int = 0, jitter_ms: int = 0, failure_rate: float = 0.0, seed: int = 0, chunk_size: int = 16):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.chunk_size = chunk_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def complete(self, task: str, prompt: str, variables: Dict) -> str:
+        latency, fail = self._draw()
+        time.sleep(latency)
+        if fail:
+            raise LLMProviderError(f"Injected failure for task '{task}'")
+        return json.dumps(self._answer(task, variables))
+
+    def stream(self, task: str, prompt: str, variables: Dict) -> Iterator[str]:
+        latency, fail = self._draw()
+        text = json.dumps(self._answer(task, variables), indent=2)
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        for index, chunk in enumerate(chunks):
+            time.sleep(latency / len(chunks))
+            if fail and index == len(chunks) // 2:
+                raise LLMProviderError(f"Injected failure for task '{task}'")
+            yield chunk
+
+    def _draw(self):
+        with self._lock:
+            latency = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            fail = self._random.random() < self.failure_rate
+        return latency, fail
+
+    def _answer(self, task: str, variables: Dict) -> Dict:
+        topic = str(variables.get("topic", "General Knowledge")).strip()[:60]
+        num_categories = int(variables.get("num_categories", 3))
+        num_questions = int(variables.get("num_questions", 4))
+        category_names = [f"{topic} #{c + 1}" for c in range(num_categories)]
+
+        if task == "outline":
+            return {"title": f"All About {topic}", "categories": category_names}
+        if task == "category_questions":
+            return {"questions": _fake_questions(variables.get("category", topic), num_questions)}
+        if task == "document_facts":
+            # The first sentences of the chunk
+            sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", str(variables.get("chunk", "")))]
+            return {"facts": [sentence for sentence in sentences if sentence][:int(variables.get("max_facts", 12))]}
+        if task == "follow_up_topics":
+            title = str(variables.get("title", topic)).strip()[:60]
+            aspects = ["History", "Legends", "Science", "Culture", "Geography"]
+            return {"topics": [f"{title}: {aspect}" for aspect in aspects[:int(variables.get("max_topics", 2))]]}
+        if task == "board":
+            return {
+                "title": f"All About {topic}",
+                "categories": [
+                    {"name": name, "questions": _fake_questions(name, num_questions)}
+                    for name in category_names
+                ]
+            }
+        return {}
+
+
+def _fake_questions(category: str, num_questions: int):
+    return [
+        {
+            "question_text": f"This is clue number {q + 1} of the category {category}.",
+            "correct_answer": f"{category} answer {q + 1}"
+        }
+        for q in range(num_questions)
+    ]
+
+
+class RecordReplayProvider(LLMProvider):
+    """
+    Stores the responses of another provider on disk, keyed by a hash of the model and the prompt.
+
+    Modes:
+        "record": always call the inner provider, and store its responses
+        "replay": only serve stored responses; a prompt that was never recorded is an error
+        "cache":  serve stored responses, and call the inner provider (and store) on a miss.
+                  This makes it a response cache for repeated prompts in production.
+    """
+    name = "replay"
+
+    def __init__(self, inner: LLMProvider, directory: str, mode: str = "cache"):
+        if mode not in ("record", "replay", "cache"):
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        self.inner = inner
+        self.directory = directory
+        self.mode = mode
+
+    def complete(self, task: str, prompt: str, variables: Dict) -> str:
+        path = self._path(prompt)
+        if self.mode != "record":
+            response = self._load(path)
+            if response is not None:
+                return response
+            if self.mode == "replay":
+                raise LLMProviderError(f"No recorded response for task '{task}' ({os.path.basename(path)})")
+
+        response = self.inner.complete(task, prompt, variables)
+        self._store(path, task, prompt, response)
+        return response
+
+    def stream(self, task: str, prompt: str, variables: Dict) -> Iterator[str]:
+        path = self._path(prompt)
+        if self.mode != "record":
+            response = self._load(path)
+            if response is not None:
+                yield response
+                return
+            if self.mode == "replay":
+                raise LLMProviderError(f"No recorded response for task '{task}' ({os.path.basename(path)})")
+
+        chunks = []
+        for chunk in self.inner.stream(task, prompt, variables):
+            chunks.append(chunk)
+            yield chunk
+        self._store(path, task, prompt, "".join(chunks))
+
+    def _path(self, prompt: str) -> str:
+        model = getattr(self.inner, "model", self.inner.name)
+        key = hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load(self, path: str) -> Optional[str]:
+        try:
+            with open(path) as f:
+                return json.load(f)["response"]
+        except FileNotFoundError:
+            return None
+
+    def _store(self, path: str, task: str, prompt: str, response: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first, so that concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "task": task,
+                "prompt": prompt,
+                "response": response,
+                "recorded_at": datetime.now().isoformat()
+            }, f)
+        os.replace(tmp_path, path)
+
+
+_shared_provider: Optional[LLMProvider] = None
+_shared_provider_lock = threading.Lock()
+
+
+def get_llm_provider() -> LLMProvider:
+    """
+    The process-wide LLM provider. It is long-lived so that its HTTP connection pool,
+    latency statistics and circuit breaker are shared by all requests.
+    """
+    global _shared_provider
+    if _shared_provider is None:
+        with _shared_provider_lock:
+            if _shared_provider is None:
+                _shared_provider = create_llm_provider()
+    return _shared_provider
+
+
+def create_llm_provider() -> LLMProvider:
+    """Build the LLM provider selected by the settings (LLM_PROVIDER and LLM_REPLAY_MODE)."""
+    from app.services.llm_resilience import CircuitBreaker, ResilientLLMProvider
+
+    if settings.LLM_PROVIDER == "openai":
+        provider = OpenAIProvider()
+    elif settings.LLM_PROVIDER == "fake":
+        provider = FakeLLMProvider(
+            latency_ms=settings.FAKE_LLM_LATENCY_MS,
+            jitter_ms=settings.FAKE_LLM_JITTER_MS,
+            failure_rate=settings.FAKE_LLM_FAILURE_RATE
+        )
+    else:
+        raise ValueError(f"Unknown LLM provider: {settings.LLM_PROVIDER}")
+
+    provider = ResilientLLMProvider(
+        provider,
+        timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+        hedge_enabled=settings.LLM_HEDGE_ENABLED,
+        hedge_min_delay_seconds=settings.LLM_HEDGE_MIN_DELAY_MS / 1000,
+        breaker=CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS),
+        max_concurrency=settings.LLM_MAX_CONNECTIONS
+    )
+
+    # Outermost, so that stored responses are served without going through the deadline, hedging and breaker
+    if settings.LLM_REPLAY_MODE != "off":
+        logger.info(f"Using {settings.LLM_REPLAY_MODE} mode of the LLM record/replay store at {settings.LLM_REPLAY_DIR}")
+        provider = RecordReplayProvider(provider, settings.LLM_REPLAY_DIR, settings.LLM_REPLAY_MODE)
+
+    return provider
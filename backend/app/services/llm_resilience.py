@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Deque, Dict, Iterator, Optional
+
+from app.core.logging import logger
+from app.core.metrics import metrics
+from app.services.llm_providers import LLMProvider, LLMProviderError
+
+
+class LLMUnavailableError(LLMProviderError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the LLM provider is unhealthy.
+
+    closed:    calls go through; `failure_threshold` consecutive failures open the circuit
+    open:      calls are rejected until `reset_seconds` have passed
+    half_open: a single trial call goes through; success closes the circuit, failure opens it again
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = "half_open"
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != "closed":
+                logger.info("LLM circuit breaker closed")
+            self._state = "closed"
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """End a call that neither succeeded nor failed (an abandoned stream): a half-open trial slot is freed, nothing else changes."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if self._state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+                if self._state != "open":
+                    logger.warning(f"LLM circuit breaker opened after {self._consecutive_failures} consecutive failures")
+                    metrics.increment("llm_breaker_opened_total")
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Recent latencies of successful calls, per task, to derive the hedging delay."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, task: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[task].append(seconds)
+
+    def percentile(self, task: str, percentile: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples[task])
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+
+class ResilientLLMProvider(LLMProvider):
+    """
+    Wraps a provider with a per-call deadline, hedged requests and a circuit breaker.
+
+    Once a task has enough latency samples, a call that is still running after the task's p95
+    latency (but at least hedge_min_delay) gets a second, identical request; whichever finishes
+    first wins. This cuts the tail latency caused by upstream stragglers for at most ~5% extra calls.
+    The losing request can't be cancelled and runs to completion in the background.
+    Counters: llm_hedged_calls_total and llm_hedge_wins_total (by task), llm_breaker_opened_total.
+    """
+
+    def __init__(
+        self,
+        inner: LLMProvider,
+        timeout_seconds: float = 60.0,
+        hedge_enabled: bool = True,
+        hedge_min_delay_seconds: float = 2.0,
+        hedge_percentile: float = 95.0,
+        breaker: Optional[CircuitBreaker] = None,
+        max_concurrency: int = 20
+    ):
+        self.inner = inner
+        self.name = inner.name
+        self.model = getattr(inner, "model", inner.name)
+        self.timeout_seconds = timeout_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-call")
+        self.hedged_calls = 0
+        self.hedge_wins = 0
+
+    @property
+    def degraded(self) -> bool:
+        return self.breaker.state != "closed"
+
+    def complete(self, task: str, prompt: str, variables: Dict) -> str:
+        if not self.breaker.allow():
+            raise LLMUnavailableError("The LLM provider is unavailable, try again later")
+
+        start = time.monotonic()
+        deadline = start + self.timeout_seconds
+        primary = self._executor.submit(self.inner.complete, task, prompt, variables)
+        pending = {primary}
+
+        hedge_delay = self._hedge_delay(task)
+        if hedge_delay is not None:
+            done, _ = wait(pending, timeout=min(hedge_delay, self.timeout_seconds))
+            if not done:
+                logger.info(f"LLM call for task '{task}' is slower than {hedge_delay:.2f}s, sending a hedged request")
+                self.hedged_calls += 1
+                metrics.increment("llm_hedged_calls_total", task=task)
+                pending.add(self._executor.submit(self.inner.complete, task, prompt, variables))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self.hedge_wins += 1
+                        metrics.increment("llm_hedge_wins_total", task=task)
+                    self.latencies.record(task, time.monotonic() - start)
+                    self.breaker.record_success()
+                    return future.result()
+                error = future.exception()
+
+        self.breaker.record_failure()
+        if error is None:
+            raise LLMProviderError(f"LLM call for task '{task}' timed out after {self.timeout_seconds}s")
+        raise error
+
+    def stream(self, task: str, prompt: str, variables: Dict) -> Iterator[str]:
+        # Streams can't be hedged: the client is already showing the first request's output
+        if not self.breaker.allow():
+            raise LLMUnavailableError("The LLM provider is unavailable, try again later")
+
+        try:
+            yield from self.inner.stream(task, prompt, variables)
+        except GeneratorExit:
+            # The consumer went away before the end, which says nothing about the provider's health:
+            # a half-open trial must not close the circuit on a call that never finished
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+
+    def _hedge_delay(self, task: str) -> Optional[float]:
+        if not self.hedge_enabled:
+            return None
+        p95 = self.latencies.percentile(task, self.hedge_percentile)
+        if p95 is None:
+            return None
+        return max(p95, self.hedge_min_delay_seconds)
@@ -1,67 +1,404 @@
-from langchain_openai import ChatOpenAI
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain.chains import LLMChain
+from pydantic import BaseModel
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Type
 import json
 import os
 
-from app.core.config import secrets
+from app.core.config import settings
 from app.core.logging import logger
+from app.core.metrics import metrics
+from app.schemas.llm_output import LLMBoardOutline, LLMCategory, LLMCategoryQuestions, LLMDocumentFacts, LLMFollowUpTopics
+from app.services.llm_output import LLMOutputError, parse_llm_json
+from app.services.llm_providers import LLMProvider, get_llm_provider
 
 
-class LLMService:
-    def __init__(self):
-        # self.llm = OpenAI(model="gpt-4o-mini", temperature=0.1, api_key=secrets.OPENAI_API_KEY)
-        # ^ This is old api. It throws the following error:
-        # openai.NotFoundError: Error code: 404 - {'error': {'code': None, 'message': 'Invalid URL (POST /v1/completions)', 'param': None, 'type': 'invalid_request_error'}}
+TOPIC_QUIZ_TEMPLATE = """
+    Create a Jeopardy-style quiz related to the following topic. You should create {num_categories} categories that are related to the topic, and within each category, create {num_questions} questions. As in the official Jeopardy game show, the questions must be in the form of a statement that provides a clue to the answer, and the answer should be a single word or phrase such that saying "What/Who is <answer>?" would be a valid question whose answer would be the clue statement.
+
+    The category names should be short, interesting, possibly comprise of a pun or a play on words. Every question (clue statement) in the category should be related to the category name and to the given topic. Within a cateogy, the questions should have increasing difficulty.
+
+    ```Topic:
 
-        self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.1, api_key=secrets.OPENAI_API_KEY, streaming=False)
+    {topic}
+
+    ```
     
-    def generate_quiz_board_from_topic(self, topic: str):
+    Return the results as a JSON object with the following structure:
+    {{
+        "title": "Quiz title based on the topic",
+        "categories": [
+            {{
+                "name": "Category 1 Name ",
+                "questions": [
+                    {{
+                        "question_text": "Question (clue statement)",
+                        "correct_answer": "Answer text",
+                    }},
+                    ...
+                ]
+            }},
+            ...
+        ]
+    }}
+
+    Note that JSON keys and values require to be withindouble-quotes. Double quotes within strings must be escaped with backslash, single quotes within strings shall not be escaped.
+    """
+
+
+# Two-stage generation: first the title and the category names, then the questions of every category in parallel.
+
+BOARD_OUTLINE_TEMPLATE = """
+    You are planning a Jeopardy-style quiz related to the following topic. Come up with a title for the quiz and {num_categories} categories that are related to the topic. The categories should cover different aspects of the topic and should not overlap.
+
+    The category names should be short, interesting, possibly comprise of a pun or a play on words.
+
+    ```Topic:
+
+    {topic}
+
+    ```
+
+    Return the results as a JSON object with the following structure:
+    {{
+        "title": "Quiz title based on the topic",
+        "categories": ["Category 1 Name", "Category 2 Name", ...]
+    }}
+
+    Note that JSON keys and values require to be within double-quotes. Double quotes within strings must be escaped with backslash, single quotes within strings shall not be escaped.
+    """
+
+CATEGORY_QUESTIONS_TEMPLATE = """
+    Create {num_questions} questions for the category "{category}" of a Jeopardy-style quiz titled "{title}", about the following topic. The other categories of the quiz are: {other_categories}; do not ask about what they cover. As in the official Jeopardy game show, the questions must be in the form of a statement that provides a clue to the answer, and the answer should be a single word or phrase such that saying "What/Who is <answer>?" would be a valid question whose answer would be the clue statement.
+
+    Every question (clue statement) should be related to the category name and to the given topic. The questions should have increasing difficulty.
+
+    ```Topic:
+
+    {topic}
+
+    ```
+
+    Return the results as a JSON object with the following structure:
+    {{
+        "questions": [
+            {{
+                "question_text": "Question (clue statement)",
+                "correct_answer": "Answer text"
+            }},
+            ...
+        ]
+    }}
+
+    Note that JSON keys and values require to be within double-quotes. Double quotes within strings must be escaped with backslash, single quotes within strings shall not be escaped.
+    """
+
+# Boards from documents are generated by map-reduce: the facts of every chunk of the document are extracted
+# concurrently (map), then the board is planned and written from the facts alone (reduce).
+
+DOCUMENT_FACTS_TEMPLATE = """
+    Extract up to {max_facts} facts from the following excerpt of a document, that would make good material for a Jeopardy-style quiz: names, dates, numbers, definitions, events, causes and consequences. Every fact must be a single self-contained sentence that is stated in the excerpt; do not add outside knowledge. Skip boilerplate such as tables of contents, page headers and references.
+
+    ```Excerpt:
+
+    {chunk}
+
+    ```
+
+    Return the results as a JSON object with the following structure:
+    {{
+        "facts": ["Fact 1", "Fact 2", ...]
+    }}
+
+    Note that JSON keys and values require to be within double-quotes. Double quotes within strings must be escaped with backslash, single quotes within strings shall not be escaped.
+    """
+
+DOCUMENT_OUTLINE_TEMPLATE = """
+    You are planning a Jeopardy-style quiz based strictly on a document, given below as the list of facts it states. Come up with a title for the quiz and {num_categories} categories that group the facts. The categories should cover different parts of the document and should not overlap.
+
+    The category names should be short, interesting, possibly comprise of a pun or a play on words.
+
+    ```Facts:
+
+    {topic}
+
+    ```
+
+    Return the results as a JSON object with the following structure:
+    {{
+        "title": "Quiz title based on the document",
+        "categories": ["Category 1 Name", "Category 2 Name", ...]
+    }}
+
+    Note that JSON keys and values require to be within double-quotes. Double quotes within strings must be escaped with backslash, single quotes within strings shall not be escaped.
+    """
+
+DOCUMENT_CATEGORY_QUESTIONS_TEMPLATE = """
+    Create {num_questions} questions for the category "{category}" of a Jeopardy-style quiz titled "{title}", based strictly on a document given below as the list of facts it states. The other categories of the quiz are: {other_categories}; do not ask about what they cover. As in the official Jeopardy game show, the questions must be in the form of a statement that provides a clue to the answer, and the answer should be a single word or phrase such that saying "What/Who is <answer>?" would be a valid question whose answer would be the clue statement.
+
+    Every question (clue statement) should be related to the category name, and both the clue and the answer must be supported by the facts; do not use outside knowledge. The questions should have increasing difficulty.
+
+    ```Facts:
+
+    {topic}
+
+    ```
+
+    Return the results as a JSON object with the following structure:
+    {{
+        "questions": [
+            {{
+                "question_text": "Question (clue statement)",
+                "correct_answer": "Answer text"
+            }},
+            ...
+        ]
+    }}
+
+    Note that JSON keys and values require to be within double-quotes. Double quotes within strings must be escaped with backslash, single quotes within strings shall not be escaped.
+    """
+
+# The "topic" of a news board: the day's headlines
+NEWS_TOPIC_TEMPLATE = """Trending news of {day}, from the following headlines:
+{headlines}"""
+
+# Topics a player who just played a board is likely to ask for next, for speculative generation
+FOLLOW_UP_TOPICS_TEMPLATE = """
+    A player just played a Jeopardy-style quiz titled "{title}", with the categories: {categories}. Suggest {max_topics} topics for the next quiz that this player would most likely want to play: closely related to this quiz but not the same, each broad enough for a whole quiz. Each topic should be a short phrase, as a player would type it.
+
+    Return the results as a JSON object with the following structure:
+    {{
+        "topics": ["Topic 1", "Topic 2", ...]
+    }}
+
+    Note that JSON keys and values require to be within double-quotes. Double quotes within strings must be escaped with backslash, single quotes within strings shall not be escaped.
+    """
+
+# Appended to the prompt when an answer had to be thrown away, so the retry knows what went wrong
+RETRY_NOTE_TEMPLATE = """
+
+    A previous answer to this request was rejected because: {error}. Follow the requested JSON structure exactly.
+    """
+
+# For estimating the token usage of a generation: English text averages ~4 characters per token
+CHARS_PER_TOKEN = 4
+ANSWER_TOKENS_PER_CATEGORY = 15
+ANSWER_TOKENS_PER_QUESTION = 60
+
+
+class LLMService:
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        # The LLM backend is pluggable (OpenAI, a local fake, or a record/replay store), see llm_providers.py.
+        # By default all instances share the process-wide provider and its connection pool.
+        self.provider = provider or get_llm_provider()
+
+    def generate_quiz_board_from_topic(self, topic: str, num_categories: int = 3, num_questions: int = 4):
         """
         Generate a quiz board from a topic.
+
+        A short first call picks the title and the category names, then the questions of all the
+        categories are generated concurrently (at most settings.LLM_CATEGORY_PARALLELISM at a time),
+        so the total time is set by the slowest category rather than by the length of the whole board.
+        """
+        return self._generate_quiz_board(topic, num_categories, num_questions, BOARD_OUTLINE_TEMPLATE, CATEGORY_QUESTIONS_TEMPLATE)
+
+    def generate_quiz_board_from_facts(self, facts: List[str], num_categories: int = 3, num_questions: int = 4):
+        """
+        Generate a quiz board grounded in a document, from the facts extracted from it (see extract_document_facts).
+        """
+        topic = "\n".join(f"- {fact}" for fact in facts)
+        return self._generate_quiz_board(topic, num_categories, num_questions, DOCUMENT_OUTLINE_TEMPLATE, DOCUMENT_CATEGORY_QUESTIONS_TEMPLATE)
+
+    def extract_document_facts(self, chunk: str, max_facts: int = 12) -> List[str]:
+        """
+        Extract the quiz-worthy facts stated in a chunk of a document.
         """
-        
-        template_str = """
-        Create a Jeopardy-style quiz related to the following topic. You should create 3 categories that are related to the topic, and within each category, create 4 questions. As in the official Jeopardy game show, the questions must be in the form of a statement that provides a clue to the answer, and the answer should be a single word or phrase such that saying "What/Who is <answer>?" would be a valid question whose answer would be the clue statement.
+        def check(result: LLMDocumentFacts) -> List[str]:
+            facts = [fact for fact in result.facts if fact]
+            if not facts:
+                raise ValueError("no facts extracted")
+            return facts[:max_facts]
 
-        The category names should be short, interesting, possibly comprise of a pun or a play on words. Every question (clue statement) in the category should be related to the category name and to the given topic. Within a cateogy, the questions should have increasing difficulty.
+        return self._complete_json("document_facts", DOCUMENT_FACTS_TEMPLATE, {"chunk": chunk, "max_facts": max_facts}, LLMDocumentFacts, check)
 
-        ```Topic:
+    def suggest_follow_up_topics(self, title: str, category_names: List[str], max_topics: int = 2) -> List[str]:
+        """
+        Suggest the topics a player is likely to ask for after playing the board with this title and categories.
+        """
+        def check(result: LLMFollowUpTopics) -> List[str]:
+            topics = [topic for topic in result.topics if topic]
+            if not topics:
+                raise ValueError("no topics suggested")
+            return topics[:max_topics]
+
+        return self._complete_json("follow_up_topics", FOLLOW_UP_TOPICS_TEMPLATE, {
+            "title": title,
+            "categories": ", ".join(f'"{name}"' for name in category_names),
+            "max_topics": max_topics
+        }, LLMFollowUpTopics, check)
 
-        {topic}
+    def _generate_quiz_board(self, topic: str, num_categories: int, num_questions: int, outline_template: str, questions_template: str):
+        outline = self.generate_board_outline(topic, num_categories, outline_template)
+        category_names = outline["categories"][:num_categories]
 
-        ```
-        
-        Return the results as a JSON object with the following structure:
-        {{
-            "title": "Quiz title based on the topic",
+        def generate_category(category_name: str):
+            return self.generate_category_questions(topic, outline["title"], category_name, category_names, num_questions, questions_template)
+
+        max_workers = max(1, min(settings.LLM_CATEGORY_PARALLELISM, len(category_names)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-category") as executor:
+            results = list(executor.map(generate_category, category_names))
+
+        quiz = {
+            "title": outline["title"],
             "categories": [
-                {{
-                    "name": "Category 1 Name ",
-                    "questions": [
-                        {{
-                            "question_text": "Question (clue statement)",
-                            "correct_answer": "Answer text",
-                        }},
-                        ...
-                    ]
-                }},
-                ...
+                {"name": category_name, "questions": questions}
+                for category_name, questions in zip(category_names, results)
             ]
-        }}
+        }
+        return quiz
 
-        Note that JSON keys and values require to be withindouble-quotes. Double quotes within strings must be escaped with backslash, single quotes within strings shall not be escaped.
+    def generate_quiz_board_from_news(self, headlines: List[str], day: date, num_categories: int = 3, num_questions: int = 4):
         """
+        Generate a quiz board about the news of the day, from its headlines.
+        """
+        topic = NEWS_TOPIC_TEMPLATE.format(day=day.strftime("%B %d, %Y"), headlines="\n".join(f"- {headline}" for headline in headlines))
+        return self.generate_quiz_board_from_topic(topic, num_categories, num_questions)
 
-        prompt = PromptTemplate(input_variables=["topic"],
-                                template=template_str)
+    def generate_board_outline(self, topic: str, num_categories: int = 3, template: str = BOARD_OUTLINE_TEMPLATE):
+        """
+        Generate the title and the category names of a quiz board, as {"title": ..., "categories": [...]}.
+        """
+        def check(outline: LLMBoardOutline) -> Dict:
+            # Drop blank and repeated category names
+            names = list(dict.fromkeys(name for name in (name.strip() for name in outline.categories) if name))
+            if len(names) < num_categories:
+                raise ValueError(f"expected {num_categories} categories, got {len(names)}")
+            return {"title": outline.title, "categories": names[:num_categories]}
 
-        chain = prompt | self.llm | JsonOutputParser()
+        return self._complete_json("outline", template, {"topic": topic, "num_categories": num_categories}, LLMBoardOutline, check)
+
+    def generate_category_questions(self, topic: str, title: str, category_name: str, category_names: List[str], num_questions: int = 4, template: str = CATEGORY_QUESTIONS_TEMPLATE) -> List[Dict]:
+        """
+        Generate the questions of one category, as a list of {"question_text": ..., "correct_answer": ...}.
+        """
+        def check(result: LLMCategoryQuestions) -> List[Dict]:
+            return _check_questions(result.questions, num_questions)
+
+        return self._complete_json("category_questions", template, {
+            "topic": topic,
+            "title": title,
+            "category": category_name,
+            "other_categories": ", ".join(f'"{name}"' for name in category_names if name != category_name),
+            "num_questions": num_questions
+        }, LLMCategoryQuestions, check)
+
+    @staticmethod
+    def estimate_usage(num_categories: int = 3, num_questions: int = 4) -> Tuple[int, int]:
+        """
+        Rough (requests, tokens) cost of generate_quiz_board_from_topic, for scheduling against the
+        provider's rate limits: one outline call plus one call per category, prompt and answer included.
+        """
+        outline_tokens = len(BOARD_OUTLINE_TEMPLATE) // CHARS_PER_TOKEN + ANSWER_TOKENS_PER_CATEGORY * num_categories
+        category_tokens = len(CATEGORY_QUESTIONS_TEMPLATE) // CHARS_PER_TOKEN + ANSWER_TOKENS_PER_QUESTION * num_questions
+        return 1 + num_categories, outline_tokens + num_categories * category_tokens
+
+    def stream_quiz_board_from_topic(self, topic: str, num_categories: int = 3, num_questions: int = 4) -> Iterator[str]:
+        """
+        Generate a quiz board from a topic in a single call, yielding the raw JSON text as the LLM produces it.
+        Feed the chunks to a QuizBoardStreamParser to get categories and questions as they complete.
+        """
+        variables = {"topic": topic, "num_categories": num_categories, "num_questions": num_questions}
+        prompt = PromptTemplate.from_template(TOPIC_QUIZ_TEMPLATE).format(**variables)
+
+        for chunk in self.provider.stream("board", prompt, variables):
+            yield chunk
+
+    def finish_streamed_board(self, text: str, topic: str, num_categories: int = 3, num_questions: int = 4) -> Tuple[Dict, List[int]]:
+        """
+        Validate the full text of a streamed quiz board (see stream_quiz_board_from_topic).
+        Returns (quiz, regenerated): a category that is broken beyond repair, or short of questions,
+        is generated again on its own, and its index is listed in `regenerated`.
+        Raises LLMOutputError if the title or some category names are missing.
+        """
+        metrics.increment("llm_output_total", task="board")
+        try:
+            data, repaired = parse_llm_json(text)
+        except ValueError as e:
+            metrics.increment("llm_output_invalid_total", task="board")
+            raise LLMOutputError(f"Invalid quiz board JSON in LLM output: {e}")
+        if repaired:
+            metrics.increment("llm_output_repaired_total", task="board")
+
+        title = data.get("title") if isinstance(data, dict) else None
+        raw_categories = data.get("categories") if isinstance(data, dict) else None
+        if not isinstance(title, str) or not title.strip() or not isinstance(raw_categories, list):
+            metrics.increment("llm_output_invalid_total", task="board")
+            raise LLMOutputError("Quiz board in LLM output has no title or categories")
+
+        raw_categories = raw_categories[:num_categories]
+        category_names = [category.get("name") if isinstance(category, dict) else None for category in raw_categories]
+        if len(raw_categories) < num_categories or not all(isinstance(name, str) and name.strip() for name in category_names):
+            metrics.increment("llm_output_invalid_total", task="board")
+            raise LLMOutputError(f"Quiz board in LLM output is missing some of its {num_categories} categories")
+
+        categories = []
+        regenerated = []
+        for index, raw_category in enumerate(raw_categories):
+            try:
+                category = LLMCategory.model_validate(raw_category)
+                questions = _check_questions(category.questions, num_questions)
+            except ValueError as e:
+                logger.warning(f"Category {index} of the streamed quiz board is invalid ({e}), generating it again")
+                metrics.increment("llm_category_regenerations_total")
+                questions = self.generate_category_questions(topic, title, category_names[index], category_names, num_questions)
+                regenerated.append(index)
+            categories.append({"name": category_names[index].strip(), "questions": questions})
+
+        if regenerated:
+            metrics.increment("llm_output_invalid_total", task="board")
+        return {"title": title.strip(), "categories": categories}, regenerated
+
+    def _complete_json(self, task: str, template: str, variables: Dict, schema: Type[BaseModel], check: Callable[[BaseModel], object]):
+        """
+        Run a prompt and return the validated result: the output is parsed (and repaired if needed),
+        validated against the schema, and passed to `check`, which returns the final value or raises ValueError.
+        An output that fails any of these is thrown away and the prompt retried, up to settings.LLM_OUTPUT_RETRIES times.
+        """
+        prompt = PromptTemplate.from_template(template).format(**variables)
+        error = None
+        for attempt in range(1 + settings.LLM_OUTPUT_RETRIES):
+            if error is not None:
+                # Also keeps the retry from being served the rejected answer by the record/replay store
+                prompt_to_send = prompt + RETRY_NOTE_TEMPLATE.format(error=error)
+            else:
+                prompt_to_send = prompt
+
+            response = self.provider.complete(task, prompt_to_send, variables)
+            metrics.increment("llm_output_total", task=task)
+            try:
+                data, repaired = parse_llm_json(response)
+                result = check(schema.model_validate(data))
+            except ValueError as e:
+                metrics.increment("llm_output_invalid_total", task=task)
+                logger.warning(f"Invalid LLM output for task '{task}' (attempt {attempt + 1}): {e}")
+                error = " ".join(str(e).split())[:300]
+                continue
+
+            if repaired:
+                metrics.increment("llm_output_repaired_total", task=task)
+            if attempt > 0:
+                metrics.increment("llm_output_retries_succeeded_total", task=task)
+            return result
+
+        raise LLMOutputError(f"Invalid LLM output for task '{task}': {error}")
+
+
+def _check_questions(questions: List, num_questions: int) -> List[Dict]:
+    if len(questions) < num_questions:
+        raise ValueError(f"expected {num_questions} questions, got {len(questions)}")
+    return [question.model_dump() for question in questions[:num_questions]]
 
-        quiz = chain.invoke({"topic": topic})
-        return quiz
-        
 
 def test_generate_quiz_board_from_topic():
     llm_service = LLMService()
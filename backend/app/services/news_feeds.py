@@ -0,0 +1,131 @@
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+from datetime import date, datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+class Headline(NamedTuple):
+    title: str
+    summary: str = ""
+    published: Optional[date] = None
+
+
+class NewsFeedError(Exception):
+    """Raised when a news feed can't be read."""
+
+
+class NewsFeedSource:
+    """
+    Interface of the sources of the headlines that daily news boards are generated from.
+    """
+    name = "base"
+
+    def headlines(self, day: date) -> List[Headline]:
+        """The headlines published on the day, most important first."""
+        raise NotImplementedError
+
+
+class FileNewsFeedSource(NewsFeedSource):
+    """
+    Headlines from local files, so that fetching the news is decoupled from generating the boards:
+    a cron job (or a test) drops feeds where this source reads them.
+
+    `path` is an RSS 2.0 or Atom feed (.xml, .rss, .atom), a JSON file (a list of items or
+    {"items": [...]}, each with a "title" and optionally a "summary" and an ISO "published" date),
+    or a directory of such files. Items without a date count as published on the day the file was modified.
+    """
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def headlines(self, day: date) -> List[Headline]:
+        if os.path.isdir(self.path):
+            paths = [os.path.join(self.path, name) for name in sorted(os.listdir(self.path))]
+        elif os.path.exists(self.path):
+            paths = [self.path]
+        else:
+            raise NewsFeedError(f"News feed not found: {self.path}")
+
+        headlines: Dict[str, Headline] = {}
+        for path in paths:
+            extension = os.path.splitext(path)[1].lower()
+            if extension not in (".json", ".xml", ".rss", ".atom"):
+                continue
+            modified_on = datetime.fromtimestamp(os.path.getmtime(path)).date()
+            try:
+                items = _read_json_feed(path) if extension == ".json" else _read_xml_feed(path)
+            except (ValueError, ElementTree.ParseError) as e:
+                # One broken file shouldn't cost the day's board
+                logger.error(f"Failed to read news feed {path}: {str(e)}")
+                continue
+
+            for item in items:
+                if (item.published or modified_on) == day:
+                    # The same story is often in several feeds
+                    headlines.setdefault(" ".join(item.title.casefold().split()), item)
+
+        return list(headlines.values())
+
+
+def _read_json_feed(path: str) -> List[Headline]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    items = data.get("items", []) if isinstance(data, dict) else data
+
+    headlines = []
+    for item in items:
+        if not isinstance(item, dict) or not str(item.get("title") or "").strip():
+            continue
+        headlines.append(Headline(
+            title=" ".join(str(item["title"]).split()),
+            summary=" ".join(str(item.get("summary") or "").split()),
+            published=_parse_date(item.get("published"))
+        ))
+    return headlines
+
+
+def _read_xml_feed(path: str) -> List[Headline]:
+    root = ElementTree.parse(path).getroot()
+    # RSS 2.0 items, or Atom entries
+    items = root.findall("./channel/item") or root.findall(f"{_ATOM}entry")
+
+    headlines = []
+    for item in items:
+        title = item.findtext("title") or item.findtext(f"{_ATOM}title") or ""
+        if not title.strip():
+            continue
+        summary = item.findtext("description") or item.findtext(f"{_ATOM}summary") or ""
+        published = item.findtext("pubDate") or item.findtext(f"{_ATOM}published") or item.findtext(f"{_ATOM}updated")
+        headlines.append(Headline(title=" ".join(title.split()), summary=" ".join(summary.split()), published=_parse_date(published)))
+    return headlines
+
+
+def _parse_date(value) -> Optional[date]:
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        # Python < 3.11 doesn't accept the "Z" suffix of UTC times
+        return datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value).date()
+    except ValueError:
+        pass
+    try:
+        # RSS dates are in the RFC 822 format: "Sat, 17 Oct 2026 06:00:00 GMT"
+        return parsedate_to_datetime(value).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def get_news_feed_source() -> NewsFeedSource:
+    """Build the news feed source selected by the settings (NEWS_FEED_SOURCE and NEWS_FEED_PATH)."""
+    if settings.NEWS_FEED_SOURCE == "file":
+        return FileNewsFeedSource(settings.NEWS_FEED_PATH)
+    raise ValueError(f"Unknown news feed source: {settings.NEWS_FEED_SOURCE}")
@@ -0,0 +1,206 @@
+from datetime import date, datetime, timedelta
+import os
+import socket
+import threading
+import uuid
+from typing import List, Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app.core import database
+from app.core.config import settings
+from app.core.logging import logger
+from app.models import Category, NewsGenerationClaim, Player, PlayerType, QuizBoard
+from app.services.llm_service import LLMService
+from app.services.news_feeds import NewsFeedSource, get_news_feed_source
+from app.services.quiz_board_service import QuizBoardService, DEFAULT_NUM_CATEGORIES, DEFAULT_NUM_QUESTIONS
+
+
+# Owner of the news boards, which no player asked for
+NEWS_PLAYER_NAME = "Jeopardyze News"
+
+# Every process of the app runs the scheduler: the one that claims the day in news_generation_claims generates its
+# boards, the others find them when they try again
+_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class NewsBoardService:
+    @staticmethod
+    async def get_latest_boards(db: AsyncSession, day: Optional[date] = None) -> List[QuizBoard]:
+        """
+        The news boards of the most recent day up to `day` (today by default), with their categories and questions.
+        Served from the database, so players never wait on the LLM; before today's boards are generated, yesterday's are returned.
+        """
+        day = day or date.today()
+        latest_date = await db.scalar(select(QuizBoard.news_date).filter(
+            QuizBoard.source_type == "news",
+            QuizBoard.news_date <= day
+        ).order_by(QuizBoard.news_date.desc()).limit(1))
+        if latest_date is None:
+            return []
+
+        return list(await db.scalars(select(QuizBoard).options(selectinload(QuizBoard.categories).selectinload(Category.questions)).filter(
+            QuizBoard.source_type == "news",
+            QuizBoard.news_date == latest_date
+        ).order_by(QuizBoard.id)))
+
+    @staticmethod
+    def generate_for_day(day: date, db: Session, source: Optional[NewsFeedSource] = None) -> List[QuizBoard]:
+        """
+        Generate the missing news boards of the day (settings.NEWS_BOARDS_PER_DAY) from its headlines,
+        split round-robin between the boards. Returns all the boards of the day; fewer than expected
+        if the feed has no headlines for the day yet, or another process is generating them.
+        """
+        boards = db.query(QuizBoard).filter(QuizBoard.source_type == "news", QuizBoard.news_date == day).order_by(QuizBoard.id).all()
+        if len(boards) >= settings.NEWS_BOARDS_PER_DAY:
+            return boards
+
+        if not NewsBoardService.claim_day(day, db):
+            logger.info(f"The news boards for {day} are generated by another process")
+            return boards
+        try:
+            # Generated by the previous owner of the claim in the meantime
+            db.expire_all()
+            boards = db.query(QuizBoard).filter(QuizBoard.source_type == "news", QuizBoard.news_date == day).order_by(QuizBoard.id).all()
+            if len(boards) >= settings.NEWS_BOARDS_PER_DAY:
+                return boards
+
+            headlines = (source or get_news_feed_source()).headlines(day)
+            if not headlines:
+                logger.warning(f"No headlines for {day} in the news feed yet")
+                return boards
+
+            num_boards = min(settings.NEWS_BOARDS_PER_DAY, len(headlines))
+            player = _get_news_player(db)
+            llm_service = LLMService()
+            for board_index in range(len(boards), num_boards):
+                board_headlines = [headline.title for headline in headlines[board_index::num_boards][:settings.NEWS_HEADLINES_PER_BOARD]]
+                logger.info(f"Generating news board {board_index + 1}/{num_boards} for {day} from {len(board_headlines)} headlines")
+                quiz_data = llm_service.generate_quiz_board_from_news(board_headlines, day, DEFAULT_NUM_CATEGORIES, DEFAULT_NUM_QUESTIONS)
+                boards.append(QuizBoardService.save_quiz_board(quiz_data, "news", "\n".join(board_headlines), player.id, db, news_date=day))
+
+            return boards
+        finally:
+            NewsBoardService.release_day(day, db)
+
+    @staticmethod
+    def claim_day(day: date, db: Session) -> bool:
+        """
+        Take the generation of the day's boards for this process, for settings.NEWS_CLAIM_MINUTES,
+        unless another process holds it. Returns whether it was claimed.
+        """
+        now = datetime.now()
+        claimed_until = now + timedelta(minutes=settings.NEWS_CLAIM_MINUTES)
+        claimed = db.execute(
+            update(NewsGenerationClaim)
+            .where(NewsGenerationClaim.news_date == day, or_(NewsGenerationClaim.owner == _owner, NewsGenerationClaim.claimed_until < now))
+            .values(owner=_owner, claimed_until=claimed_until)
+            .returning(NewsGenerationClaim.id)
+        ).scalars().all()
+        if claimed:
+            db.commit()
+            return True
+
+        # Nobody claimed the day yet, or its claim is held: the unique date lets a single process insert it
+        db.add(NewsGenerationClaim(news_date=day, owner=_owner, claimed_until=claimed_until))
+        try:
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+
+    @staticmethod
+    def release_day(day: date, db: Session) -> None:
+        """Let another process take over the day right away, e.g. to retry a failed generation."""
+        try:
+            db.rollback()
+            db.query(NewsGenerationClaim).filter(NewsGenerationClaim.news_date == day, NewsGenerationClaim.owner == _owner).update({"claimed_until": datetime.now()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to release the news generation claim of {day}: {str(e)}")
+
+
+def _get_news_player(db: Session) -> Player:
+    player = db.query(Player).filter(
+        Player.display_name == NEWS_PLAYER_NAME,
+        Player.player_type == PlayerType.GUEST,
+        Player.guest_id.is_(None)
+    ).first()
+    if not player:
+        player = Player(player_type=PlayerType.GUEST, display_name=NEWS_PLAYER_NAME)
+        db.add(player)
+        db.commit()
+        db.refresh(player)
+    return player
+
+
+class NewsScheduler:
+    """
+    Generates the day's news boards off-peak, at settings.NEWS_GENERATION_HOUR local time, on a background thread.
+    A server started after that hour catches up right away. While the feed has nothing for the day,
+    or generation fails, it tries again every settings.NEWS_RETRY_MINUTES.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="news-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = datetime.now()
+            generated_on = None
+            if now.hour >= settings.NEWS_GENERATION_HOUR:
+                if self._generate(now.date()):
+                    generated_on = now.date()
+
+            if generated_on or now.hour < settings.NEWS_GENERATION_HOUR:
+                next_run = datetime.combine(now.date(), datetime.min.time()).replace(hour=settings.NEWS_GENERATION_HOUR)
+                if next_run <= now:
+                    next_run += timedelta(days=1)
+            else:
+                next_run = now + timedelta(minutes=settings.NEWS_RETRY_MINUTES)
+            self._stop.wait((next_run - datetime.now()).total_seconds())
+
+    def _generate(self, day: date) -> bool:
+        """Whether all the boards of the day exist after the attempt."""
+        db = database.Session()
+        try:
+            return len(NewsBoardService.generate_for_day(day, db)) >= settings.NEWS_BOARDS_PER_DAY
+        except Exception as e:
+            logger.error(f"Failed to generate the news boards for {day}: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+
+news_scheduler = NewsScheduler()
+
+
+## Run as `python -m app.services.news_service` to generate today's news boards now, or `--date 2026-10-17` for another day
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate the news boards of a day from the news feed.")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today(), help="Day of the headlines, as YYYY-MM-DD (default: today).")
+    args = parser.parse_args()
+
+    db_session = database.Session()
+    try:
+        boards = NewsBoardService.generate_for_day(args.date, db_session)
+        print(f"{len(boards)} news boards for {args.date}: {[board.id for board in boards]}")
+    finally:
+        db_session.close()
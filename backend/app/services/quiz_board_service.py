@@ -1,110 +1,398 @@
+from datetime import date
+import hashlib
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+import re
+import threading
+import unicodedata
 from fastapi import HTTPException
+from app.core.cache import get_shared_cache, on_invalidate
+from app.core import database
 from app.core.logging import logger
 from app.models.quiz_board import QuizBoard
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, select
 
 from app.models import Category, GameSession, Question, Player
 from app.services.llm_service import LLMService
+from app.services.llm_resilience import LLMUnavailableError
+from app.services.board_snapshots import publish_saved_board
+from app.services.quiz_stream_parser import QuizBoardStreamParser
+from app.services.single_flight import SingleFlight
+from app.services.source_store import build_source, load_source
+from app.services.topic_index import TopicSimilarityIndex
+from app.core.config import settings
 from app.schemas.quiz_board import TopQuizBoardsResponse, TopQuizBoardModel
 
 
+# Generations that are in progress in this process, keyed by normalized topic.
+# Concurrent requests for the same topic wait for the one in flight instead of each calling the LLM.
+_topic_generations = SingleFlight()
+
+# Board dimensions: number of categories, and of questions per category (worth 100, 200, ... points)
+DEFAULT_NUM_CATEGORIES = 3
+DEFAULT_NUM_QUESTIONS = 4
+MAX_NUM_CATEGORIES = 6
+MAX_NUM_QUESTIONS = 5
+
+# Near-duplicate index over the topics and titles of all boards, loaded from the database on first use
+# and kept up to date as boards are saved by this process.
+_topic_index = TopicSimilarityIndex()
+_topic_index_lock = threading.Lock()
+
+# The first TOP_QUIZ_BOARDS_CACHED boards of GET /api/quiz-boards/top, in the shared cache
+TOP_QUIZ_BOARDS_KEY = "top_quiz_boards"
+
+
 class QuizBoardService:
     @staticmethod
-    def create_from_topic(topic: str, player_id: int, db: Session) -> QuizBoard:
-        # Check if the same topic already exists in the database
-        quiz_board = db.query(QuizBoard).filter(QuizBoard.source_content == topic).first()
+    def find_by_topic(topic: str, db: Session, num_categories: int = DEFAULT_NUM_CATEGORIES, num_questions: int = DEFAULT_NUM_QUESTIONS) -> Optional[QuizBoard]:
+        """Find an existing quiz board of the same size generated from the same topic, ignoring case, whitespace and punctuation."""
+        return db.query(QuizBoard).filter(
+            QuizBoard.topic_key == normalize_topic(topic),
+            QuizBoard.source_type == "topic",
+            QuizBoard.num_categories == num_categories,
+            QuizBoard.num_questions == num_questions
+        ).first()
+
+    @staticmethod
+    def find_similar(topic: str, db: Session, threshold: float, limit: int = 5, acronyms: bool = True) -> List[Tuple[QuizBoard, float]]:
+        """
+        Find quiz boards whose topic or title is a near-duplicate of the topic, or with `acronyms`, whose acronym
+        it is, e.g. "MCU" for "Marvel Cinematic Universe". Returns (quiz_board, similarity) pairs, most similar first.
+        """
+        QuizBoardService._load_topic_index(db)
+        matches = _topic_index.query(normalize_topic(topic), threshold, limit, acronyms)
+        if not matches:
+            return []
+
+        quiz_boards = {quiz_board.id: quiz_board for quiz_board in db.query(QuizBoard).filter(QuizBoard.id.in_([quiz_board_id for quiz_board_id, _ in matches]))}
+        return [(quiz_boards[quiz_board_id], similarity) for quiz_board_id, similarity in matches if quiz_board_id in quiz_boards]
+
+    @staticmethod
+    def find_reusable_board(topic: str, db: Session, num_categories: int = DEFAULT_NUM_CATEGORIES, num_questions: int = DEFAULT_NUM_QUESTIONS) -> Optional[QuizBoard]:
+        """
+        An existing board of the same size for the same topic, or failing that, for a topic that is similar enough to reuse.
+        Acronyms are ambiguous ("CIA" would reuse "Cold Italian Appetizers"), so they are only offered by find_similar.
+        """
+        quiz_board = QuizBoardService.find_by_topic(topic, db, num_categories, num_questions)
+        if quiz_board:
+            return quiz_board
+
+        similar = QuizBoardService.find_similar(topic, db, settings.TOPIC_REUSE_SIMILARITY, acronyms=False)
+        for quiz_board, similarity in similar:
+            if quiz_board.num_categories == num_categories and quiz_board.num_questions == num_questions:
+                logger.info(f"Topic: {topic} is similar to the topic of quiz board {quiz_board.id} (similarity {similarity:.2f})")
+                return quiz_board
+
+        return None
+
+    @staticmethod
+    def _load_topic_index(db: Session) -> None:
+        if _topic_index.loaded:
+            return
+        with _topic_index_lock:
+            if _topic_index.loaded:
+                return
+            rows = db.query(QuizBoard.id, QuizBoard.topic_key, QuizBoard.title).all()
+            for quiz_board_id, topic_key, title in rows:
+                QuizBoardService._index_topic(quiz_board_id, topic_key, title)
+            _topic_index.loaded = True
+            logger.info(f"Loaded {len(rows)} quiz boards into the topic similarity index")
+
+    @staticmethod
+    def _index_topic(quiz_board_id: int, topic_key: Optional[str], title: str) -> None:
+        if topic_key:
+            _topic_index.add(quiz_board_id, topic_key)
+        _topic_index.add(quiz_board_id, normalize_topic(title))
+
+    @staticmethod
+    def create_from_topic(topic: str, player_id: int, db: Session, num_categories: int = DEFAULT_NUM_CATEGORIES, num_questions: int = DEFAULT_NUM_QUESTIONS) -> QuizBoard:
+        # Check if the same (or a near-duplicate) topic already exists in the database
+        quiz_board = QuizBoardService.find_reusable_board(topic, db, num_categories, num_questions)
         if quiz_board:
             logger.info(f"Quiz board already exists for topic: {topic}, reusing it")
 
         if not quiz_board:
-            # Generate the quiz board
-            logger.info(f"Generating quiz board from LLM service for topic: {topic}")
+            flight_key = (normalize_topic(topic), num_categories, num_questions)
+            if _topic_generations.in_flight(flight_key):
+                logger.info(f"Quiz board for topic: {topic} is already being generated, waiting for it")
+
+            quiz_board_id = _topic_generations.do(
+                flight_key,
+                lambda: QuizBoardService._generate_from_topic(topic, player_id, db, num_categories, num_questions).id
+            )
+            quiz_board = db.query(QuizBoard).filter(QuizBoard.id == quiz_board_id).first()
+
+        logger.info(f"Successfully created quiz board. Quiz Board ID: {quiz_board.id}")
+
+        return quiz_board
+
+    @staticmethod
+    def _generate_from_topic(topic: str, player_id: int, db: Session, num_categories: int, num_questions: int) -> QuizBoard:
+        # Another request may have finished generating this topic since we last checked
+        quiz_board = QuizBoardService.find_reusable_board(topic, db, num_categories, num_questions)
+        if quiz_board:
+            return quiz_board
+
+        # Generate the quiz board
+        logger.info(f"Generating quiz board from LLM service for topic: {topic}")
+        try:
+            llm_service = LLMService()
+            quiz_data = llm_service.generate_quiz_board_from_topic(topic, num_categories, num_questions)
+        except LLMUnavailableError as e:
+            logger.error(f"Failed to generate quiz board: {str(e)}")
+            raise HTTPException(status_code=503, detail="Quiz generation is temporarily unavailable, please try again later")
+        except Exception as e:
+            logger.error(f"Failed to generate quiz board: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to get response from LLM. Error: {e}")
+
+        return QuizBoardService.save_quiz_board(quiz_data, "topic", topic, player_id, db)
+
+    @staticmethod
+    def stream_from_topic(topic: str, player_id: int, db: Session, num_categories: int = DEFAULT_NUM_CATEGORIES, num_questions: int = DEFAULT_NUM_QUESTIONS) -> Iterator[Tuple[str, Dict]]:
+        """
+        Generate a quiz board from a topic, yielding (event, data) tuples as soon as the
+        title, each category and each question have been parsed from the LLM token stream.
+        The answers are never part of the events. The last event is "done" with the id of the saved quiz board.
+        """
+        flight_key = (normalize_topic(topic), num_categories, num_questions)
+        quiz_board = QuizBoardService.find_reusable_board(topic, db, num_categories, num_questions)
+        if not quiz_board:
+            call, is_leader = _topic_generations.begin(flight_key)
+            if not is_leader:
+                logger.info(f"Quiz board for topic: {topic} is already being generated, waiting for it")
+                quiz_board_id = call.wait()
+                quiz_board = db.query(QuizBoard).filter(QuizBoard.id == quiz_board_id).first()
+            else:
+                # Another request may have finished generating this topic since we last checked
+                try:
+                    quiz_board = QuizBoardService.find_reusable_board(topic, db, num_categories, num_questions)
+                except BaseException as e:
+                    _topic_generations.fail(flight_key, call, e)
+                    raise
+                if quiz_board:
+                    _topic_generations.finish(flight_key, call, quiz_board.id)
+
+        if quiz_board:
+            logger.info(f"Quiz board already exists for topic: {topic}, streaming it from the database")
+            yield "title", {"title": quiz_board.title}
+            for category_index, category in enumerate(quiz_board.categories):
+                yield "category", {"category_index": category_index, "name": category.name}
+                for question_index, question in enumerate(category.questions):
+                    yield "question", {
+                        "category_index": category_index,
+                        "question_index": question_index,
+                        "question_text": question.question_text,
+                        "points": question.points
+                    }
+            yield "done", {"quiz_board_id": quiz_board.id}
+            return
+
+        logger.info(f"Streaming quiz board from LLM service for topic: {topic}")
+        try:
+            parser = QuizBoardStreamParser()
             try:
                 llm_service = LLMService()
-                quiz_data = llm_service.generate_quiz_board_from_topic(topic)
+                for chunk in llm_service.stream_quiz_board_from_topic(topic, num_categories, num_questions):
+                    for event, data in parser.feed(chunk):
+                        if event == "question":
+                            data = {
+                                "category_index": data["category_index"],
+                                "question_index": data["question_index"],
+                                "question_text": data["question_text"],
+                                "points": (data["question_index"] + 1) * 100
+                            }
+                        yield event, data
+
+                quiz_data, regenerated = llm_service.finish_streamed_board(parser.text, topic, num_categories, num_questions)
+                # Send the categories that had to be generated again; they replace the ones already streamed
+                for category_index in regenerated:
+                    category = quiz_data["categories"][category_index]
+                    yield "category", {"category_index": category_index, "name": category["name"]}
+                    for question_index, question in enumerate(category["questions"]):
+                        yield "question", {
+                            "category_index": category_index,
+                            "question_index": question_index,
+                            "question_text": question["question_text"],
+                            "points": (question_index + 1) * 100
+                        }
+            except LLMUnavailableError as e:
+                logger.error(f"Failed to stream quiz board: {str(e)}")
+                raise HTTPException(status_code=503, detail="Quiz generation is temporarily unavailable, please try again later")
             except Exception as e:
-                logger.error(f"Failed to generate quiz board: {str(e)}")
+                logger.error(f"Failed to stream quiz board: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Failed to get response from LLM. Error: {e}")
 
-            # quiz_data is a json object of the following format:
-            # {
-            #     "title": "Quiz Title",
-            #     "categories": [
-            #         {
-            #             "name": "Category Name",
-            #             "questions": [
-            #                 {
-            #                     "question_text": "Question Text",
-            #                     "answer": "Answer Text",
-            #                     "points": 100
-            #                 },
-            #                 ...
-            #             ]
-            #         },
-            #         ...
-            #     ]
-            # }
-
-            # Create quiz board in database
-            quiz_board = QuizBoard(
-                title=quiz_data["title"],
-                source_type="topic",
-                source_content=topic,
-                created_by_player_id=player_id
-            )
-            
-            # Add quiz data to the database
-            logger.info(f"Adding new quiz board to the database")
-            try:
-                db.add(quiz_board)
+            quiz_board = QuizBoardService.save_quiz_board(quiz_data, "topic", topic, player_id, db)
+        except BaseException as e:
+            # Also covers the client going away mid-stream (GeneratorExit); the waiting requests get an error either way
+            error = e if isinstance(e, HTTPException) else HTTPException(status_code=500, detail="Quiz board generation was interrupted")
+            _topic_generations.fail(flight_key, call, error)
+            raise
+
+        _topic_generations.finish(flight_key, call, quiz_board.id)
+        logger.info(f"Successfully created quiz board. Quiz Board ID: {quiz_board.id}")
+        yield "done", {"quiz_board_id": quiz_board.id}
+
+    @staticmethod
+    def save_quiz_board(quiz_data: Dict, source_type: str, source_content: str, player_id: int, db: Session, news_date: Optional[date] = None) -> QuizBoard:
+        """
+        Persist a quiz board generated by the LLM service, along with its categories and questions.
+        """
+        # quiz_data is a json object of the following format:
+        # {
+        #     "title": "Quiz Title",
+        #     "categories": [
+        #         {
+        #             "name": "Category Name",
+        #             "questions": [
+        #                 {
+        #                     "question_text": "Question Text",
+        #                     "correct_answer": "Answer Text"
+        #                 },
+        #                 ...
+        #             ]
+        #         },
+        #         ...
+        #     ]
+        # }
+
+        # Create quiz board in database
+        quiz_board = QuizBoard(
+            title=quiz_data["title"],
+            source_type=source_type,
+            topic_key=normalize_topic(source_content) if source_type == "topic" else None,
+            num_categories=len(quiz_data["categories"]),
+            num_questions=max((len(cat_data["questions"]) for cat_data in quiz_data["categories"]), default=0),
+            news_date=news_date,
+            created_by_player_id=player_id
+        )
+
+        # Add quiz data to the database
+        logger.info(f"Adding new quiz board to the database")
+        try:
+            db.add(quiz_board)
+            db.flush()
+            # Stored apart from the board, compressed: it can be a whole document
+            db.add(build_source(quiz_board.id, source_content))
+
+            # Create categories and questions
+            for cat_data in quiz_data["categories"]:
+                category = Category(
+                    name=cat_data["name"],
+                    quiz_board_id=quiz_board.id
+                )
+                db.add(category)
                 db.flush()
-                
-                # Create categories and questions
-                for cat_data in quiz_data["categories"]:
-                    category = Category(
-                        name=cat_data["name"],
-                        quiz_board_id=quiz_board.id
+
+                # Create questions for this category
+                points = 100
+                for q_data in cat_data["questions"]:
+                    question = Question(
+                        category_id=category.id,
+                        question_text=q_data["question_text"],
+                        correct_answer=q_data["correct_answer"],
+                        points=points
                     )
-                    db.add(category)
-                    db.flush()
-                    
-                    # Create questions for this category
-                    points = 100
-                    for q_data in cat_data["questions"]:
-                        question = Question(
-                            category_id=category.id,
-                            question_text=q_data["question_text"],
-                            correct_answer=q_data["correct_answer"],
-                            points=points
-                        )
-                        db.add(question)
-                        points += 100
-                
-                db.commit()
-                db.refresh(quiz_board)
+                    db.add(question)
+                    points += 100
 
-            except Exception as e:
-                db.rollback()
-                logger.error(f"Failed to add quiz board to database: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to add the generated quiz board to the database. Error: {str(e)}"
-                )
+            db.commit()
+            db.refresh(quiz_board)
 
-        logger.info(f"Successfully created quiz board. Quiz Board ID: {quiz_board.id}")
+            if _topic_index.loaded:
+                QuizBoardService._index_topic(quiz_board.id, quiz_board.topic_key, quiz_board.title)
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to add quiz board to database: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to add the generated quiz board to the database. Error: {str(e)}"
+            )
+
+        # Its public content never changes from now on: publish it for nginx to serve
+        publish_saved_board(quiz_board)
+        # Have the other processes index its topic, and drop any board they cached under its id
+        get_shared_cache().invalidate(f"board:{quiz_board.id}", TOP_QUIZ_BOARDS_KEY)
 
         return quiz_board
 
     @staticmethod
-    def get_top_quiz_boards(db: Session, limit: int = 10, offset: int = 0) -> TopQuizBoardsResponse:
+    async def get_quiz_boards(db: AsyncSession, search: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[QuizBoard]:
+        """Quiz boards with their categories and questions, optionally those whose title contains `search`."""
+        query = select(QuizBoard).options(selectinload(QuizBoard.categories).selectinload(Category.questions))
+        if search:
+            query = query.filter(QuizBoard.title.ilike(f"%{search}%"))
+        return list(await db.scalars(query.order_by(QuizBoard.id).limit(limit).offset(offset)))
+
+    @staticmethod
+    async def get_source(quiz_board_id: int, player: Player, db: AsyncSession) -> Tuple[QuizBoard, str]:
+        """
+        The content a quiz board was generated from. Documents are only shown to the player who uploaded them.
+        """
+        quiz_board = await db.get(QuizBoard, quiz_board_id)
+        if not quiz_board:
+            raise HTTPException(status_code=404, detail="Quiz board not found")
+        if quiz_board.source_type == "document" and quiz_board.created_by_player_id != player.id:
+            raise HTTPException(status_code=403, detail="Not authorized to access the source of this quiz board")
+
+        source_content = await db.run_sync(lambda session: load_source(quiz_board.id, session))
+        if source_content is None:
+            raise HTTPException(status_code=404, detail="Quiz board source not found")
+        return quiz_board, source_content
+
+    @staticmethod
+    async def get_top_quiz_boards_version(db: AsyncSession, limit: int = 10, offset: int = 0) -> str:
+        """
+        What a page of the top quiz boards depends on, without building it: a hash of the cached list, or for the
+        pages past it, one aggregate query over the boards and game sessions.
+        """
+        if offset + limit <= settings.TOP_QUIZ_BOARDS_CACHED:
+            return hashlib.sha256(await QuizBoardService._get_cached_top_quiz_boards(db)).hexdigest()
+
+        boards = select(func.count(QuizBoard.id), func.max(QuizBoard.id)).subquery()
+        sessions = select(
+            func.count(GameSession.id), func.max(GameSession.id), func.sum(GameSession.answered_count), func.max(GameSession.completed_at)
+        ).subquery()
+        return "-".join(str(part) for part in (await db.execute(select(boards, sessions))).one())
+
+    @staticmethod
+    async def get_top_quiz_boards(db: AsyncSession, limit: int = 10, offset: int = 0) -> TopQuizBoardsResponse:
         """
         Get top quiz boards sorted by number of game sessions, including top score information.
+        The first TOP_QUIZ_BOARDS_CACHED are cached for TOP_QUIZ_BOARDS_CACHE_SECONDS in the shared cache; new boards
+        and completed games invalidate them, so only the numbers of sessions can be behind.
         """
+        if offset + limit > settings.TOP_QUIZ_BOARDS_CACHED:
+            top_quiz_boards = await QuizBoardService._query_top_quiz_boards(db, limit, offset)
+        else:
+            cached = json.loads(await QuizBoardService._get_cached_top_quiz_boards(db))
+            top_quiz_boards = [TopQuizBoardModel(**quiz_board) for quiz_board in cached[offset:offset + limit]]
+
+        return TopQuizBoardsResponse(
+            quiz_boards=top_quiz_boards,
+            total=len(top_quiz_boards),
+            limit=limit,
+            offset=offset
+        )
+
+    @staticmethod
+    async def _get_cached_top_quiz_boards(db: AsyncSession) -> bytes:
+        async def compute() -> bytes:
+            top = await QuizBoardService._query_top_quiz_boards(db, settings.TOP_QUIZ_BOARDS_CACHED, 0)
+            return json.dumps([quiz_board.model_dump(mode="json") for quiz_board in top]).encode()
+
+        return await get_shared_cache().get_or_compute(TOP_QUIZ_BOARDS_KEY, compute, settings.TOP_QUIZ_BOARDS_CACHE_SECONDS)
+
+    @staticmethod
+    async def _query_top_quiz_boards(db: AsyncSession, limit: int, offset: int) -> List[TopQuizBoardModel]:
         try:
             # First create a subquery for top scores with the most recent timestamp
             top_scores = (
-                db.query(
+                select(
                     GameSession.quiz_board_id,
                     GameSession.score,
                     GameSession.player_id,
@@ -121,8 +409,8 @@ class QuizBoardService:
             )
 
             # Then use it in the main query
-            quiz_boards = (
-                db.query(
+            quiz_boards = (await db.execute(
+                select(
                     QuizBoard,
                     func.count(GameSession.id).label('total_sessions'),
                     top_scores.c.score.label('top_score'),
@@ -139,11 +427,11 @@ class QuizBoardService:
                     Player.id == top_scores.c.player_id
                 )
                 .group_by(QuizBoard.id, Player.display_name, top_scores.c.score)
+                .options(selectinload(QuizBoard.created_by_player))
                 .order_by(desc('total_sessions'))
                 .limit(limit)
                 .offset(offset)
-                .all()
-            )
+            )).all()
 
             # Convert to response model
             top_quiz_boards = []
@@ -163,16 +451,43 @@ class QuizBoardService:
                     )
                 )
 
-            return TopQuizBoardsResponse(
-                quiz_boards=top_quiz_boards,
-                total=len(top_quiz_boards),
-                limit=limit,
-                offset=offset
-            )
+            return top_quiz_boards
 
         except Exception as e:
             logger.error(f"Failed to get top quiz boards: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to get top quiz boards. Error: {str(e)}"
-            )
\ No newline at end of file
+            )
+
+
+def normalize_topic(topic: str) -> str:
+    """
+    Fold a topic into the key used to find boards generated for the same topic:
+    case, accents, punctuation and whitespace are ignored. "  The Beatles!" -> "the beatles"
+    """
+    topic = unicodedata.normalize("NFKD", topic)
+    topic = "".join(char for char in topic if not unicodedata.combining(char))
+    topic = re.sub(r"[\W_]+", " ", topic.casefold())
+    return topic.strip()
+
+
+def _index_board_of_other_process(key: str) -> None:
+    # A board saved by another process ("board:<id>"); "*" when some may have been missed
+    if key == "*":
+        with _topic_index_lock:
+            _topic_index.loaded = False
+        return
+    if not _topic_index.loaded:
+        return
+    quiz_board_id = int(key.split(":", 1)[1])
+    db = database.Session()
+    try:
+        row = db.query(QuizBoard.topic_key, QuizBoard.title).filter(QuizBoard.id == quiz_board_id).first()
+    finally:
+        db.close()
+    if row:
+        QuizBoardService._index_topic(quiz_board_id, row.topic_key, row.title)
+
+
+on_invalidate("board:", _index_board_of_other_process)
@@ -0,0 +1,120 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.llm_output import parse_llm_json
+
+
+class QuizBoardStreamParser:
+    """
+    Incremental parser for the quiz board JSON produced by the LLM.
+
+    Feed it the text chunks as they arrive from the token stream; it returns the parts of the
+    board that became complete with each chunk, as (event, data) tuples:
+
+        ("title", {"title": ...})
+        ("category", {"category_index": i, "name": ...})
+        ("question", {"category_index": i, "question_index": j, "question_text": ..., "correct_answer": ...})
+
+    Anything before the first "{" (e.g. a ```json fence) is ignored. Once the stream is over,
+    result() returns the whole board as parsed JSON.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[Dict[str, Any]] = []  # One frame per open object / array
+        self._string_start: Optional[int] = None
+        self._escape = False
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict]]:
+        events = []
+        self._text += chunk
+
+        while self._pos < len(self._text) and self._root_end is None:
+            i = self._pos
+            char = self._text[i]
+            self._pos += 1
+
+            if self._string_start is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._on_string(json.loads(self._text[self._string_start:i + 1], strict=False), events)
+                    self._string_start = None
+                continue
+
+            if self._root_start is None:
+                if char == "{":
+                    self._root_start = i
+                    self._stack.append({"kind": "object", "start": i, "key": None, "expect_key": True})
+                continue
+
+            if char == '"':
+                self._string_start = i
+            elif char == "{":
+                self._stack.append({"kind": "object", "start": i, "key": None, "expect_key": True})
+            elif char == "[":
+                self._stack.append({"kind": "array", "start": i, "index": 0})
+            elif char == ",":
+                frame = self._stack[-1]
+                if frame["kind"] == "object":
+                    frame["key"] = None
+                    frame["expect_key"] = True
+                else:
+                    frame["index"] += 1
+            elif char in "}]":
+                frame = self._stack.pop()
+                if frame["kind"] == "object":
+                    self._on_object(self._text[frame["start"]:i + 1], events)
+                if not self._stack:
+                    self._root_end = i
+
+        return events
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._text
+
+    def result(self) -> Dict:
+        """The complete board. Raises ValueError if the stream ended before the JSON was complete."""
+        if self._root_start is None or self._root_end is None:
+            raise ValueError("Incomplete quiz board JSON in LLM output")
+        return parse_llm_json(self._text[self._root_start:self._root_end + 1])[0]
+
+    def _path(self) -> List:
+        return [frame["key"] if frame["kind"] == "object" else frame["index"] for frame in self._stack]
+
+    def _on_string(self, value: str, events: List[Tuple[str, Dict]]) -> None:
+        frame = self._stack[-1]
+        if frame["kind"] == "object" and frame["expect_key"]:
+            frame["key"] = value
+            frame["expect_key"] = False
+            return
+
+        path = self._path()
+        if path == ["title"]:
+            events.append(("title", {"title": value}))
+        elif len(path) == 3 and path[0] == "categories" and path[2] == "name":
+            events.append(("category", {"category_index": path[1], "name": value}))
+
+    def _on_object(self, raw: str, events: List[Tuple[str, Dict]]) -> None:
+        # The frame of the closed object has already been popped, so this is the path to the object itself
+        path = self._path()
+        if len(path) == 4 and path[0] == "categories" and path[2] == "questions":
+            try:
+                question, _ = parse_llm_json(raw)
+            except ValueError:
+                # Left out of the events; the category gets regenerated when the board is validated
+                return
+            events.append(("question", {
+                "category_index": path[1],
+                "question_index": path[3],
+                "question_text": question.get("question_text"),
+                "correct_answer": question.get("correct_answer"),
+            }))
+
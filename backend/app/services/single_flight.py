@@ -0,0 +1,78 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self._done = threading.Event()
+        self._result: Any = None
+        self._error: BaseException | None = None
+
+    def resolve(self, result: Any) -> None:
+        self._result = result
+        self._done.set()
+
+    def fail(self, error: BaseException) -> None:
+        self._error = error
+        self._done.set()
+
+    def wait(self) -> Any:
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key, so that only one of them (the leader) does
+    the work and the others wait for its result. Nothing is cached once the call is done.
+
+        flight = SingleFlight()
+        result = flight.do(key, expensive_function)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def begin(self, key: Hashable) -> Tuple[_Call, bool]:
+        """
+        Join the in-flight call for the key, or start a new one.
+        Returns (call, is_leader). The leader must end the call with finish() or fail();
+        the others wait() on it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+
+    def finish(self, key: Hashable, call: _Call, result: Any) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        call.resolve(result)
+
+    def fail(self, key: Hashable, call: _Call, error: BaseException) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        call.fail(error)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        call, is_leader = self.begin(key)
+        if not is_leader:
+            return call.wait()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.fail(key, call, e)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
@@ -0,0 +1,45 @@
+import zlib
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.models.quiz_board_source import QuizBoardSource
+
+# The source content of quiz boards is stored compressed, in its own table, and only read on request.
+# zstd is used when the optional zstandard package is installed, zlib otherwise; both can always be stored side by side.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+
+
+def compress_source(content: str) -> Tuple[str, bytes]:
+    """Returns (encoding, compressed content)."""
+    data = content.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_source(encoding: str, data: bytes) -> str:
+    if encoding == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This source content is zstd-compressed, but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown source content encoding: {encoding}")
+
+
+def build_source(quiz_board_id: int, content: str) -> QuizBoardSource:
+    encoding, data = compress_source(content)
+    return QuizBoardSource(quiz_board_id=quiz_board_id, encoding=encoding, content=data, size=len(content))
+
+
+def load_source(quiz_board_id: int, db: Session) -> Optional[str]:
+    source = db.query(QuizBoardSource).filter(QuizBoardSource.quiz_board_id == quiz_board_id).first()
+    if source is None:
+        return None
+    return decompress_source(source.encoding, source.content)
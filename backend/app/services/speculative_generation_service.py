@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import database
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+from app.models import GameSession, QuizBoard
+from app.schemas import PlayNextBoardPyd
+from app.services.bulk_generation_service import GenerationBudget
+from app.services.generation_jobs_service import GenerationJobsService
+from app.services.llm_service import LLMService, FOLLOW_UP_TOPICS_TEMPLATE, CHARS_PER_TOKEN
+from app.services.quiz_board_service import QuizBoardService, DEFAULT_NUM_CATEGORIES, DEFAULT_NUM_QUESTIONS, MAX_NUM_CATEGORIES, MAX_NUM_QUESTIONS
+
+
+# While a player is in the middle of a game, the topics they are likely to ask for next are derived from the
+# board, and their boards are generated on a single background thread, so that the next board is ready when
+# the game ends. Player jobs always go first: a speculative generation is skipped while any is pending, and
+# speculation has its own requests/tokens budget so that it can never eat into the players' share.
+
+# Rough cost of the follow-up topics call
+FOLLOW_UP_TOPICS_TOKENS = len(FOLLOW_UP_TOPICS_TEMPLATE) // CHARS_PER_TOKEN + 50
+
+# Play next boards of the recent game sessions: session id -> quiz board ids. In memory only; after a
+# restart the sessions simply have none. Sessions in this dict are never speculated for again.
+MAX_TRACKED_SESSIONS = 1000
+_play_next: "OrderedDict[int, List[int]]" = OrderedDict()
+_play_next_lock = threading.Lock()
+
+_executor: ThreadPoolExecutor | None = None
+_budget: GenerationBudget | None = None
+
+
+class SpeculativeGenerationService:
+    @staticmethod
+    def on_question_answered(game_session_id: int, answered_count: int, game_status: str) -> None:
+        """
+        Start speculating for a game session once the player has answered settings.SPECULATIVE_MIN_ANSWERS
+        questions (or finished the game), at most once per session. Takes the progress that recording the
+        answer returned, so it runs no query. Returns immediately.
+        """
+        if not settings.SPECULATIVE_GENERATION_ENABLED:
+            return
+        if answered_count < settings.SPECULATIVE_MIN_ANSWERS and game_status != "completed":
+            return
+
+        with _play_next_lock:
+            if game_session_id in _play_next:
+                return
+            _play_next[game_session_id] = []
+            while len(_play_next) > MAX_TRACKED_SESSIONS:
+                _play_next.popitem(last=False)
+
+        _get_executor().submit(SpeculativeGenerationService.speculate, game_session_id)
+
+    @staticmethod
+    def speculate(game_session_id: int) -> None:
+        """
+        Generate the boards of the likely follow-up topics of a game session, publishing each one to its
+        play next list as soon as it is ready. Executed on the speculation thread with its own DB session.
+        """
+        db = database.Session()
+        try:
+            game_session = db.query(GameSession).filter(GameSession.id == game_session_id).first()
+            if not game_session:
+                return
+            quiz_board = game_session.quiz_board
+            num_categories = quiz_board.num_categories or DEFAULT_NUM_CATEGORIES
+            num_questions = quiz_board.num_questions or DEFAULT_NUM_QUESTIONS
+            requests, tokens = LLMService.estimate_usage(num_categories, num_questions)
+            budget = _get_budget()
+
+            if not SpeculativeGenerationService._admit(budget, 1, FOLLOW_UP_TOPICS_TOKENS):
+                return
+            llm_service = LLMService()
+            topics = llm_service.suggest_follow_up_topics(quiz_board.title, [category.name for category in quiz_board.categories], settings.SPECULATIVE_TOPICS_PER_SESSION)
+            logger.info(f"Follow-up topics of game session {game_session_id}: {topics}")
+
+            board_ids = []
+            for topic in topics:
+                follow_up = QuizBoardService.find_reusable_board(topic, db, num_categories, num_questions)
+                if not follow_up:
+                    if not SpeculativeGenerationService._admit(budget, requests, tokens):
+                        continue
+                    metrics.increment("speculative_generations_total")
+                    follow_up = QuizBoardService.create_from_topic(topic, game_session.player_id, db, num_categories, num_questions)
+
+                if follow_up.id != quiz_board.id and follow_up.id not in board_ids:
+                    board_ids.append(follow_up.id)
+                    with _play_next_lock:
+                        if game_session_id in _play_next:
+                            _play_next[game_session_id] = list(board_ids)
+        except Exception as e:
+            # Nothing is lost: the player can still ask for any topic
+            detail = getattr(e, "detail", str(e))
+            logger.warning(f"Speculative generation for game session {game_session_id} failed: {detail}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _admit(budget: GenerationBudget, requests: int, tokens: int) -> bool:
+        if GenerationJobsService.pending_jobs() > 0:
+            metrics.increment("speculative_generations_skipped_total", reason="busy")
+            return False
+        admitted, _ = budget.try_acquire(requests, tokens)
+        if not admitted:
+            metrics.increment("speculative_generations_skipped_total", reason="budget")
+        return admitted
+
+    @staticmethod
+    def get_play_next_ids(game_session_id: int) -> List[int]:
+        """The ids of the play next boards of a game session, without loading them."""
+        with _play_next_lock:
+            return list(_play_next.get(game_session_id, []))
+
+    @staticmethod
+    async def get_play_next(game_session_id: int, db: AsyncSession) -> List[PlayNextBoardPyd]:
+        """The boards generated (or found) so far for the likely follow-up topics of a game session."""
+        with _play_next_lock:
+            board_ids = list(_play_next.get(game_session_id, []))
+        if not board_ids:
+            return []
+
+        titles = dict((await db.execute(select(QuizBoard.id, QuizBoard.title).filter(QuizBoard.id.in_(board_ids)))).all())
+        return [PlayNextBoardPyd(id=board_id, title=titles[board_id]) for board_id in board_ids if board_id in titles]
+
+    @staticmethod
+    def shutdown() -> None:
+        global _executor
+        if _executor:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # A single thread: speculation never takes more than one generation's worth of LLM concurrency
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative-generation")
+    return _executor
+
+
+def _get_budget() -> GenerationBudget:
+    global _budget
+    if _budget is None:
+        requests, tokens = LLMService.estimate_usage(MAX_NUM_CATEGORIES, MAX_NUM_QUESTIONS)
+        _budget = GenerationBudget(settings.SPECULATIVE_REQUESTS_PER_MINUTE, settings.SPECULATIVE_TOKENS_PER_MINUTE, requests, tokens)
+    return _budget
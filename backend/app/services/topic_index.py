@@ -0,0 +1,120 @@
+import random
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+# Mersenne prime used for the MinHash permutations (a * x + b) mod P
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+class TopicSimilarityIndex:
+    """
+    In-memory near-duplicate index of topics, using MinHash signatures bucketed with LSH.
+
+    Each quiz board is indexed under a few texts (its topic, its title, and their acronyms).
+    An acronym stands for many topics ("cia" for "cold italian appetizers"), so its matches can be left out.
+    A text is turned into a set of shingles (character trigrams and words); the Jaccard similarity
+    of two shingle sets is estimated by the fraction of equal MinHash values in their signatures.
+    LSH splits the signature into bands, so a query only compares against entries that share at
+    least one band, instead of scanning every topic.
+
+    With the defaults (64 permutations, 16 bands of 4 rows), pairs above ~0.5 similarity
+    are very likely to become candidates and pairs below ~0.3 rarely do.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 42):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = random.Random(seed)
+        self._permutations = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+        self._lock = threading.Lock()
+        self._signatures: Dict[int, Tuple[int, ...]] = {}  # entry id -> signature
+        self._entry_board: Dict[int, int] = {}  # entry id -> quiz board id
+        self._acronyms: Set[int] = set()  # entry ids of acronyms
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[int]] = defaultdict(set)
+        self._indexed: Set[Tuple[int, str]] = set()  # (quiz board id, text), to skip duplicates
+        self.loaded = False
+
+    def add(self, quiz_board_id: int, text: str) -> None:
+        """Index a quiz board under the text and its acronym. Texts must already be normalized."""
+        for variant, is_acronym in _variants(text):
+            with self._lock:
+                if (quiz_board_id, variant) in self._indexed:
+                    continue
+                self._indexed.add((quiz_board_id, variant))
+
+            signature = self._signature(variant)
+            with self._lock:
+                entry_id = len(self._signatures)
+                self._signatures[entry_id] = signature
+                self._entry_board[entry_id] = quiz_board_id
+                if is_acronym:
+                    self._acronyms.add(entry_id)
+                for band in self._bands(signature):
+                    self._buckets[band].add(entry_id)
+
+    def query(self, text: str, threshold: float, limit: int = 5, acronyms: bool = True) -> List[Tuple[int, float]]:
+        """
+        Quiz boards whose indexed texts are estimated to be at least `threshold` similar to the text,
+        as (quiz_board_id, similarity) sorted by most similar first. With `acronyms` false, only the
+        texts themselves are matched, not their acronyms.
+        """
+        # Only the indexed side gets acronyms, so "mcu" finds "marvel cinematic universe"
+        # but "marvel movies" doesn't match every board that abbreviates to "mm"
+        signature = self._signature(text)
+        with self._lock:
+            candidates = set()
+            for band in self._bands(signature):
+                candidates.update(self._buckets.get(band, ()))
+            if not acronyms:
+                candidates -= self._acronyms
+            scored = [(self._entry_board[entry_id], self._similarity(signature, self._signatures[entry_id])) for entry_id in candidates]
+
+        best: Dict[int, float] = {}
+        for quiz_board_id, similarity in scored:
+            if similarity >= threshold and similarity > best.get(quiz_board_id, 0.0):
+                best[quiz_board_id] = similarity
+
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def _signature(self, text: str) -> Tuple[int, ...]:
+        hashes = [zlib.crc32(shingle.encode()) for shingle in _shingles(text)]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+            for a, b in self._permutations
+        )
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def _similarity(self, signature_a: Tuple[int, ...], signature_b: Tuple[int, ...]) -> float:
+        return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / self.num_perm
+
+
+def _shingles(text: str) -> Set[str]:
+    words = text.split()
+    shingles = {f"w:{word}" for word in words}
+    padded = f" {text} "
+    shingles.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return shingles
+
+
+def _variants(text: str) -> List[Tuple[str, bool]]:
+    """
+    (variant, is_acronym): the text itself, plus its acronym for texts of 3+ words
+    ("marvel cinematic universe" -> "mcu").
+    """
+    variants = [(text, False)] if text else []
+    words = [word for word in text.split() if word not in ("the", "a", "an", "of", "and")]
+    if len(words) >= 3:
+        variants.append(("".join(word[0] for word in words), True))
+    return variants
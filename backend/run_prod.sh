@@ -1,8 +1,14 @@
 #!/bin/bash
 
-# Create database tables first
-echo "Creating database tables..."
-python -m app.core.database --action create_tables
+# Create the database tables and apply the pending migrations first
+echo "Migrating the database..."
+python -m app.core.database --action migrate
+
+# Publish the static snapshots of the boards saved while publishing was off
+if [ "$BOARD_SNAPSHOTS_ENABLED" = "true" ]; then
+    echo "Publishing the missing board snapshots..."
+    python -m app.services.board_snapshots --backfill
+fi
 
 # Run the FastAPI application
 echo "Starting FastAPI application..."
@@ -1,8 +1,10 @@
 import os
 import sys
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 from typing import Generator
 from fastapi.testclient import TestClient
 from unittest.mock import patch
@@ -11,11 +13,23 @@ from unittest.mock import patch
 backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, backend_dir)
 
+# The app reads these at import time; point them at the test database when they aren't set
+os.environ.setdefault("SQLITE_LOCAL_DSN", "sqlite:///./test.db")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key")
+# Never call the real LLM from the tests
+os.environ.setdefault("LLM_PROVIDER", "fake")
+# The tests generate news boards explicitly
+os.environ.setdefault("NEWS_SCHEDULER_ENABLED", "false")
+# Catch N+1 queries
+os.environ.setdefault("QUERY_BUDGET_ENFORCED", "true")
+# The shared cache is in the process; tests/test_cache.py runs the Redis backend against a stand-in server
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
 # Now we can import app modules
 from app.models.base import Base
 from app.models import User, QuizBoard, Category, Question, GameSession, QuestionAttempt
 from app.main import app
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 
 # Create a test database engine using SQLite in-memory database
 TEST_SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -24,6 +38,21 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The requests use async sessions on the same database. Every TestClient runs its own event loop,
+# so connections are not pooled across tests.
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# get_read_db is read-only, like the read pool of the app, so that a write routed through it fails the test
+async_read_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+@event.listens_for(async_read_engine.sync_engine, "connect")
+def set_query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
 @pytest.fixture(scope="function")
 def db() -> Generator[Session, None, None]:
     """
@@ -45,16 +74,19 @@ def db() -> Generator[Session, None, None]:
 @pytest.fixture(scope="function")
 def client(db: Session) -> Generator[TestClient, None, None]:
     """
-    Create a new FastAPI TestClient that uses the `db` fixture to override
-    the `get_db` dependency.
+    Create a new FastAPI TestClient whose requests use the test database. The `db` fixture
+    creates the tables; data committed through it is seen by the requests, and vice versa.
     """
-    def override_get_db():
-        try:
-            yield db
-        finally:
-            pass
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as async_db:
+            yield async_db
+
+    async def override_get_read_db():
+        async with TestingAsyncReadSessionLocal() as async_db:
+            yield async_db
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_read_db
     
     try:
         with TestClient(app) as test_client:
@@ -80,6 +112,26 @@ def mock_send_email():
         yield mock
 
 
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """All test clients share one IP, so start every test with full token buckets."""
+    from app.core import admission
+    for limiter in (admission.player_generation_limiter, admission.ip_generation_limiter, admission.ip_guest_limiter):
+        limiter.reset()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Every test recreates the database, so the ids of its boards are those of the previous test's."""
+    from app.services import game_sessions_service
+    game_sessions_service._board_cache.clear()
+    # A fresh shared cache, in memory
+    with patch("app.core.cache._shared_cache", None):
+        yield
+    game_sessions_service._board_cache.clear()
+
+
 ### FYI: ###
 
 """
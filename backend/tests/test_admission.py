@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from app.core import admission
+from app.core.admission import TokenBucket
+
+
+def _guest_headers(client: TestClient):
+    token = client.post("/api/auth/guest").json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+    assert bucket.try_acquire()[0]
+    assert bucket.try_acquire()[0]
+
+    admitted, retry_after = bucket.try_acquire()
+    assert not admitted
+    assert 0 < retry_after <= 1
+
+    bucket.updated_at -= 1  # a second later
+    assert bucket.try_acquire()[0]
+
+
+def test_player_over_rate_gets_429(client: TestClient):
+    headers = _guest_headers(client)
+    limiter = admission.RateLimiter(rate_per_minute=1, burst=1)
+    with patch.object(admission, "player_generation_limiter", limiter), \
+            patch("app.services.generation_jobs_service.GenerationJobsService.submit"):
+        assert client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=headers).status_code == 202
+
+        response = client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=headers)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_full_generation_queue_sheds_with_503(client: TestClient):
+    headers = _guest_headers(client)
+    with patch("app.services.generation_jobs_service.GenerationJobsService.pending_jobs", return_value=1000):
+        response = client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=headers)
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_guest_creation_is_rate_limited_per_ip(client: TestClient):
+    with patch.object(admission, "ip_guest_limiter", admission.RateLimiter(rate_per_minute=1, burst=2)):
+        assert client.post("/api/auth/guest").status_code == 200
+        assert client.post("/api/auth/guest").status_code == 200
+        assert client.post("/api/auth/guest").status_code == 429
+
+
+def test_rejected_generations_keep_the_players_tokens(client: TestClient):
+    headers = _guest_headers(client)
+    limiter = admission.RateLimiter(rate_per_minute=0, burst=1)
+    with patch.object(admission, "player_generation_limiter", limiter), \
+            patch("app.services.generation_jobs_service.GenerationJobsService.submit"):
+        # Shed while the queue is full
+        with patch("app.services.generation_jobs_service.GenerationJobsService.pending_jobs", return_value=1000):
+            assert client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=headers).status_code == 503
+        # Rejected for the IP
+        with patch.object(admission, "ip_generation_limiter", admission.RateLimiter(rate_per_minute=0, burst=0)):
+            assert client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=headers).status_code == 429
+        # The player's only token is still there
+        assert client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=headers).status_code == 202
+
+
+def test_x_real_ip_is_only_trusted_from_the_proxies():
+    def request(host: str) -> Request:
+        return Request({"type": "http", "client": (host, 1234), "headers": [(b"x-real-ip", b"203.0.113.7")]})
+
+    with patch.object(admission.settings, "TRUST_PROXY_HEADERS", True), \
+            patch.object(admission.settings, "TRUSTED_PROXIES", ["127.0.0.1", "172.16.0.0/12"]):
+        assert admission.client_ip(request("127.0.0.1")) == "203.0.113.7"
+        assert admission.client_ip(request("172.18.0.5")) == "203.0.113.7"
+        # A client that reaches the backend directly can't choose its IP
+        assert admission.client_ip(request("198.51.100.9")) == "198.51.100.9"
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models import GameSession, Player, PlayerType, QuestionAttempt
+from app.services import game_sessions_service
+from app.services.game_sessions_service import GameSessionsService
+from app.services.group_commit import GroupCommit
+from app.services.quiz_board_service import QuizBoardService
+from tests.conftest import TestingAsyncSessionLocal
+
+SAMPLE_QUIZ = {
+    "title": "Rivers",
+    "categories": [
+        {"name": "Europe", "questions": [{"question_text": f"Clue {q}", "correct_answer": f"Answer {q}"} for q in range(3)]}
+    ]
+}
+
+@pytest.fixture(autouse=True)
+def answer_batching():
+    """Batch the answers, written to the test database, with a fresh batcher."""
+    with patch('app.core.database.AsyncSessionLocal', TestingAsyncSessionLocal), \
+         patch.object(settings, "ANSWER_BATCHING_ENABLED", True), \
+         patch.object(settings, "ANSWER_BATCH_WINDOW_MS", 200), \
+         patch.object(game_sessions_service, "_answer_batcher", None):
+        yield
+
+def test_concurrent_writes_share_a_batch():
+    batches = []
+
+    async def write_batch(items):
+        batches.append(items)
+        return [ValueError(item) if item < 0 else item * 2 for item in items]
+
+    async def submit_all():
+        batcher = GroupCommit("test", write_batch, window_seconds=0.01, max_batch_size=3)
+        return await asyncio.gather(*(batcher.submit(item) for item in [1, -2, 3, 4]), return_exceptions=True)
+
+    results = asyncio.run(submit_all())
+    # The first three fill a batch, the fourth waits for the window
+    assert batches == [[1, -2, 3], [4]]
+    assert results[0] == 2 and isinstance(results[1], ValueError) and results[2:] == [6, 8]
+
+def test_answers_are_written_in_one_transaction(db: Session):
+    player = Player(player_type=PlayerType.GUEST, display_name="Stranger")
+    db.add(player)
+    db.commit()
+    quiz_board = QuizBoardService.save_quiz_board(SAMPLE_QUIZ, "topic", "Rivers", player.id, db)
+    game_session = GameSessionsService.create_from_quiz_board(quiz_board, player, db)
+    questions = quiz_board.categories[0].questions
+
+    async def answer(question, user_answer):
+        async with TestingAsyncSessionLocal() as async_db:
+            return await GameSessionsService.answer_question(game_session.id, question.id, user_answer, async_db, player)
+
+    async def answer_all():
+        return await asyncio.gather(
+            answer(questions[0], questions[0].correct_answer),
+            answer(questions[1], "Wrong"),
+            answer(questions[2], questions[2].correct_answer),
+            answer(questions[2], questions[2].correct_answer),
+            return_exceptions=True
+        )
+
+    batches = metrics.get("group_commit_batches_total", batcher="answers")
+    responses = asyncio.run(answer_all())
+    assert metrics.get("group_commit_batches_total", batcher="answers") == batches + 1
+
+    expected_score = questions[0].points + questions[2].points
+    assert [response.points_earned for response in responses[:2]] == [questions[0].points, 0]
+    # One of the two answers to the same question is rejected, whichever came second
+    rejected = [response for response in responses[2:] if isinstance(response, HTTPException)]
+    assert len(rejected) == 1 and rejected[0].status_code == 400
+    accepted = [response for response in responses if not isinstance(response, HTTPException)]
+    assert max(response.updated_score for response in accepted) == expected_score
+    assert any(response.game_status == "completed" for response in accepted)
+
+    db.expire_all()
+    assert db.query(QuestionAttempt).count() == 3
+    assert db.get(GameSession, game_session.id).score == expected_score
@@ -0,0 +1,61 @@
+from app.core.metrics import metrics
+from app.services.board_cache import BoardCache, BoardSkeleton, CategorySkeleton, QuestionSkeleton
+
+def board(quiz_board_id: int, text: str = "x" * 100) -> BoardSkeleton:
+    return BoardSkeleton(quiz_board_id, f"Board {quiz_board_id}", (
+        CategorySkeleton(quiz_board_id * 10, "Category", (QuestionSkeleton(quiz_board_id * 100, text, "Answer", 100),)),
+    ))
+
+def test_least_recently_used_boards_are_evicted_when_full():
+    cache = BoardCache(max_bytes=3 * board(1).size)
+    evictions = metrics.get("board_cache_evictions_total")
+    for quiz_board_id in (1, 2, 3):
+        assert cache.get(quiz_board_id) is None
+        assert cache.put(board(quiz_board_id))
+    assert cache.get(1).title == "Board 1"
+
+    # Used more often than the least recently used board
+    assert cache.get(4) is None
+    assert cache.get(4) is None
+    assert cache.put(board(4))
+    assert 2 not in cache and [quiz_board_id in cache for quiz_board_id in (1, 3, 4)] == [True] * 3
+    assert cache.size_bytes == 3 * board(1).size
+    assert metrics.get("board_cache_evictions_total") == evictions + 1
+
+def test_boards_used_less_than_the_cached_ones_are_not_admitted():
+    cache = BoardCache(max_bytes=2 * board(1).size)
+    for quiz_board_id in (1, 2):
+        for _ in range(3):
+            cache.get(quiz_board_id)
+        cache.put(board(quiz_board_id))
+
+    # A one-off board doesn't flush the popular ones
+    assert cache.get(3) is None
+    assert not cache.put(board(3))
+    assert 3 not in cache and len(cache) == 2
+
+    for _ in range(3):
+        cache.get(3)
+    assert cache.put(board(3))
+    assert 1 not in cache and 2 in cache
+
+def test_frequencies_are_aged():
+    cache = BoardCache(max_bytes=board(1).size, sample_size=8)
+    for _ in range(6):
+        cache.get(1)
+    cache.put(board(1))
+
+    # Board 1 isn't used anymore: its count halves every 8 lookups
+    for _ in range(5):
+        cache.get(2)
+    assert cache.put(board(2))
+
+def test_boards_bigger_than_the_cache_are_not_admitted():
+    cache = BoardCache(max_bytes=board(1).size)
+    assert not cache.put(board(2, "x" * 1000))
+    assert len(cache) == 0 and cache.size_bytes == 0
+
+def test_warm_up_stops_when_full():
+    cache = BoardCache(max_bytes=2 * board(1).size)
+    assert cache.warm([board(1), board(2), board(3)]) == 2
+    assert 1 in cache and 2 in cache and 3 not in cache
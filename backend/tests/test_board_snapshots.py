@@ -0,0 +1,53 @@
+import gzip
+import json
+import os
+from unittest.mock import patch
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Player, PlayerType
+from app.services import board_snapshots
+from app.services.quiz_board_service import QuizBoardService
+
+SAMPLE_QUIZ = {
+    "title": "Volcanoes",
+    "categories": [
+        {"name": f"Category {c}", "questions": [{"question_text": f"Clue {q}", "correct_answer": f"Answer {q}"} for q in range(3)]}
+        for c in range(2)
+    ]
+}
+
+def create_player(db: Session) -> Player:
+    player = Player(player_type=PlayerType.GUEST, display_name="Stranger")
+    db.add(player)
+    db.commit()
+    return player
+
+def test_saved_boards_are_published_without_their_answers(db: Session, tmp_path):
+    with patch.object(settings, "BOARD_SNAPSHOTS_ENABLED", True), patch.object(settings, "BOARD_SNAPSHOTS_DIR", str(tmp_path)):
+        quiz_board = QuizBoardService.save_quiz_board(SAMPLE_QUIZ, "topic", "Volcanoes", create_player(db).id, db)
+
+    path = tmp_path / f"{quiz_board.id}.json"
+    snapshot = json.loads(path.read_bytes())
+    assert snapshot["title"] == "Volcanoes"
+    assert [category["name"] for category in snapshot["categories"]] == ["Category 0", "Category 1"]
+    assert [(question["question_text"], question["points"]) for question in snapshot["categories"][0]["questions"]] == [("Clue 0", 100), ("Clue 1", 200), ("Clue 2", 300)]
+    assert "Answer" not in path.read_text()
+
+    # Precompressed copies, for nginx to serve as they are
+    assert gzip.decompress((tmp_path / f"{quiz_board.id}.json.gz").read_bytes()) == path.read_bytes()
+    if board_snapshots.brotli is not None:
+        assert board_snapshots.brotli.decompress((tmp_path / f"{quiz_board.id}.json.br").read_bytes()) == path.read_bytes()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+def test_backfill_publishes_the_missing_snapshots(db: Session, tmp_path):
+    player = create_player(db)
+    quiz_boards = [QuizBoardService.save_quiz_board(SAMPLE_QUIZ, "topic", f"Volcanoes {i}", player.id, db) for i in range(3)]
+    board_snapshots.publish_snapshot(quiz_boards[0], str(tmp_path))
+    suffixes = ["", ".gz"] + ([".br"] if board_snapshots.brotli is not None else [])
+    expected = sorted(f"{quiz_board.id}.json{suffix}" for quiz_board in quiz_boards for suffix in suffixes)
+
+    assert board_snapshots.backfill(db, str(tmp_path), batch_size=2) == 2
+    assert sorted(os.listdir(tmp_path)) == expected
+    assert board_snapshots.backfill(db, str(tmp_path)) == 0
+    assert board_snapshots.backfill(db, str(tmp_path), overwrite=True) == 3
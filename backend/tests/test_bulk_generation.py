@@ -0,0 +1,128 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import BulkGenerationRun, Player, PlayerType, QuizBoard
+from app.services.bulk_generation_service import BulkGenerationService, GenerationBudget
+from app.services.quiz_board_service import QuizBoardService
+from app.services.topic_index import TopicSimilarityIndex
+from tests.conftest import TestingSessionLocal
+
+
+def quiz_for(topic: str, num_categories: int = 3, num_questions: int = 4) -> dict:
+    return {
+        "title": f"{topic} Quiz",
+        "categories": [
+            {
+                "name": f"{topic} {c}",
+                "questions": [{"question_text": f"Clue {c}-{q}", "correct_answer": f"Answer {c}-{q}"} for q in range(num_questions)]
+            }
+            for c in range(num_categories)
+        ]
+    }
+
+@pytest.fixture(autouse=True)
+def worker_db_session():
+    """Make the bulk generation workers use the test database, with an empty topic index."""
+    with patch('app.core.database.Session', TestingSessionLocal), \
+         patch('app.services.quiz_board_service._topic_index', TopicSimilarityIndex()):
+        yield
+
+@pytest.fixture
+def mock_llm():
+    with patch('app.services.quiz_board_service.LLMService') as mock:
+        mock.return_value.generate_quiz_board_from_topic.side_effect = quiz_for
+        yield mock.return_value
+
+@pytest.fixture
+def player(db: Session) -> Player:
+    player = Player(player_type=PlayerType.GUEST, display_name="Seeder")
+    db.add(player)
+    db.commit()
+    return player
+
+def test_budget_waits_for_tokens():
+    # 2 requests and 1000 tokens per board, under 60 requests and 3000 tokens per minute
+    budget = GenerationBudget(requests_per_minute=60, tokens_per_minute=3000, requests_per_generation=2, tokens_per_generation=1000)
+    for _ in range(3):
+        assert budget.try_acquire(2, 1000)[0]
+
+    admitted, retry_after = budget.try_acquire(2, 1000)
+    assert not admitted
+    assert 0 < retry_after <= 20
+    # The request budget that was taken is given back
+    assert budget.requests.tokens == pytest.approx(54, abs=0.1)
+
+def test_budget_acquire_stops():
+    budget = GenerationBudget(requests_per_minute=1, tokens_per_minute=1000, requests_per_generation=1, tokens_per_generation=10)
+    stop = threading.Event()
+    assert budget.acquire(1, 10, stop)
+    stop.set()
+    assert not budget.acquire(1, 10, stop)
+
+def test_run_generates_and_skips_existing_topics(mock_llm, db: Session, player: Player):
+    QuizBoardService.save_quiz_board(quiz_for("Jazz"), "topic", "Jazz", player.id, db)
+    run = BulkGenerationService.create_run(["Volcanoes", "", "jazz!", "Chess", "volcanoes"], player, db, concurrency=2)
+    assert run.total_topics == 3
+
+    BulkGenerationService.run(run.id)
+
+    db.refresh(run)
+    assert run.status == "completed"
+    assert (run.next_index, run.generated, run.skipped, run.failed) == (3, 2, 1, 0)
+    assert run.boards_per_minute > 0
+    assert db.query(QuizBoard).count() == 3
+    assert mock_llm.generate_quiz_board_from_topic.call_count == 2
+
+def test_run_resumes_from_checkpoint(mock_llm, db: Session, player: Player):
+    run = BulkGenerationService.create_run(["Volcanoes", "Chess", "Rivers"], player, db)
+    run.status = "interrupted"
+    run.next_index = 2
+    db.commit()
+
+    BulkGenerationService.run(run.id)
+
+    db.refresh(run)
+    assert run.status == "completed"
+    assert run.generated == 1
+    mock_llm.generate_quiz_board_from_topic.assert_called_once()
+    assert mock_llm.generate_quiz_board_from_topic.call_args[0][0] == "Rivers"
+
+def test_failed_topics_are_recorded(mock_llm, db: Session, player: Player):
+    mock_llm.generate_quiz_board_from_topic.side_effect = lambda topic, *args: quiz_for(topic) if topic != "Chess" else 1 / 0
+    run = BulkGenerationService.create_run(["Volcanoes", "Chess"], player, db, concurrency=1)
+
+    BulkGenerationService.run(run.id)
+
+    db.refresh(run)
+    assert run.status == "completed"
+    assert (run.generated, run.failed) == (1, 1)
+    assert run.failed_topics == "Chess"
+
+def test_bulk_endpoint_requires_admin(client: TestClient):
+    headers = {"Authorization": f"Bearer {client.post('/api/auth/guest').json()['access_token']}"}
+    response = client.post("/api/quiz-boards/bulk", files={"file": ("topics.txt", b"Volcanoes\nChess\n")}, headers=headers)
+    assert response.status_code == 403
+
+def test_runs_of_live_processes_are_not_resumed(mock_llm, db: Session, player: Player):
+    live = BulkGenerationService.create_run(["Volcanoes"], player, db)
+    live.status, live.owner, live.heartbeat_at = "running", "other:1:live", datetime.now()
+    stale = BulkGenerationService.create_run(["Chess"], player, db)
+    stale.status, stale.owner, stale.heartbeat_at = "running", "other:2:dead", datetime.now() - timedelta(hours=1)
+    db.commit()
+
+    assert BulkGenerationService.claim_stale_runs(db) == [stale.id]
+    assert not BulkGenerationService.claim_run(live.id, db)
+
+    BulkGenerationService.run(live.id)
+    BulkGenerationService.run(stale.id)
+
+    db.refresh(live)
+    db.refresh(stale)
+    assert (live.status, live.owner) == ("running", "other:1:live")
+    # The run is released once it stops, so that any process can resume it
+    assert (stale.status, stale.owner, stale.heartbeat_at) == ("completed", None, None)
+    mock_llm.generate_quiz_board_from_topic.assert_called_once()
@@ -0,0 +1,252 @@
+import asyncio
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import pytest
+
+from app.core.cache import DELETE_IF_EQUAL_SCRIPT, CacheBackend, MemoryCache, RedisCache, SharedCache
+
+class StandInRedis(socketserver.ThreadingTCPServer):
+    """
+    A local stand-in for a Redis server, speaking just enough of its protocol for RedisCache:
+    GET, SET (PX, NX), DEL, PUBLISH, SUBSCRIBE, PING, and EVAL of the compare-and-delete script.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInRedisHandler)
+        self.lock = threading.Lock()
+        self.values: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.subscribers: Dict[bytes, List["StandInRedisHandler"]] = {}
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def subscriber_count(self) -> int:
+        with self.lock:
+            return sum(len(handlers) for handlers in self.subscribers.values())
+
+    def drop_subscribers(self) -> None:
+        with self.lock:
+            handlers = [handler for channel in self.subscribers.values() for handler in channel]
+        for handler in handlers:
+            handler.connection.shutdown(socket.SHUT_RDWR)
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+class StandInRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server: StandInRedis = self.server
+        try:
+            while True:
+                command = self.read_command()
+                if command is None:
+                    return
+                self.write(self.execute(server, command[0].upper(), command[1:]))
+        except OSError:
+            return
+        finally:
+            with server.lock:
+                for handlers in server.subscribers.values():
+                    if self in handlers:
+                        handlers.remove(self)
+
+    def read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def write(self, reply: bytes) -> None:
+        with self.server.lock:
+            self.wfile.write(reply)
+
+    def execute(self, server: StandInRedis, name: bytes, args: List[bytes]) -> bytes:
+        now = time.monotonic()
+        with server.lock:
+            if name == b"PING":
+                return b"+PONG\r\n"
+            if name == b"GET":
+                value, expiry = server.values.get(args[0], (None, None))
+                if value is None or (expiry is not None and expiry <= now):
+                    return b"$-1\r\n"
+                return bulk(value)
+            if name == b"SET":
+                options = [arg.upper() for arg in args[2:]]
+                expiry = now + int(options[options.index(b"PX") + 1]) / 1000 if b"PX" in options else None
+                current = server.values.get(args[0])
+                if b"NX" in options and current is not None and (current[1] is None or current[1] > now):
+                    return b"$-1\r\n"
+                server.values[args[0]] = (args[1], expiry)
+                return b"+OK\r\n"
+            if name == b"EVAL" and args[0] == DELETE_IF_EQUAL_SCRIPT.encode():
+                value, expiry = server.values.get(args[2], (None, None))
+                if value != args[3] or (expiry is not None and expiry <= now):
+                    return b":0\r\n"
+                del server.values[args[2]]
+                return b":1\r\n"
+            if name == b"DEL":
+                return b":%d\r\n" % sum(server.values.pop(key, None) is not None for key in args)
+            if name == b"PUBLISH":
+                handlers = list(server.subscribers.get(args[0], ()))
+            elif name == b"SUBSCRIBE":
+                server.subscribers.setdefault(args[0], []).append(self)
+                return b"*3\r\n" + bulk(b"subscribe") + bulk(args[0]) + b":1\r\n"
+            else:
+                return b"-ERR unknown command\r\n"
+
+        # PUBLISH, outside of the lock that write() takes
+        for handler in handlers:
+            handler.write(b"*3\r\n" + bulk(b"message") + bulk(args[0]) + bulk(args[1]))
+        return b":%d\r\n" % len(handlers)
+
+def bulk(data: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    """A backend shared by the simulated processes: the same MemoryCache, or a stand-in Redis server."""
+    if request.param == "memory":
+        yield MemoryCache()
+        return
+    server = StandInRedis()
+    backend = RedisCache(server.url)
+    backend.server = server
+    yield backend
+    backend.close()
+    server.stop()
+
+def test_values_expire(backend: CacheBackend):
+    backend.set("board:1", b"one", ttl_seconds=60)
+    backend.set("board:2", b"two", ttl_seconds=0.05)
+    assert backend.get("board:1") == b"one"
+    assert not backend.add("board:1", b"uno", ttl_seconds=60)
+    time.sleep(0.1)
+    assert backend.get("board:2") is None
+    assert backend.add("board:2", b"dos", ttl_seconds=60)
+    backend.delete("board:1", "board:2")
+    assert (backend.get("board:1"), backend.get("board:2")) == (None, None)
+
+def test_a_cold_key_is_computed_once_across_processes(backend: CacheBackend):
+    processes = [SharedCache(backend, "test:", listeners=[]) for _ in range(2)]
+    computed = []
+
+    async def compute() -> bytes:
+        computed.append(1)
+        await asyncio.sleep(0.2)
+        return b"top boards"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("top_quiz_boards", compute, 60) for cache in processes for _ in range(4)))
+
+    assert asyncio.run(run()) == [b"top boards"] * 8
+    assert len(computed) == 1
+    assert backend.get("test:top_quiz_boards") == b"top boards"
+    assert backend.get("test:top_quiz_boards:lock") is None
+
+def test_invalidations_reach_the_other_processes(backend: CacheBackend):
+    received = {"a": [], "b": []}
+    a = SharedCache(backend, "test:", listeners=[("board:", received["a"].append)])
+    b = SharedCache(backend, "test:", listeners=[("board:", received["b"].append), ("player:", received["b"].append)])
+    a.start_listening()
+    b.start_listening()
+    try:
+        if isinstance(backend, RedisCache):
+            wait_for(lambda: backend.server.subscriber_count() == 2)
+        backend.set("test:board:1", b"board", ttl_seconds=60)
+
+        a.invalidate("board:1", "top_quiz_boards")
+        wait_for(lambda: received["b"] == ["board:1"])
+        assert backend.get("test:board:1") is None
+        # The invalidating process updates its own state
+        b.invalidate("board:2")
+        wait_for(lambda: received["a"] == ["board:2"])
+        assert received["b"] == ["board:1"]
+    finally:
+        a.stop_listening()
+        b.stop_listening()
+
+def test_everything_is_dropped_after_a_lost_subscription():
+    server = StandInRedis()
+    backend = RedisCache(server.url)
+    received = []
+    cache = SharedCache(backend, "test:", listeners=[("board:", received.append)])
+    cache.start_listening()
+    try:
+        wait_for(lambda: server.subscriber_count() == 1)
+        server.drop_subscribers()
+        # Invalidations may have been missed in the meantime
+        wait_for(lambda: received == ["*"])
+        wait_for(lambda: server.subscriber_count() == 1)
+    finally:
+        cache.stop_listening()
+        backend.close()
+        server.stop()
+
+def test_values_are_computed_when_the_cache_server_is_down():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    cache = SharedCache(RedisCache(f"redis://127.0.0.1:{port}/0", timeout_seconds=0.1), listeners=[])
+    computed = []
+
+    async def compute() -> bytes:
+        computed.append(1)
+        return b"value"
+
+    assert asyncio.run(cache.get_or_compute("board:1", compute, 60)) == b"value"
+    assert asyncio.run(cache.get_or_compute("board:1", compute, 60)) == b"value"
+    assert len(computed) == 2
+    cache.invalidate("board:1")
+
+def test_the_memory_backend_is_bounded():
+    backend = MemoryCache(max_bytes=120)
+    backend.set("expired", b"x" * 20, ttl_seconds=0.01)
+    backend.set("board:1", b"1" * 30, ttl_seconds=60)
+    backend.set("board:2", b"2" * 30, ttl_seconds=60)
+    time.sleep(0.02)
+    assert backend.get("board:1") is not None
+
+    # The expired value is dropped first, then the least recently used
+    backend.set("board:3", b"3" * 30, ttl_seconds=60)
+    assert backend.get("expired") is None
+    assert backend.get("board:2") is not None
+    backend.set("board:4", b"4" * 30, ttl_seconds=60)
+    assert backend.get("board:1") is None
+    assert [backend.get(f"board:{i}") is not None for i in (2, 3, 4)] == [True, True, True]
+    # Too large to be cached
+    backend.set("board:5", b"5" * 200, ttl_seconds=60)
+    assert backend.get("board:5") is None
+
+def test_a_process_only_releases_its_own_lock(backend: CacheBackend):
+    slow, other = SharedCache(backend, "test:", listeners=[], lock_seconds=0.1), SharedCache(backend, "test:", listeners=[], lock_seconds=0.1)
+
+    async def compute() -> bytes:
+        return b"top boards"
+
+    async def run():
+        # The process that holds the lock is too slow: the other one stops waiting and computes the value itself
+        backend.add("test:top_quiz_boards:lock", slow._origin.encode(), 60)
+        assert await other.get_or_compute("top_quiz_boards", compute, 60) == b"top boards"
+
+    asyncio.run(run())
+    assert backend.get("test:top_quiz_boards:lock") == slow._origin.encode()
+    assert not backend.delete_if_equal("test:top_quiz_boards:lock", other._origin.encode())
+    assert backend.delete_if_equal("test:top_quiz_boards:lock", slow._origin.encode())
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.core import database
+from app.core.config import settings
+from app.core.database import get_read_db, use_sqlite_pragmas
+from app.main import app
+from app.models import Player, PlayerType, QuestionAttempt
+from app.models.base import Base
+
+@pytest.fixture
+def sqlite_dsn(tmp_path) -> str:
+    return f"sqlite:///{tmp_path / 'pragmas.db'}"
+
+def test_sqlite_connections_use_wal(sqlite_dsn: str):
+    engine = sa.create_engine(sqlite_dsn)
+    use_sqlite_pragmas(engine)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+        assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -settings.SQLITE_CACHE_SIZE_KB
+    engine.dispose()
+
+def test_read_connections_cannot_write(sqlite_dsn: str):
+    writer = sa.create_engine(sqlite_dsn)
+    use_sqlite_pragmas(writer)
+    reader = sa.create_engine(sqlite_dsn)
+    use_sqlite_pragmas(reader, read_only=True)
+
+    with writer.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE answers (id INTEGER PRIMARY KEY)")
+    with writer.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO answers VALUES (1)")
+        # Readers see the last commit while a write is in progress, instead of waiting for it
+        with reader.connect() as read_connection:
+            assert read_connection.exec_driver_sql("SELECT COUNT(*) FROM answers").scalar() == 0
+
+    with reader.connect() as read_connection:
+        assert read_connection.exec_driver_sql("SELECT COUNT(*) FROM answers").scalar() == 1
+        with pytest.raises(sa.exc.OperationalError):
+            read_connection.exec_driver_sql("INSERT INTO answers VALUES (2)")
+    writer.dispose()
+    reader.dispose()
+
+def test_hot_query_indexes_migration(sqlite_dsn: str):
+    engine = sa.create_engine(sqlite_dsn)
+    Base.metadata.create_all(engine)
+    unique_index = next(index for index in QuestionAttempt.__table__.indexes if index.unique)
+    unique_index.drop(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO game_sessions (id, quiz_board_id, player_id, score) VALUES (1, 1, 1, 400)")
+        # The same question answered twice, and counted twice in the score
+        connection.exec_driver_sql(
+            "INSERT INTO question_attempts (id, game_session_id, question_id, user_answer, points_earned) VALUES "
+            "(1, 1, 7, 'a', 200), (2, 1, 7, 'a', 200)"
+        )
+
+    with patch.object(database, "engine", engine):
+        database.add_hot_query_indexes()
+
+    with engine.begin() as connection:
+        assert connection.exec_driver_sql("SELECT id FROM question_attempts").scalars().all() == [1]
+        assert connection.exec_driver_sql("SELECT score FROM game_sessions").scalar() == 200
+        with pytest.raises(sa.exc.IntegrityError):
+            connection.exec_driver_sql("INSERT INTO question_attempts (game_session_id, question_id, user_answer) VALUES (1, 7, 'b')")
+    assert unique_index.name in {index["name"] for index in sa.inspect(engine).get_indexes("question_attempts")}
+    engine.dispose()
+
+def test_requests_read_through_a_read_only_session(client: TestClient):
+    async def write():
+        async for read_db in app.dependency_overrides[get_read_db]():
+            read_db.add(Player(player_type=PlayerType.GUEST, display_name="Stranger"))
+            await read_db.commit()
+
+    with pytest.raises(sa.exc.OperationalError, match="readonly"):
+        asyncio.run(write())
@@ -0,0 +1,97 @@
+import io
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import QuizBoard
+from app.services.document_service import DocumentService, chunk_text
+from app.services.source_store import load_source
+from tests.conftest import TestingSessionLocal
+from tests.test_generation_jobs import wait_for_job
+
+DOCUMENT = "".join(
+    f"The lighthouse number {i} was built in {1800 + i}. It stands {10 + i} meters tall.\n\n" for i in range(200)
+)
+
+@pytest.fixture(autouse=True)
+def worker_db_session():
+    """Make the generation workers use the test database."""
+    with patch('app.core.database.Session', TestingSessionLocal):
+        yield
+
+@pytest.fixture
+def auth_headers(client: TestClient) -> dict:
+    response = client.post("/api/auth/guest")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_chunks_are_cut_at_paragraphs():
+    pieces = (DOCUMENT[i:i + 100] for i in range(0, len(DOCUMENT), 100))
+    chunks = list(chunk_text(pieces, 1000))
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert all(chunk.endswith("tall.") for chunk in chunks)
+    assert " ".join(chunks).split() == DOCUMENT.split()
+
+def test_facts_are_extracted_concurrently_with_bounded_read_ahead():
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def extract_document_facts(self, chunk, max_facts):
+        nonlocal active, max_active
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        return [chunk.split(". ")[0]]
+
+    with patch.object(settings, "DOCUMENT_CHUNK_CHARS", 1000), \
+         patch.object(settings, "DOCUMENT_MAP_PARALLELISM", 3), \
+         patch('app.services.llm_service.LLMService.extract_document_facts', extract_document_facts), \
+         patch('app.services.llm_service.LLMService.generate_quiz_board_from_facts') as reduce:
+        reduce.return_value = {"title": "Lighthouses", "categories": []}
+        quiz, text = DocumentService.generate_quiz_board(io.BytesIO(DOCUMENT.encode()), "lighthouses.txt")
+
+    assert max_active == 3
+    facts = reduce.call_args[0][0]
+    # One fact per chunk, in document order
+    assert facts[0] == "The lighthouse number 0 was built in 1800"
+    assert len(facts) == len(list(chunk_text([DOCUMENT], 1000)))
+    assert text.split() == DOCUMENT.split()
+
+def test_long_documents_are_capped():
+    with patch.object(settings, "DOCUMENT_CHUNK_CHARS", 1000), patch.object(settings, "DOCUMENT_MAX_CHUNKS", 2):
+        quiz, text = DocumentService.generate_quiz_board(io.BytesIO(DOCUMENT.encode()), "lighthouses.txt")
+    assert len(text) <= 2 * 1000 + 2
+    assert len(quiz["categories"]) == 3
+
+def test_create_from_document(client: TestClient, db: Session, auth_headers: dict):
+    response = client.post(
+        "/api/quiz-boards/from-document",
+        files={"file": ("lighthouses.txt", DOCUMENT.encode(), "text/plain")},
+        data={"num_categories": 2, "num_questions": 3},
+        headers=auth_headers
+    )
+    assert response.status_code == 202
+    assert response.json()["source_type"] == "document"
+
+    job = wait_for_job(client, response.json()["id"], auth_headers)
+    assert job["status"] == "completed"
+    quiz_board = db.query(QuizBoard).filter(QuizBoard.id == job["quiz_board_id"]).first()
+    assert quiz_board.source_type == "document"
+    assert "lighthouse number 0" in load_source(quiz_board.id, db)
+    assert [len(category.questions) for category in quiz_board.categories] == [3, 3]
+
+def test_unsupported_document_type(client: TestClient, auth_headers: dict):
+    response = client.post("/api/quiz-boards/from-document", files={"file": ("slides.pptx", b"PK")}, headers=auth_headers)
+    assert response.status_code == 415
+
+def test_document_too_large(client: TestClient, auth_headers: dict):
+    with patch.object(settings, "DOCUMENT_MAX_UPLOAD_BYTES", 1000):
+        response = client.post("/api/quiz-boards/from-document", files={"file": ("lighthouses.txt", DOCUMENT.encode())}, headers=auth_headers)
+    assert response.status_code == 413
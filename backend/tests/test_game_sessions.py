@@ -0,0 +1,201 @@
+import asyncio
+import contextlib
+import pytest
+import sqlalchemy as sa
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.core.query_budget import query_budget, QueryBudgetExceeded
+from app.models import GameSession, Player, PlayerType
+from app.services.game_sessions_service import GameSessionsService, _board_cache
+from app.services.quiz_board_service import QuizBoardService
+from tests.conftest import TestingAsyncSessionLocal, async_engine
+
+def sample_quiz(title: str, num_categories: int, num_questions: int) -> dict:
+    return {
+        "title": title,
+        "categories": [
+            {"name": f"Category {c}", "questions": [{"question_text": f"Clue {q}", "correct_answer": f"Answer {q}"} for q in range(num_questions)]}
+            for c in range(num_categories)
+        ]
+    }
+
+def start_game(db: Session, num_categories: int = 2, num_questions: int = 2):
+    player = Player(player_type=PlayerType.GUEST, display_name="Stranger")
+    db.add(player)
+    db.commit()
+    quiz_board = QuizBoardService.save_quiz_board(sample_quiz("Volcanoes", num_categories, num_questions), "topic", "Volcanoes", player.id, db)
+    game_session = GameSessionsService.create_from_quiz_board(quiz_board, player, db)
+    questions = [question for category in quiz_board.categories for question in category.questions]
+    return player, game_session, questions
+
+@contextlib.contextmanager
+def counting_statements():
+    """The SQL statements run, by any engine, in the block."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa.event.listen(sa.engine.Engine, "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        sa.event.remove(sa.engine.Engine, "before_cursor_execute", count)
+
+def answer(game_session_id: int, question_id: int, user_answer: str, player: Player):
+    async def run():
+        async with TestingAsyncSessionLocal() as async_db:
+            return await GameSessionsService.answer_question(game_session_id, question_id, user_answer, async_db, player)
+    return asyncio.run(run())
+
+def test_progress_is_counted_by_the_answers(db: Session):
+    player, game_session, questions = start_game(db)
+    assert game_session.total_questions == 4
+
+    responses = [answer(game_session.id, question.id, question.correct_answer if i % 2 else "Wrong", player) for i, question in enumerate(questions)]
+    assert [response.game_status for response in responses] == ["in_progress"] * 3 + ["completed"]
+    assert responses[-1].updated_score == questions[1].points + questions[3].points
+
+    db.expire_all()
+    game_session = db.get(GameSession, game_session.id)
+    assert (game_session.answered_count, game_session.score, game_session.status) == (4, responses[-1].updated_score, "completed")
+    assert game_session.completed_at is not None
+
+@pytest.mark.parametrize("num_questions", [2, 10])
+def test_an_answer_takes_three_statements_whatever_the_board_size(db: Session, num_questions: int):
+    player, game_session, questions = start_game(db, num_categories=6, num_questions=num_questions)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    sa.event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        answer(game_session.id, questions[0].id, questions[0].correct_answer, player)
+    finally:
+        sa.event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert statements == ["SELECT", "INSERT", "UPDATE"]
+
+def test_answers_are_checked(db: Session):
+    player, game_session, questions = start_game(db)
+    _, other_game_session, other_questions = start_game(db)
+
+    answer(game_session.id, questions[0].id, "Wrong", player)
+    with pytest.raises(HTTPException) as error:
+        answer(game_session.id, questions[0].id, "Wrong", player)
+    assert error.value.status_code == 400
+
+    # A question of another board
+    with pytest.raises(HTTPException) as error:
+        answer(game_session.id, other_questions[0].id, "Wrong", player)
+    assert error.value.status_code == 404
+
+    with pytest.raises(HTTPException) as error:
+        answer(other_game_session.id, other_questions[0].id, "Wrong", player)
+    assert error.value.status_code == 403
+
+def test_reading_a_big_game_session_stays_within_its_query_budget(client: TestClient, db: Session):
+    owner = start_game(db)[0]
+    headers = {"Authorization": f"Bearer {client.post('/api/auth/guest').json()['access_token']}"}
+
+    def start(num_categories: int, num_questions: int) -> int:
+        quiz_board = QuizBoardService.save_quiz_board(sample_quiz("Volcanoes", num_categories, num_questions), "topic", "Volcanoes", owner.id, db)
+        return client.post(f"/api/game-sessions/new-from-quiz-board/{quiz_board.id}", headers=headers).json()["game_session_id"]
+
+    def read(game_session_id: int):
+        with counting_statements() as statements:
+            response = client.get(f"/api/game-sessions/{game_session_id}", headers=headers)
+        assert response.status_code == 200
+        return response.json(), len(statements)
+
+    small_game_session_id = start(1, 1)
+    big_game_session_id = start(6, 10)
+    session, cold_queries = read(big_game_session_id)
+    for category in session["session_quiz_board"]["categories"][:3]:
+        question_id = category["questions"][0]["question_id"]
+        assert client.post(f"/api/game-sessions/{big_game_session_id}/answer-question/{question_id}", json={"answer": "Answer 0"}, headers=headers).status_code == 200
+
+    # Enforced in the tests: an N+1 query would fail the request. The number of queries doesn't depend on the size
+    # of the board or on the answers: the guest (1) and the session (2, 4 when its board isn't cached)
+    read(small_game_session_id)
+    small, small_queries = read(small_game_session_id)
+    big, big_queries = read(big_game_session_id)
+    assert (cold_queries, small_queries, big_queries) == (5, 3, 3)
+    assert big["score"] == 3 * session["session_quiz_board"]["categories"][0]["questions"][0]["points"]
+    assert len(small["session_quiz_board"]["categories"]) == 1
+
+def test_query_budget_fails_the_extra_queries():
+    engine = sa.create_engine("sqlite://")
+
+    async def run():
+        await query_budget("test", 2)()
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+            connection.exec_driver_sql("SELECT 2")
+            with pytest.raises(QueryBudgetExceeded):
+                connection.exec_driver_sql("SELECT 3")
+
+    asyncio.run(run())
+    engine.dispose()
+
+def test_game_sessions_of_a_board_share_its_cached_skeleton(db: Session):
+    player, game_session, questions = start_game(db)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def get_game_session(game_session_id: int, player: Player):
+        async def run():
+            async with TestingAsyncSessionLocal() as async_db:
+                game_session, board = await GameSessionsService.get_game_session(game_session_id, player, async_db)
+                return GameSessionsService.build_game_session_response(game_session, board)
+        statements.clear()
+        sa.event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+        try:
+            return asyncio.run(run())
+        finally:
+            sa.event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+    hits = metrics.get("board_cache_hits_total")
+    first = get_game_session(game_session.id, player)
+    assert len(statements) == 4
+    assert game_session.quiz_board_id in _board_cache
+
+    # Another game session of the board only loads itself and its attempts
+    answer(game_session.id, questions[0].id, questions[0].correct_answer, player)
+    other_game_session = GameSessionsService.create_from_quiz_board(game_session.quiz_board, player, db)
+    second = get_game_session(other_game_session.id, player)
+    assert len(statements) == 2
+    assert metrics.get("board_cache_hits_total") == hits + 1
+    assert second.session_quiz_board == first.session_quiz_board
+
+    # The attempts are overlaid on the shared skeleton
+    answered = get_game_session(game_session.id, player).session_quiz_board.categories[0].questions[0]
+    assert (answered.status, answered.correct_answer) == ("correct", questions[0].correct_answer)
+    assert second.session_quiz_board.categories[0].questions[0].correct_answer is None
+
+def test_game_session_polls_are_answered_with_304_until_it_changes(client: TestClient, db: Session):
+    quiz_board = QuizBoardService.save_quiz_board(sample_quiz("Volcanoes", 2, 2), "topic", "Volcanoes", start_game(db)[0].id, db)
+    headers = {"Authorization": f"Bearer {client.post('/api/auth/guest').json()['access_token']}"}
+    game_session_id = client.post(f"/api/game-sessions/new-from-quiz-board/{quiz_board.id}", headers=headers).json()["game_session_id"]
+
+    response = client.get(f"/api/game-sessions/{game_session_id}", headers=headers)
+    assert response.headers["cache-control"] == "private, no-cache"
+    etag = response.headers["etag"]
+    response = client.get(f"/api/game-sessions/{game_session_id}", headers={**headers, "If-None-Match": etag})
+    assert (response.status_code, response.content, response.headers["etag"]) == (304, b"", etag)
+
+    question_id = client.get(f"/api/game-sessions/{game_session_id}", headers=headers).json()["session_quiz_board"]["categories"][0]["questions"][0]["question_id"]
+    client.post(f"/api/game-sessions/{game_session_id}/answer-question/{question_id}", json={"answer": "Answer 0"}, headers=headers)
+    response = client.get(f"/api/game-sessions/{game_session_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["session_quiz_board"]["categories"][0]["questions"][0]["status"] == "correct"
+
+    # Only its player may revalidate it
+    other_headers = {"Authorization": f"Bearer {client.post('/api/auth/guest').json()['access_token']}"}
+    assert client.get(f"/api/game-sessions/{game_session_id}", headers={**other_headers, "If-None-Match": response.headers["etag"]}).status_code == 403
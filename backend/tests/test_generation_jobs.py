@@ -0,0 +1,122 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import GenerationJob, GameSession, Player, PlayerType, QuizBoard
+from app.services import generation_jobs_service
+from app.services.generation_jobs_service import GenerationJobsService
+from tests.conftest import TestingSessionLocal
+
+SAMPLE_QUIZ = {
+    "title": "Space Quiz",
+    "categories": [
+        {
+            "name": f"Category {c}",
+            "questions": [
+                {"question_text": f"Clue {c}-{q}", "correct_answer": f"Answer {c}-{q}"}
+                for q in range(4)
+            ]
+        }
+        for c in range(3)
+    ]
+}
+
+@pytest.fixture(autouse=True)
+def worker_db_session():
+    """Make the generation workers use the test database."""
+    with patch('app.core.database.Session', TestingSessionLocal):
+        yield
+
+@pytest.fixture
+def auth_headers(client: TestClient) -> dict:
+    response = client.post("/api/auth/guest")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def wait_for_job(client: TestClient, job_id: int, headers: dict, timeout: float = 5.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/quiz-boards/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish within {timeout}s")
+
+@pytest.fixture
+def mock_llm():
+    with patch('app.services.quiz_board_service.LLMService') as mock:
+        yield mock.return_value
+
+def test_create_from_topic_returns_job(mock_llm, client: TestClient, db: Session, auth_headers: dict):
+    mock_llm.generate_quiz_board_from_topic.return_value = SAMPLE_QUIZ
+    response = client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=auth_headers)
+    assert response.status_code == 202
+    data = response.json()
+    assert data["status"] in ("queued", "running", "completed")
+
+    job = wait_for_job(client, data["id"], auth_headers)
+    assert job["status"] == "completed"
+    assert job["quiz_board_id"] is not None
+    assert job["game_session_id"] is not None
+    assert job["queue_wait_ms"] is not None
+    assert job["duration_ms"] is not None
+
+    game_session = db.query(GameSession).filter(GameSession.id == job["game_session_id"]).first()
+    assert game_session.quiz_board.title == "Space Quiz"
+    mock_llm.generate_quiz_board_from_topic.assert_called_once()
+
+def test_failed_generation_marks_job_failed(mock_llm, client: TestClient, db: Session, auth_headers: dict):
+    mock_llm.generate_quiz_board_from_topic.side_effect = Exception("LLM is down")
+    response = client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=auth_headers)
+    job = wait_for_job(client, response.json()["id"], auth_headers)
+    assert job["status"] == "failed"
+    assert "LLM is down" in job["error"]
+    assert db.query(QuizBoard).count() == 0
+
+def test_get_job_of_another_player(client: TestClient, db: Session, auth_headers: dict):
+    other_headers = {"Authorization": f"Bearer {client.post('/api/auth/guest').json()['access_token']}"}
+    with patch('app.services.generation_jobs_service.GenerationJobsService.submit'):
+        response = client.post("/api/quiz-boards/from-topic", data={"topic": "Space"}, headers=auth_headers)
+
+    response = client.get(f"/api/quiz-boards/jobs/{response.json()['id']}", headers=other_headers)
+    assert response.status_code == 403
+
+def test_only_the_jobs_of_stopped_processes_are_resumed(db: Session):
+    player = Player(player_type=PlayerType.GUEST, display_name="Stranger")
+    db.add(player)
+    db.commit()
+    now = datetime.now()
+    jobs = {
+        # Its owner is alive: another process runs it, or is about to
+        "alive": GenerationJob(topic="Space", player_id=player.id, status="running", owner="other", heartbeat_at=now),
+        "stale": GenerationJob(topic="Oceans", player_id=player.id, status="running", owner="other", heartbeat_at=now - timedelta(minutes=5)),
+        # Queued before owners existed
+        "unowned": GenerationJob(topic="Volcanoes", player_id=player.id, status="queued"),
+        "done": GenerationJob(topic="Rivers", player_id=player.id, status="completed", owner="other", heartbeat_at=now - timedelta(minutes=5)),
+    }
+    db.add_all(jobs.values())
+    db.commit()
+
+    with patch.object(GenerationJobsService, "submit") as submit:
+        GenerationJobsService._resume_stale_jobs()
+        # The first process to look claims them; the next one finds nothing left
+        GenerationJobsService._resume_stale_jobs()
+    assert [call.args[0] for call in submit.call_args_list] == [jobs["stale"].id, jobs["unowned"].id]
+    db.expire_all()
+    assert {name: (job.status, job.owner) for name, job in jobs.items()} == {
+        "alive": ("running", "other"),
+        "stale": ("queued", generation_jobs_service._owner),
+        "unowned": ("queued", generation_jobs_service._owner),
+        "done": ("completed", "other"),
+    }
+
+    # A worker never runs a job that another process owns
+    with patch('app.services.quiz_board_service.LLMService') as mock_llm:
+        jobs["alive"].status = "queued"
+        db.commit()
+        GenerationJobsService.run_job(jobs["alive"].id)
+    mock_llm.assert_not_called()
+    db.expire_all()
+    assert jobs["alive"].status == "queued"
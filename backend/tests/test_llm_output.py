@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services.llm_output import LLMOutputError, parse_llm_json
+from app.services.llm_providers import FakeLLMProvider, LLMProvider
+from app.services.llm_service import LLMService
+
+
+def test_valid_json_is_not_repaired():
+    assert parse_llm_json('```json\n{"title": "Space"}\n```') == ({"title": "Space"}, False)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"categories": ["A", "B",],}', {"categories": ["A", "B"]}),
+    ('{"question_text": "He said "hello" first", "correct_answer": "Hi"}', {"question_text": 'He said "hello" first', "correct_answer": "Hi"}),
+    ('{"question_text": "Line one\nline two"}', {"question_text": "Line one\nline two"}),
+])
+def test_common_defects_are_repaired(text, expected):
+    assert parse_llm_json(text) == (expected, True)
+
+
+def test_truncated_output_keeps_complete_elements():
+    text = '{"questions": [{"question_text": "Q1", "correct_answer": "A1"}, {"question_text": "Q2", "correct_ans'
+    data, repaired = parse_llm_json(text)
+    assert repaired
+    assert data == {"questions": [{"question_text": "Q1", "correct_answer": "A1"}, {"question_text": "Q2"}]}
+
+
+class ScriptedProvider(LLMProvider):
+    """Returns the scripted responses in order, then falls back to the fake provider."""
+    name = "scripted"
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+        self.fake = FakeLLMProvider()
+
+    def complete(self, task, prompt, variables):
+        self.prompts.append(prompt)
+        if self.responses:
+            return self.responses.pop(0)
+        return self.fake.complete(task, prompt, variables)
+
+
+def test_invalid_output_is_retried_with_the_error():
+    metrics.reset()
+    provider = ScriptedProvider(['{"title": "Space", "categories": ["Only one"]}'])
+    outline = LLMService(provider).generate_board_outline("Space", num_categories=3)
+
+    assert len(outline["categories"]) == 3
+    assert len(provider.prompts) == 2
+    assert "expected 3 categories, got 1" in provider.prompts[1]
+    assert metrics.get("llm_output_invalid_total", task="outline") == 1
+    assert metrics.get("llm_output_total", task="outline") == 2
+
+
+def test_output_still_invalid_after_retries_raises():
+    provider = ScriptedProvider(["not json at all"] * 5)
+    with pytest.raises(LLMOutputError):
+        LLMService(provider).generate_category_questions("Space", "Space", "Planets", ["Planets"], num_questions=2)
+
+
+def test_streamed_board_regenerates_only_the_broken_category():
+    metrics.reset()
+    board = FakeLLMProvider()._answer("board", {"topic": "Space", "num_categories": 3, "num_questions": 2})
+    board["categories"][1]["questions"] = board["categories"][1]["questions"][:1]
+    text = json.dumps(board)[:-1] + ",}"  # a trailing comma on top
+
+    provider = ScriptedProvider([])
+    quiz, regenerated = LLMService(provider).finish_streamed_board(text, "Space", num_categories=3, num_questions=2)
+
+    assert regenerated == [1]
+    assert len(provider.prompts) == 1
+    assert [len(category["questions"]) for category in quiz["categories"]] == [2, 2, 2]
+    assert metrics.get("llm_output_repaired_total", task="board") == 1
+    assert metrics.get("llm_category_regenerations_total") == 1
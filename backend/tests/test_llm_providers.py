@@ -0,0 +1,59 @@
+import json
+import os
+import pytest
+
+from app.services.llm_providers import FakeLLMProvider, RecordReplayProvider, LLMProviderError
+
+def test_fake_provider_is_deterministic():
+    variables = {"topic": "Space", "num_categories": 2}
+    first = FakeLLMProvider(seed=1).complete("outline", "prompt", variables)
+    second = FakeLLMProvider(seed=1).complete("outline", "prompt", variables)
+    assert first == second
+    assert json.loads(first) == {"title": "All About Space", "categories": ["Space #1", "Space #2"]}
+
+def test_fake_provider_failure_injection():
+    provider = FakeLLMProvider(failure_rate=0.5, seed=7)
+    outcomes = []
+    for _ in range(100):
+        try:
+            provider.complete("outline", "prompt", {"topic": "Space"})
+            outcomes.append(True)
+        except LLMProviderError:
+            outcomes.append(False)
+    assert 30 < outcomes.count(False) < 70
+
+    always_failing = FakeLLMProvider(failure_rate=1.0)
+    with pytest.raises(LLMProviderError):
+        list(always_failing.stream("board", "prompt", {"topic": "Space"}))
+
+class CountingProvider(FakeLLMProvider):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def complete(self, task, prompt, variables):
+        self.calls += 1
+        return super().complete(task, prompt, variables)
+
+def test_record_then_replay(tmp_path):
+    inner = CountingProvider()
+    recorder = RecordReplayProvider(inner, str(tmp_path), mode="record")
+    recorded = recorder.complete("outline", "the prompt", {"topic": "Space"})
+    assert inner.calls == 1
+    assert len([f for _, _, files in os.walk(tmp_path) for f in files]) == 1
+
+    replayer = RecordReplayProvider(FakeLLMProvider(failure_rate=1.0), str(tmp_path), mode="replay")
+    assert replayer.complete("outline", "the prompt", {"topic": "Space"}) == recorded
+    with pytest.raises(LLMProviderError):
+        replayer.complete("outline", "another prompt", {"topic": "Space"})
+
+def test_cache_mode_calls_inner_provider_once(tmp_path):
+    inner = CountingProvider()
+    cache = RecordReplayProvider(inner, str(tmp_path), mode="cache")
+    first = cache.complete("outline", "the prompt", {"topic": "Space"})
+    second = cache.complete("outline", "the prompt", {"topic": "Space"})
+    assert first == second
+    assert inner.calls == 1
+
+    streamed = "".join(cache.stream("board", "a board prompt", {"topic": "Space"}))
+    assert "".join(cache.stream("board", "a board prompt", {"topic": "Space"})) == streamed
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services.llm_providers import LLMProvider, LLMProviderError
+from app.services.llm_resilience import CircuitBreaker, LLMUnavailableError, ResilientLLMProvider
+
+
+class ScriptedProvider(LLMProvider):
+    """Answers after the given delays, one per call; None in the script means failing the call."""
+    name = "scripted"
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.calls = 0
+
+    def complete(self, task, prompt, variables):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        if delay is None:
+            raise LLMProviderError("upstream error")
+        time.sleep(delay)
+        return f"answer {self.calls}"
+
+
+def test_slow_call_is_hedged():
+    inner = ScriptedProvider([0.01] * 20 + [1.0, 0.01])
+    provider = ResilientLLMProvider(inner, timeout_seconds=5, hedge_min_delay_seconds=0.05)
+    hedged, wins = metrics.get("llm_hedged_calls_total", task="outline"), metrics.get("llm_hedge_wins_total", task="outline")
+    for _ in range(20):
+        provider.complete("outline", "prompt", {})
+
+    start = time.monotonic()
+    assert provider.complete("outline", "prompt", {}) == "answer 22"
+    assert time.monotonic() - start < 0.5
+    assert provider.hedged_calls == 1
+    assert provider.hedge_wins == 1
+    assert metrics.get("llm_hedged_calls_total", task="outline") == hedged + 1
+    assert metrics.get("llm_hedge_wins_total", task="outline") == wins + 1
+
+
+def test_call_past_the_deadline_fails():
+    provider = ResilientLLMProvider(ScriptedProvider([0.5]), timeout_seconds=0.1, hedge_enabled=False)
+    with pytest.raises(LLMProviderError, match="timed out"):
+        provider.complete("outline", "prompt", {})
+
+
+def test_breaker_opens_and_recovers():
+    inner = ScriptedProvider([None, None, 0.0])
+    provider = ResilientLLMProvider(inner, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=0.1))
+
+    for _ in range(2):
+        with pytest.raises(LLMProviderError):
+            provider.complete("outline", "prompt", {})
+    assert provider.degraded
+
+    # Open: fails fast without calling the provider
+    with pytest.raises(LLMUnavailableError):
+        provider.complete("outline", "prompt", {})
+    assert inner.calls == 2
+
+    # Half open after the reset period: a successful trial call closes the circuit
+    time.sleep(0.15)
+    assert provider.complete("outline", "prompt", {}) == "answer 3"
+    assert not provider.degraded
+
+
+class ChunkedProvider(ScriptedProvider):
+    def stream(self, task, prompt, variables):
+        for chunk in self.complete(task, prompt, variables).split():
+            yield chunk
+
+
+def test_abandoned_stream_does_not_close_the_breaker():
+    inner = ChunkedProvider([None, 0.0])
+    provider = ResilientLLMProvider(inner, breaker=CircuitBreaker(failure_threshold=1, reset_seconds=0.05))
+    with pytest.raises(LLMProviderError):
+        list(provider.stream("board", "prompt", {}))
+    time.sleep(0.1)
+
+    # The client disconnects after the first chunk of the half-open trial
+    stream = provider.stream("board", "prompt", {})
+    assert next(stream) == "answer"
+    stream.close()
+    assert provider.degraded
+
+    # The trial slot was given back: the next call is the trial, and its success closes the circuit
+    assert list(provider.stream("board", "prompt", {})) == ["answer", "3"]
+    assert not provider.degraded
@@ -0,0 +1,25 @@
+import time
+from unittest.mock import patch
+
+from app.services.llm_service import LLMService
+from app.services.llm_providers import FakeLLMProvider
+
+def test_generate_quiz_board_fans_out_per_category():
+    llm_service = LLMService(provider=FakeLLMProvider(latency_ms=200))
+    with patch('app.services.llm_service.settings.LLM_CATEGORY_PARALLELISM', 4):
+        start = time.time()
+        quiz = llm_service.generate_quiz_board_from_topic("Space", num_categories=4, num_questions=5)
+        elapsed = time.time() - start
+
+    assert quiz["title"] == "All About Space"
+    assert [cat["name"] for cat in quiz["categories"]] == ["Space #1", "Space #2", "Space #3", "Space #4"]
+    assert all(len(cat["questions"]) == 5 for cat in quiz["categories"])
+    assert quiz["categories"][1]["questions"][0]["correct_answer"] == "Space #2 answer 1"
+    # One outline call, then the four categories concurrently rather than one after the other
+    assert elapsed < 0.7
+
+def test_stream_quiz_board_from_topic():
+    llm_service = LLMService(provider=FakeLLMProvider())
+    text = "".join(llm_service.stream_quiz_board_from_topic("Space", num_categories=2, num_questions=3))
+    assert '"title": "All About Space"' in text
+    assert text.count('"question_text"') == 6
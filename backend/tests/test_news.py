@@ -0,0 +1,86 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import NewsGenerationClaim, QuizBoard
+from app.services.news_feeds import FileNewsFeedSource, Headline
+from app.services.news_service import NewsBoardService
+from app.services.source_store import load_source
+
+DAY = date(2026, 10, 17)
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <item><title>Probe lands on Europa</title><description>A first.</description><pubDate>Sat, 17 Oct 2026 06:00:00 GMT</pubDate></item>
+  <item><title>Old news</title><pubDate>Fri, 16 Oct 2026 06:00:00 GMT</pubDate></item>
+</channel></rss>
+"""
+
+def write_feed(directory) -> FileNewsFeedSource:
+    (directory / "wire.xml").write_text(RSS)
+    (directory / "local.json").write_text(json.dumps({"items": [
+        {"title": "City opens  new library", "published": "2026-10-17T08:30:00"},
+        {"title": "Probe  lands on Europa", "published": "2026-10-17"},
+        {"title": "", "published": "2026-10-17"}
+    ]}))
+    (directory / "notes.txt").write_text("not a feed")
+    return FileNewsFeedSource(str(directory))
+
+def test_file_feed_reads_the_headlines_of_the_day(tmp_path):
+    source = write_feed(tmp_path)
+    titles = [headline.title for headline in source.headlines(DAY)]
+    assert sorted(titles) == ["City opens new library", "Probe lands on Europa"]
+
+def test_items_without_a_date_belong_to_the_day_of_the_file(tmp_path):
+    (tmp_path / "today.json").write_text(json.dumps([{"title": "Undated story"}]))
+    source = FileNewsFeedSource(str(tmp_path / "today.json"))
+    assert source.headlines(date.today()) == [Headline(title="Undated story")]
+
+def test_generate_news_boards_once_per_day(tmp_path, db: Session):
+    source = write_feed(tmp_path)
+    boards = NewsBoardService.generate_for_day(DAY, db, source)
+    assert len(boards) == 1
+    assert boards[0].source_type == "news"
+    assert boards[0].news_date == DAY
+    assert "Probe lands on Europa" in load_source(boards[0].id, db)
+
+    with patch('app.services.news_service.LLMService') as mock_llm:
+        assert [board.id for board in NewsBoardService.generate_for_day(DAY, db, source)] == [boards[0].id]
+        mock_llm.assert_not_called()
+
+def test_no_headlines_generates_nothing(tmp_path, db: Session):
+    source = write_feed(tmp_path)
+    assert NewsBoardService.generate_for_day(DAY + timedelta(days=5), db, source) == []
+    assert db.query(QuizBoard).count() == 0
+
+def test_news_endpoint_serves_the_latest_day(tmp_path, client: TestClient, db: Session):
+    source = write_feed(tmp_path)
+    NewsBoardService.generate_for_day(DAY, db, source)
+
+    with patch('app.services.news_service.date') as mock_date:
+        mock_date.today.return_value = DAY + timedelta(days=1)
+        response = client.get("/api/quiz-boards/news")
+
+    assert response.status_code == 200
+    assert [board["source_type"] for board in response.json()] == ["news"]
+
+def test_only_one_process_generates_the_news_boards_of_a_day(tmp_path, db: Session):
+    source = write_feed(tmp_path)
+    # Another process is generating them
+    db.add(NewsGenerationClaim(news_date=DAY, owner="other:1:live", claimed_until=datetime.now() + timedelta(minutes=5)))
+    db.commit()
+
+    with patch('app.services.news_service.LLMService') as mock_llm:
+        assert NewsBoardService.generate_for_day(DAY, db, source) == []
+        mock_llm.assert_not_called()
+
+    # Its claim expired: it died
+    db.query(NewsGenerationClaim).update({"claimed_until": datetime.now() - timedelta(minutes=1)})
+    db.commit()
+    assert len(NewsBoardService.generate_for_day(DAY, db, source)) == 1
+    claim = db.query(NewsGenerationClaim).one()
+    assert claim.owner != "other:1:live"
+    assert claim.claimed_until <= datetime.now()
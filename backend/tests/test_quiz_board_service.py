@@ -0,0 +1,187 @@
+import threading
+import time
+import zlib
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Player, PlayerType, QuizBoard
+from app.services.quiz_board_service import QuizBoardService, normalize_topic
+from app.services.single_flight import SingleFlight
+from app.services.source_store import compress_source, decompress_source
+from app.services.topic_index import TopicSimilarityIndex
+from tests.conftest import TestingSessionLocal
+
+SAMPLE_QUIZ = {
+    "title": "The Beatles",
+    "categories": [
+        {"name": f"Category {c}", "questions": [{"question_text": f"Clue {q}", "correct_answer": f"Answer {q}"} for q in range(4)]}
+        for c in range(3)
+    ]
+}
+
+def create_player(db: Session) -> Player:
+    player = Player(player_type=PlayerType.GUEST, display_name="Stranger")
+    db.add(player)
+    db.commit()
+    return player
+
+def test_normalize_topic():
+    assert normalize_topic("  The   Beatles! ") == "the beatles"
+    assert normalize_topic("the-beatles") == "the beatles"
+    assert normalize_topic("Beyoncé") == normalize_topic("BEYONCE")
+
+def test_reuses_board_for_equivalent_topic(db: Session):
+    player = create_player(db)
+    with patch('app.services.quiz_board_service.LLMService') as mock_llm:
+        mock_llm.return_value.generate_quiz_board_from_topic.return_value = SAMPLE_QUIZ
+        first = QuizBoardService.create_from_topic("The Beatles", player.id, db)
+        second = QuizBoardService.create_from_topic("the beatles!!", player.id, db)
+
+    assert first.id == second.id
+    assert first.topic_key == "the beatles"
+    mock_llm.return_value.generate_quiz_board_from_topic.assert_called_once()
+
+def test_concurrent_requests_share_one_generation(db: Session):
+    player_id = create_player(db).id
+    calls = []
+
+    def slow_generate(topic, num_categories, num_questions):
+        calls.append(topic)
+        time.sleep(0.2)
+        return SAMPLE_QUIZ
+
+    quiz_board_ids = []
+    def request(topic):
+        session = TestingSessionLocal()
+        try:
+            quiz_board_ids.append(QuizBoardService.create_from_topic(topic, player_id, session).id)
+        finally:
+            session.close()
+
+    with patch('app.services.quiz_board_service.LLMService') as mock_llm:
+        mock_llm.return_value.generate_quiz_board_from_topic.side_effect = slow_generate
+        threads = [threading.Thread(target=request, args=(topic,)) for topic in ["The Beatles", "the beatles", "THE BEATLES."]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(calls) == 1
+    assert len(set(quiz_board_ids)) == 1 and len(quiz_board_ids) == 3
+    assert db.query(QuizBoard).count() == 1
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+    call, is_leader = flight.begin("key")
+    assert is_leader
+    follower, is_leader = flight.begin("key")
+    assert not is_leader and follower is call
+
+    flight.fail("key", call, ValueError("boom"))
+    try:
+        follower.wait()
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    assert not flight.in_flight("key")
+
+def test_reuses_board_for_near_duplicate_topic(db: Session):
+    player = create_player(db)
+    quiz_data = {**SAMPLE_QUIZ, "title": "Marvel Cinematic Universe"}
+    with patch('app.services.quiz_board_service._topic_index', TopicSimilarityIndex()), \
+         patch('app.services.quiz_board_service.LLMService') as mock_llm:
+        mock_llm.return_value.generate_quiz_board_from_topic.return_value = quiz_data
+        first = QuizBoardService.create_from_topic("The Marvel Cinematic Universe", player.id, db)
+        assert QuizBoardService.create_from_topic("marvel cinematic universe", player.id, db).id == first.id
+        mock_llm.return_value.generate_quiz_board_from_topic.assert_called_once()
+
+        similar = QuizBoardService.find_similar("Marvel Cinematic Universe movies", db, threshold=0.3)
+        assert [quiz_board.id for quiz_board, _ in similar] == [first.id]
+        assert QuizBoardService.find_similar("Quantum physics", db, threshold=0.3) == []
+
+        # An acronym is offered, but never reused without asking
+        assert [quiz_board.id for quiz_board, _ in QuizBoardService.find_similar("MCU", db, settings.TOPIC_SUGGEST_SIMILARITY)] == [first.id]
+        assert QuizBoardService.find_reusable_board("MCU", db) is None
+        # Only one word in common: character shingles can't tell that "movies" means the same here
+        assert QuizBoardService.find_reusable_board("Marvel movies", db) is None
+
+def test_acronyms_are_not_reused_for_unrelated_topics(db: Session):
+    player = create_player(db)
+    with patch('app.services.quiz_board_service._topic_index', TopicSimilarityIndex()):
+        appetizers = QuizBoardService.save_quiz_board({**SAMPLE_QUIZ, "title": "Cold Italian Appetizers"}, "topic", "Cold Italian Appetizers", player.id, db)
+        assert QuizBoardService.find_reusable_board("CIA", db) is None
+        assert [quiz_board.id for quiz_board, _ in QuizBoardService.find_similar("CIA", db, settings.TOPIC_SUGGEST_SIMILARITY)] == [appetizers.id]
+
+def test_board_size_is_part_of_the_reuse_key(db: Session):
+    player = create_player(db)
+    small_quiz = {**SAMPLE_QUIZ, "categories": [{**cat, "questions": cat["questions"][:2]} for cat in SAMPLE_QUIZ["categories"][:2]]}
+    with patch('app.services.quiz_board_service.LLMService') as mock_llm:
+        mock_llm.return_value.generate_quiz_board_from_topic.side_effect = [SAMPLE_QUIZ, small_quiz]
+        default_board = QuizBoardService.create_from_topic("The Beatles", player.id, db)
+        small_board = QuizBoardService.create_from_topic("The Beatles", player.id, db, num_categories=2, num_questions=2)
+        assert QuizBoardService.create_from_topic("The Beatles", player.id, db, num_categories=2, num_questions=2).id == small_board.id
+
+    assert default_board.id != small_board.id
+    assert (small_board.num_categories, small_board.num_questions) == (2, 2)
+    mock_llm.return_value.generate_quiz_board_from_topic.assert_called_with("The Beatles", 2, 2)
+
+def test_source_content_is_stored_compressed():
+    content = "The lighthouse was built in 1850. " * 200
+    encoding, data = compress_source(content)
+    assert len(data) < len(content) // 10
+    assert decompress_source(encoding, data) == content
+    assert decompress_source("zlib", zlib.compress(content.encode())) == content
+
+def test_source_is_only_served_by_its_endpoint(client: TestClient, db: Session):
+    player = create_player(db)
+    topic_board = QuizBoardService.save_quiz_board(SAMPLE_QUIZ, "topic", "The Beatles", player.id, db)
+    document_board = QuizBoardService.save_quiz_board(SAMPLE_QUIZ, "document", "Private notes", player.id, db)
+    headers = {"Authorization": f"Bearer {client.post('/api/auth/guest').json()['access_token']}"}
+
+    listing = client.get("/api/quiz-boards/top").json()
+    assert all("source_content" not in quiz_board for quiz_board in listing["quiz_boards"])
+
+    response = client.get(f"/api/quiz-boards/{topic_board.id}/source", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"quiz_board_id": topic_board.id, "source_type": "topic", "source_content": "The Beatles"}
+    assert "immutable" in response.headers["cache-control"]
+    assert client.get(f"/api/quiz-boards/{topic_board.id}/source", headers={**headers, "If-None-Match": response.headers["etag"]}).status_code == 304
+    # Documents are only shown to the player who uploaded them
+    assert client.get(f"/api/quiz-boards/{document_board.id}/source", headers=headers).status_code == 403
+
+def test_top_quiz_boards_are_revalidated_with_their_etag(client: TestClient, db: Session):
+    player = create_player(db)
+    QuizBoardService.save_quiz_board(SAMPLE_QUIZ, "topic", "The Beatles", player.id, db)
+
+    response = client.get("/api/quiz-boards/top")
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    etag = response.headers["etag"]
+    response = client.get("/api/quiz-boards/top", headers={"If-None-Match": etag})
+    assert (response.status_code, response.content, response.headers["etag"]) == (304, b"", etag)
+
+    QuizBoardService.save_quiz_board(SAMPLE_QUIZ, "topic", "The Rolling Stones", player.id, db)
+    response = client.get("/api/quiz-boards/top", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+    # A 304 is answered from the version alone, past the cached boards too
+    page = "/api/quiz-boards/top?limit=10&offset=1000"
+    page_etag = client.get(page).headers["etag"]
+    with patch.object(QuizBoardService, "get_top_quiz_boards", side_effect=AssertionError("built")):
+        assert client.get("/api/quiz-boards/top", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+        assert client.get(page, headers={"If-None-Match": page_etag}).status_code == 304
+
+def test_stream_reuses_a_board_finished_before_it_leads(db: Session):
+    player = create_player(db)
+    with patch('app.services.quiz_board_service.LLMService') as mock_llm:
+        mock_llm.return_value.generate_quiz_board_from_topic.return_value = SAMPLE_QUIZ
+        board = QuizBoardService.create_from_topic("The Beatles", player.id, db)
+        # The board is saved by the request that led the generation between the first check and begin()
+        with patch.object(QuizBoardService, 'find_reusable_board', side_effect=[None, board]):
+            events = list(QuizBoardService.stream_from_topic("The Beatles", player.id, db))
+
+    mock_llm.return_value.stream_quiz_board_from_topic.assert_not_called()
+    assert events[-1] == ("done", {"quiz_board_id": board.id})
+    assert db.query(QuizBoard).count() == 1
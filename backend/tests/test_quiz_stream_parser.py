@@ -0,0 +1,84 @@
+import json
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import QuizBoard
+from app.services.quiz_stream_parser import QuizBoardStreamParser
+from tests.conftest import TestingSessionLocal
+
+QUIZ = {
+    "title": "Space \"Quiz\"",
+    "categories": [
+        {
+            "name": f"Category {c}",
+            "questions": [
+                {"question_text": f"Clue {c}-{q}, with {{braces}} and [brackets]", "correct_answer": f"Answer {c}-{q}"}
+                for q in range(4)
+            ]
+        }
+        for c in range(3)
+    ]
+}
+
+def chunks(text: str, size: int = 7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_parser_emits_parts_as_they_complete():
+    text = "```json\n" + json.dumps(QUIZ, indent=2) + "\n```"
+    parser = QuizBoardStreamParser()
+    events = []
+    for chunk in chunks(text):
+        events.extend(parser.feed(chunk))
+
+    assert events[0] == ("title", {"title": 'Space "Quiz"'})
+    assert [e for e, _ in events].count("category") == 3
+    assert [e for e, _ in events].count("question") == 12
+    # Each category is announced before its questions
+    assert events[1] == ("category", {"category_index": 0, "name": "Category 0"})
+    assert events[2][1]["question_text"] == "Clue 0-0, with {braces} and [brackets]"
+    assert events[-1][1]["category_index"] == 2 and events[-1][1]["question_index"] == 3
+    assert parser.result() == QUIZ
+
+def test_parser_emits_question_as_soon_as_it_closes():
+    text = json.dumps(QUIZ)
+    end_of_first_question = text.index("\"Answer 0-0\"}") + len("\"Answer 0-0\"}")
+    parser = QuizBoardStreamParser()
+    events = parser.feed(text[:end_of_first_question])
+    assert events[-1][0] == "question"
+    assert events[-1][1]["correct_answer"] == "Answer 0-0"
+
+def test_parser_tolerates_trailing_commas():
+    text = '{"title": "T", "categories": [{"name": "C", "questions": [{"question_text": "Q", "correct_answer": "A",},]},]}'
+    parser = QuizBoardStreamParser()
+    events = parser.feed(text)
+    assert ("question", {"category_index": 0, "question_index": 0, "question_text": "Q", "correct_answer": "A"}) in events
+    assert parser.result()["categories"][0]["questions"][0]["correct_answer"] == "A"
+
+def test_parser_result_of_incomplete_stream():
+    parser = QuizBoardStreamParser()
+    parser.feed(json.dumps(QUIZ)[:50])
+    try:
+        parser.result()
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+
+def test_stream_endpoint(client: TestClient, db: Session):
+    headers = {"Authorization": f"Bearer {client.post('/api/auth/guest').json()['access_token']}"}
+    with patch('app.core.database.Session', TestingSessionLocal), \
+         patch('app.services.quiz_board_service.LLMService.stream_quiz_board_from_topic', return_value=iter(chunks(json.dumps(QUIZ)))):
+        response = client.post("/api/quiz-boards/from-topic/stream", data={"topic": "Space"}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert [e for e, _ in events].count("question") == 12
+    assert all("correct_answer" not in data for event, data in events if event == "question")
+    event, data = events[-1]
+    assert event == "done"
+    assert db.query(QuizBoard).filter(QuizBoard.id == data["quiz_board_id"]).first().title == 'Space "Quiz"'
+    assert data["game_session_id"] is not None
@@ -0,0 +1,72 @@
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Player, PlayerType, QuizBoard
+from app.services import speculative_generation_service
+from app.services.speculative_generation_service import SpeculativeGenerationService
+from app.services.quiz_board_service import QuizBoardService
+from tests.conftest import TestingSessionLocal
+
+SAMPLE_QUIZ = {
+    "title": "The Beatles",
+    "categories": [
+        {"name": f"Category {c}", "questions": [{"question_text": f"Clue {q}", "correct_answer": f"Answer {q}"} for q in range(4)]}
+        for c in range(3)
+    ]
+}
+
+@pytest.fixture(autouse=True)
+def speculation():
+    """Enable speculation, on the test database, with a fresh budget and no remembered sessions."""
+    with patch('app.core.database.Session', TestingSessionLocal), \
+         patch.object(settings, "SPECULATIVE_GENERATION_ENABLED", True), \
+         patch.object(settings, "SPECULATIVE_MIN_ANSWERS", 1), \
+         patch.object(speculative_generation_service, "_budget", None):
+        speculative_generation_service._play_next.clear()
+        yield
+
+def start_game(client: TestClient, db: Session):
+    creator = Player(player_type=PlayerType.GUEST, display_name="Stranger")
+    db.add(creator)
+    db.commit()
+    quiz_board = QuizBoardService.save_quiz_board(SAMPLE_QUIZ, "topic", "The Beatles", creator.id, db)
+
+    headers = {"Authorization": f"Bearer {client.post('/api/auth/guest').json()['access_token']}"}
+    game_session_id = client.post(f"/api/game-sessions/new-from-quiz-board/{quiz_board.id}", headers=headers).json()["game_session_id"]
+    return game_session_id, headers
+
+def test_follow_up_boards_are_offered_while_playing(client: TestClient, db: Session):
+    game_session_id, headers = start_game(client, db)
+    session = client.get(f"/api/game-sessions/{game_session_id}", headers=headers).json()
+    assert session["play_next"] == []
+
+    question_id = session["session_quiz_board"]["categories"][0]["questions"][0]["question_id"]
+    client.post(f"/api/game-sessions/{game_session_id}/answer-question/{question_id}", json={"answer": "Answer 0"}, headers=headers)
+
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        play_next = client.get(f"/api/game-sessions/{game_session_id}", headers=headers).json()["play_next"]
+        if len(play_next) == settings.SPECULATIVE_TOPICS_PER_SESSION:
+            break
+        time.sleep(0.05)
+    assert [board["title"] for board in play_next] == ["All About The Beatles: History", "All About The Beatles: Legends"]
+
+def test_player_jobs_go_first(client: TestClient, db: Session):
+    game_session_id, headers = start_game(client, db)
+    speculative_generation_service._play_next[game_session_id] = []
+    with patch('app.services.speculative_generation_service.GenerationJobsService.pending_jobs', return_value=1):
+        SpeculativeGenerationService.speculate(game_session_id)
+    assert client.get(f"/api/game-sessions/{game_session_id}", headers=headers).json()["play_next"] == []
+    assert db.query(QuizBoard).count() == 1
+
+def test_speculation_stays_within_its_budget(client: TestClient, db: Session):
+    game_session_id, headers = start_game(client, db)
+    speculative_generation_service._play_next[game_session_id] = []
+    # Enough for the follow-up topics call and one board, not two
+    with patch.object(settings, "SPECULATIVE_REQUESTS_PER_MINUTE", 5):
+        SpeculativeGenerationService.speculate(game_session_id)
+    assert len(client.get(f"/api/game-sessions/{game_session_id}", headers=headers).json()["play_next"]) == 1
@@ -2,6 +2,9 @@ import { Box, Heading, Text, Button, useToast } from '@chakra-ui/react'
 import { useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import api from '../lib/axios'
+import type { GenerationJobResponse } from '../types/quiz_board_types'
+
+const JOB_POLL_INTERVAL_MS = 1500
 
 export default function CreateFromText() {
     const [topic, setTopic] = useState('')
@@ -26,10 +29,19 @@ export default function CreateFromText() {
             const formData = new FormData()
             formData.append('topic', topic)
 
-            const response = await api.post('/quiz-boards/from-topic', formData)
-            
+            // The board is generated in the background; poll the job until it is done
+            let { data: job } = await api.post<GenerationJobResponse>('/quiz-boards/from-topic', formData)
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+                job = (await api.get<GenerationJobResponse>(`/quiz-boards/jobs/${job.id}`)).data
+            }
+
+            if (job.status === 'failed') {
+                throw { response: { data: { detail: job.error } } }
+            }
+
             // Navigate to the game session page
-            navigate(`/play/${response.data.game_session_id}`)
+            navigate(`/play/${job.game_session_id}`)
         } catch (error: any) {
             const errorMessageFromServer = error.response?.data?.detail ?? ""
             toast({
@@ -1,6 +1,80 @@
-import { Box, Text, Button, Heading } from '@chakra-ui/react'
+import { Box, Text, Button, Heading, useToast } from '@chakra-ui/react'
+import { useState } from 'react'
+import { useNavigate } from 'react-router-dom'
+import api from '../lib/axios'
+import type { GenerationJobResponse } from '../types/quiz_board_types'
+
+const JOB_POLL_INTERVAL_MS = 1500
+const SUPPORTED_EXTENSIONS = ['.pdf', '.txt', '.md']
 
 export default function CreateFromUpload() {
+    const [file, setFile] = useState<File | null>(null)
+    const [isLoading, setIsLoading] = useState(false)
+    const navigate = useNavigate()
+    const toast = useToast()
+
+    const selectFile = (files: FileList | null) => {
+        const selected = files?.[0]
+        if (!selected) {
+            return
+        }
+        if (!SUPPORTED_EXTENSIONS.some(extension => selected.name.toLowerCase().endsWith(extension))) {
+            toast({
+                title: 'Error',
+                description: `Supported documents: ${SUPPORTED_EXTENSIONS.join(', ')}`,
+                status: 'error',
+                duration: 3000,
+                isClosable: true,
+            })
+            return
+        }
+        setFile(selected)
+    }
+
+    const handleCreateQuiz = async () => {
+        if (!file) {
+            toast({
+                title: 'Error',
+                description: 'Please select a document',
+                status: 'error',
+                duration: 3000,
+                isClosable: true,
+            })
+            return
+        }
+
+        setIsLoading(true)
+        try {
+            const formData = new FormData()
+            formData.append('file', file)
+
+            // The board is generated in the background; poll the job until it is done
+            let { data: job } = await api.post<GenerationJobResponse>('/quiz-boards/from-document', formData)
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+                job = (await api.get<GenerationJobResponse>(`/quiz-boards/jobs/${job.id}`)).data
+            }
+
+            if (job.status === 'failed') {
+                throw { response: { data: { detail: job.error } } }
+            }
+
+            // Navigate to the game session page
+            navigate(`/play/${job.game_session_id}`)
+        } catch (error: any) {
+            const errorMessageFromServer = error.response?.data?.detail ?? ""
+            toast({
+                title: 'Error',
+                description: `Failed to create quiz board. Server response: ${errorMessageFromServer}`,
+                status: 'error',
+                duration: 3000,
+                isClosable: true,
+            })
+        } finally {
+            setIsLoading(false)
+        }
+    }
+
     return (
         <Box p={4} bg="gray.100" borderRadius="md" mt={4}>
             <Heading size="md" mb={2}>Create a Jeopardy quiz from documents</Heading>
@@ -22,15 +96,13 @@ export default function CreateFromUpload() {
                 _hover={{ bg: "gray.50" }}
                 onDrop={(e) => {
                     e.preventDefault();
-                    const files = e.dataTransfer.files;
-                    // Handle files here
-                    console.log(files);
+                    selectFile(e.dataTransfer.files);
                 }}
                 onDragOver={(e) => {
                     e.preventDefault();
                 }}
             >
-                <Text mb={2}>Drag and drop files here</Text>
+                <Text mb={2}>{file ? file.name : 'Drag and drop a PDF, text or markdown document here'}</Text>
                 <Text fontSize="sm" color="gray.500">or</Text>
                 <Button
                     size="sm"
@@ -49,17 +121,12 @@ export default function CreateFromUpload() {
                 <input
                     id="file-upload"
                     type="file"
-                    multiple
+                    accept={SUPPORTED_EXTENSIONS.join(',')}
                     style={{ display: 'none' }}
-                    onChange={(e) => {
-                        if (e.target.files) {
-                            console.log(e.target.files);
-                            // Handle files here
-                        }
-                    }}
+                    onChange={(e) => selectFile(e.target.files)}
                 />
             </Box>
-            <Button colorScheme="purple" size="md">
+            <Button colorScheme="purple" size="md" onClick={handleCreateQuiz} isLoading={isLoading} loadingText="Creating...">
                 Upload & Create Quiz
             </Button>
         </Box>
@@ -1,9 +1,10 @@
-import { Box, Flex, Grid, GridItem, Spacer, Text, useDisclosure } from '@chakra-ui/react';
+import { Box, Button, Flex, Grid, GridItem, Spacer, Text, Wrap, useDisclosure } from '@chakra-ui/react';
 import { useState, useEffect } from 'react';
+import { useNavigate } from 'react-router-dom';
 import api from '../lib/axios';
 import QuestionModal from './QuestionModal';
 import QuestionTile from './QuestionTile';
-import { Question, Category, GameSessionResponse} from '../types/game_session_types';
+import { Question, Category, GameSessionResponse, PlayNextBoard } from '../types/game_session_types';
 
 interface QuizGridProps {
     gameSessionId: string;
@@ -14,7 +15,9 @@ export default function QuizGrid({ gameSessionId }: QuizGridProps) {
     const [quizTitle, setQuizTitle] = useState<string>('');
     const [categories, setCategories] = useState<Category[]>([]);
     const [selectedQuestion, setSelectedQuestion] = useState<Question | null>(null);
+    const [playNext, setPlayNext] = useState<PlayNextBoard[]>([]);
     const { isOpen, onOpen, onClose } = useDisclosure();
+    const navigate = useNavigate();
 
     useEffect(() => {
         const fetchGameSession = async () => {
@@ -30,6 +33,7 @@ export default function QuizGrid({ gameSessionId }: QuizGridProps) {
                 setQuizTitle(response.data.session_quiz_board.title);
                 setCategories(response.data.session_quiz_board.categories);
                 setScore(response.data.score);
+                setPlayNext(response.data.play_next);
                 
             } catch (error) {
                 console.error('Failed to fetch game session:', error);
@@ -39,6 +43,34 @@ export default function QuizGrid({ gameSessionId }: QuizGridProps) {
         fetchGameSession();
     }, [gameSessionId]);
 
+    const isGameOver = categories.length > 0 && categories.every(category => category.questions.every(q => q.status !== 'unattempted'));
+
+    useEffect(() => {
+        if (!isGameOver) {
+            return;
+        }
+        // The next boards are generated in the background while the game is played; pick up the ones that are ready
+        const fetchPlayNext = async () => {
+            try {
+                const response = await api.get<GameSessionResponse>(`/game-sessions/${gameSessionId}`);
+                setPlayNext(response.data.play_next);
+            } catch (error) {
+                console.error('Failed to fetch the boards to play next:', error);
+            }
+        };
+
+        fetchPlayNext();
+    }, [isGameOver, gameSessionId]);
+
+    const handlePlayNextClick = async (boardId: number) => {
+        try {
+            const response = await api.post('/game-sessions/new-from-quiz-board/' + boardId);
+            navigate(`/play/${response.data.game_session_id}`);
+        } catch (error) {
+            console.error('Failed to start the next game session:', error);
+        }
+    };
+
     const handleQuestionClick = (question: Question) => {
         setSelectedQuestion(question);
         onOpen();    
@@ -88,6 +120,19 @@ export default function QuizGrid({ gameSessionId }: QuizGridProps) {
                 ))}
             </Grid>
 
+            {isGameOver && playNext.length > 0 && (
+                <Box p={4} mt={2} color="white">
+                    <Text fontWeight="bold" mb={2}>Play next</Text>
+                    <Wrap spacing={2}>
+                        {playNext.map((board) => (
+                            <Button key={board.id} size="sm" colorScheme="purple" onClick={() => handlePlayNextClick(board.id)}>
+                                {board.title}
+                            </Button>
+                        ))}
+                    </Wrap>
+                </Box>
+            )}
+
             {selectedQuestion && (
                 <QuestionModal
                     isOpen={isOpen}
@@ -26,6 +26,12 @@ interface QuizBoard {
     categories: Category[];
 }
 
+// This should match PlayNextBoardPyd
+interface PlayNextBoard {
+    id: number;
+    title: string;
+}
+
 // This should match GameSessionResponse
 interface GameSessionResponse {
     id: number;
@@ -35,6 +41,7 @@ interface GameSessionResponse {
     completed_at: string | null;
     status: string;
     session_quiz_board: QuizBoard;
+    play_next: PlayNextBoard[];
 }
 
 // This should match AnswerQuestionResponse
@@ -44,7 +51,8 @@ interface AnswerQuestionResponse {
     correct_answer: string;
     points_earned: number;
     updated_score: number;
+    answered_count: number;
     game_status: string;
 }
 
-export type { Question, Category, QuizBoard, GameSessionResponse, AnswerQuestionResponse };
\ No newline at end of file
+export type { Question, Category, QuizBoard, PlayNextBoard, GameSessionResponse, AnswerQuestionResponse };
\ No newline at end of file
@@ -16,4 +16,20 @@ interface TopQuizBoardsResponse {
     offset: number;
 }
 
-export type { TopQuizBoardModel, TopQuizBoardsResponse };
\ No newline at end of file
+// This should match GenerationJobResponse
+interface GenerationJobResponse {
+    id: number;
+    source_type: 'topic' | 'document';
+    topic: string;
+    status: 'queued' | 'running' | 'completed' | 'failed';
+    quiz_board_id: number | null;
+    game_session_id: number | null;
+    error: string | null;
+    created_at: string;
+    started_at: string | null;
+    finished_at: string | null;
+    queue_wait_ms: number | null;
+    duration_ms: number | null;
+}
+
+export type { TopQuizBoardModel, TopQuizBoardsResponse, GenerationJobResponse };
\ No newline at end of file